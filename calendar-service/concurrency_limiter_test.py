@@ -0,0 +1,64 @@
+import threading
+import time
+
+from flask import Flask, Response
+
+from services.concurrency_limiter import AdaptiveLimit, ConcurrencyLimiter
+
+def test_limit_grows_additively_while_saturated():
+    limit = AdaptiveLimit('route', initial_limit=2, max_limit=3, latency_target=1.0)
+    assert limit.acquire() and limit.acquire()
+    limit.release(0.1)
+    assert limit.limit == 2.5
+    # Not saturated any more: one request in flight below a limit of 2
+    limit.release(0.1)
+    assert limit.limit == 2.5
+    for _ in range(10):
+        assert limit.acquire() and limit.acquire()
+        limit.release(0.1)
+        limit.release(0.1)
+    assert limit.limit == 3
+
+def test_limit_backs_off_multiplicatively_on_slow_requests():
+    limit = AdaptiveLimit('route', initial_limit=10, min_limit=2, latency_target=0.5, backoff=0.5)
+    assert limit.acquire()
+    limit.release(1.0)
+    assert limit.limit == 5
+    for _ in range(5):
+        assert limit.acquire()
+        limit.release(1.0)
+    assert limit.limit == 2
+    assert limit.stats()['latency_avg_ms'] == 1000.0
+
+def test_queue_full_and_timeout_rejections():
+    limit = AdaptiveLimit('route', initial_limit=1, max_queue=1, queue_timeout=0.05)
+    assert limit.acquire()
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(limit.acquire()))
+    waiter.start()
+    while not limit.waiting:
+        time.sleep(0.001)
+    assert not limit.acquire()
+    waiter.join()
+    assert results == [False]
+    assert (limit.rejected_queue_full, limit.rejected_timeout) == (1, 1)
+
+def test_streamed_response_latency_is_measured_at_close():
+    app = Flask(__name__)
+    limiter = ConcurrencyLimiter(initial_limit=4)
+
+    @app.route('/stream')
+    @limiter.limit('stream', latency_target=0.05)
+    def stream():
+        def body():
+            time.sleep(0.1)
+            yield 'done'
+        return Response(body())
+
+    with app.test_client() as client:
+        # Buffered: the body is consumed and closed like a server would
+        assert client.get('/stream', buffered=True).data == b'done'
+    route_limit = limiter.limits['stream']
+    assert route_limit.in_flight == 0
+    assert route_limit.latency_avg >= 0.1
+    assert route_limit.limit < 4
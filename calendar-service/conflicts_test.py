@@ -0,0 +1,74 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import pytest
+
+from services import conflicts
+from services.conflicts import check_conflicts, find_conflicts, new_event_periods
+
+Row = namedtuple('Row', 'id event_name event_start event_end rrule')
+
+START = datetime(2024, 3, 1, 9)
+EXISTING = [Row(1, 'standup', START, START + timedelta(minutes=30), None)]
+
+def event(start_minutes, end_minutes, rrule=None, until=None):
+    return {
+        'event_start': START + timedelta(minutes=start_minutes),
+        'event_end': START + timedelta(minutes=end_minutes),
+        'rrule': rrule,
+        'recurrence_until': until,
+        'recurrence_exdates': None,
+    }
+
+@pytest.fixture
+def calendar(monkeypatch):
+    """Existing events served from memory; records the windows queried and the locks taken."""
+    queried = []
+    locked = []
+
+    def overlapping_events(calendar_id, windows):
+        queried.append(windows)
+        return [row for row in EXISTING if any(row.event_start < end and row.event_end > start for start, end in windows)]
+
+    monkeypatch.setattr(conflicts, 'overlapping_events', overlapping_events)
+    monkeypatch.setattr(conflicts, 'lock_calendar_writes', locked.append)
+    return queried, locked
+
+def test_back_to_back_events_do_not_conflict(calendar):
+    assert find_conflicts(1, [event(30, 60)]) == []
+
+def test_conflicts_with_existing_and_batch_events(calendar):
+    found = find_conflicts(1, [event(15, 45), event(40, 50), event(120, 180)])
+    assert [conflict['index'] for conflict in found] == [0, 1]
+    assert found[0]['conflicts_with'][0]['id'] == 1
+    assert found[0]['conflicts_with'][1] == {'index': 1}
+    assert found[1]['conflicts_with'] == [{'index': 0}]
+
+def test_only_the_windows_of_the_batch_are_queried(calendar):
+    queried, _ = calendar
+    find_conflicts(1, [event(0, 60), event(60, 90), event(60 * 24 * 365, 60 * 24 * 365 + 30)])
+    # Touching periods share one window, the distant event gets its own
+    assert queried == [[(START, START + timedelta(minutes=90)), (START + timedelta(days=365), START + timedelta(days=365, minutes=30))]]
+
+def test_recurring_series_conflicts_within_horizon(calendar):
+    series = event(60 * 24 - 10, 60 * 24 + 10, 'FREQ=DAILY', START + timedelta(days=5))
+    assert len(new_event_periods(series)) == 5
+    assert find_conflicts(1, [series]) == []
+    found = find_conflicts(1, [series, event(60 * 24 * 3, 60 * 24 * 3 + 5)])
+    assert [conflict['index'] for conflict in found] == [0, 1]
+
+def test_ignore_mode_checks_nothing(calendar):
+    queried, locked = calendar
+    assert check_conflicts(1, [event(0, 10)], 'ignore') == ([], True)
+    assert queried == [] and locked == []
+
+def test_check_mode_reports_and_allows(calendar):
+    _, locked = calendar
+    found, allowed = check_conflicts(7, [event(0, 10)], 'check')
+    assert allowed and found[0]['index'] == 0
+    assert locked == [7]
+
+def test_reject_mode_refuses_only_conflicting_batches(calendar):
+    found, allowed = check_conflicts(7, [event(120, 130), event(0, 10)], 'reject')
+    assert not allowed and [conflict['index'] for conflict in found] == [1]
+    assert check_conflicts(7, [event(120, 130)], 'reject') == ([], True)
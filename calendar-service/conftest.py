@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modules shared by the services, on PYTHONPATH in the containers
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
@@ -0,0 +1,97 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask, request
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from werkzeug.datastructures import MultiDict
+
+from models.model import Event
+from services.event_queries import EVENT_COLUMNS, _page, decode_cursor, encode_cursor, parse_page_args, stream_events_page
+
+START = datetime(2024, 3, 1, 9)
+
+@pytest.fixture
+def session():
+    """Single events in an in-memory SQLite table, several sharing the same event_start."""
+    engine = create_engine('sqlite://')
+    with engine.begin() as connection:
+        connection.execute(text(
+            'CREATE TABLE event (id INTEGER PRIMARY KEY, event_name VARCHAR, event_start DATETIME, event_end DATETIME, '
+            'created_by VARCHAR, calendar_id INTEGER, rrule VARCHAR)'
+        ))
+        # Inserted out of order, ids 3, 5 and 6 start at the same time
+        starts = {1: 0, 2: 30, 3: 60, 4: 120, 5: 60, 6: 60, 7: 90}
+        connection.execute(Event.__table__.insert(), [
+            {'id': event_id, 'event_name': f'event {event_id}', 'event_start': START + timedelta(minutes=minutes),
+             'event_end': START + timedelta(minutes=minutes + 30), 'created_by': 'alice', 'calendar_id': 1, 'rrule': None}
+            for event_id, minutes in starts.items()
+        ])
+    with Session(engine) as session:
+        yield session
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    with app.app_context():
+        yield app
+
+def page(session, limit, after=None, start=None, end=None):
+    return list(_page(session.query(*EVENT_COLUMNS), start, end, after, limit))
+
+def render(rows, limit):
+    return json.loads(''.join(stream_events_page(rows, limit)))
+
+def test_cursor_round_trip():
+    token = encode_cursor(datetime(2024, 3, 1, 9, 30, 15, 250), 42)
+    assert '=' not in token
+    assert decode_cursor(token) == (datetime(2024, 3, 1, 9, 30, 15, 250), 42)
+
+@pytest.mark.parametrize('token', ['not a cursor', 'bm90IGpzb24', encode_cursor(START, 1)[:-3], 'WyJub3QgYSBkYXRlIiwxXQ'])
+def test_malformed_cursor_raises_value_error(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token)
+
+def test_malformed_cursor_in_the_query_string(app):
+    # get_events answers 400 with the message of any ValueError from parse_page_args
+    with app.test_request_context('/api/calendar/events?cursor=garbage&limit=10'):
+        with pytest.raises(ValueError, match='Invalid cursor'):
+            parse_page_args(request.args)
+
+def test_page_args():
+    cursor = encode_cursor(START, 7)
+    assert parse_page_args(MultiDict({'from': '2024-03-01T08:00:00Z', 'cursor': cursor, 'limit': '5000'})) == (
+        datetime(2024, 3, 1, 8), None, (START, 7), 1000,
+    )
+    with pytest.raises(ValueError):
+        parse_page_args(MultiDict({'limit': '0'}))
+
+def test_equal_starts_are_ordered_by_id(session):
+    assert [row.id for row in page(session, 10)] == [1, 2, 3, 5, 6, 7, 4]
+
+def test_cursor_continues_after_a_tie(session):
+    # The previous page ended on event 5, event 6 has the same start and comes next
+    assert [row.id for row in page(session, 2, after=(START + timedelta(minutes=60), 5))] == [6, 7, 4]
+
+def test_page_fetches_one_extra_row(session):
+    assert [row.id for row in page(session, 3)] == [1, 2, 3, 5]
+
+def test_next_cursor_only_when_more_rows_than_limit(session, app):
+    rows = page(session, 3)
+    assert render(rows[:3], 3)['next_cursor'] is None
+    assert render(rows[:2], 3)['next_cursor'] is None
+    body = render(rows, 3)
+    assert [event['id'] for event in body['events']] == [1, 2, 3]
+    assert decode_cursor(body['next_cursor']) == (START + timedelta(minutes=60), 3)
+    assert render([], 3) == {'events': [], 'next_cursor': None}
+
+def test_walking_the_pages_returns_every_event_once(session, app):
+    seen, after = [], None
+    while True:
+        body = render(page(session, 2, after=after), 2)
+        seen += [event['id'] for event in body['events']]
+        if body['next_cursor'] is None:
+            break
+        after = decode_cursor(body['next_cursor'])
+    assert seen == [1, 2, 3, 5, 6, 7, 4]
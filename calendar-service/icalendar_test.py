@@ -0,0 +1,73 @@
+import io
+from collections import namedtuple
+from datetime import datetime
+
+import pytest
+
+from services.icalendar import FOLD_OCTETS, parse_events, render_calendar
+
+Row = namedtuple('Row', 'id event_name event_start event_end created_by rrule recurrence_exdates')
+
+def row(event_name='Planning', rrule=None, exdates=None, event_id=1):
+    return Row(event_id, event_name, datetime(2024, 3, 4, 9), datetime(2024, 3, 4, 10), 'alice', rrule, exdates)
+
+def export(*rows):
+    return ''.join(render_calendar(rows, 'team', stamp='20240101T000000Z'))
+
+class ChunkedStream(io.RawIOBase):
+    """Request body arriving `size` bytes at a time."""
+
+    def __init__(self, data, size):
+        self.data = data
+        self.size = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        chunk, self.data = self.data[:self.size], self.data[self.size:]
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+def import_text(text, chunk_size=None):
+    # Read like the import route: a text wrapper over the byte stream that keeps the CRLFs
+    raw = text.encode()
+    stream = io.BufferedReader(ChunkedStream(raw, chunk_size), buffer_size=chunk_size) if chunk_size else io.BytesIO(raw)
+    return list(parse_events(io.TextIOWrapper(stream, encoding='utf-8', newline='')))
+
+def test_long_multibyte_summary_is_folded_and_restored():
+    name = 'Réunion d’équipe — 日本語の会議 avec l’équipe de développement'
+    text = export(row(name))
+    summary = [line for line in text.split('\r\n') if line.startswith('SUMMARY') or line.startswith(' ')]
+    assert len(summary) > 1
+    assert all(len(line.encode()) <= FOLD_OCTETS for line in text.split('\r\n'))
+    assert import_text(text)[0]['event_name'] == name
+
+def test_escaped_characters_round_trip():
+    name = 'Budget, Q3; review\nroom 2\\B'
+    text = export(row(name))
+    assert 'SUMMARY:Budget\\, Q3\\; review\\nroom 2\\\\B\r\n' in text
+    assert import_text(text)[0]['event_name'] == name
+
+@pytest.mark.parametrize('chunk_size', range(1, 12))
+def test_crlf_and_multibyte_split_across_chunks(chunk_size):
+    rows = [row('Café ' * 20, event_id=1), row('Second', event_id=2)]
+    events = import_text(export(*rows), chunk_size)
+    assert [event['event_name'] for event in events] == ['Café ' * 20, 'Second']
+
+def test_rrule_and_exdates_preserved():
+    exdates = [datetime(2024, 3, 11, 9), datetime(2024, 3, 18, 9)]
+    event = import_text(export(row(rrule='FREQ=WEEKLY;BYDAY=MO;COUNT=5', exdates=exdates)))[0]
+    assert event == {
+        'event_name': 'Planning',
+        'event_start': datetime(2024, 3, 4, 9),
+        'event_end': datetime(2024, 3, 4, 10),
+        'rrule': 'FREQ=WEEKLY;BYDAY=MO;COUNT=5',
+        'exdates': exdates,
+    }
+
+def test_exported_calendar_is_well_formed():
+    text = export(row(), row('Other', event_id=2))
+    assert text.startswith('BEGIN:VCALENDAR\r\nVERSION:2.0\r\n')
+    assert text.endswith('END:VCALENDAR\r\n')
+    assert text.count('BEGIN:VEVENT') == 2
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+from services.intervals import IntervalIndex, clip, free_slots, merge_intervals
+
+def at(hour, minute=0):
+    return datetime(2024, 3, 1, hour, minute)
+
+def test_merge_touching_nested_and_unsorted():
+    intervals = [(at(13), at(14)), (at(9), at(12)), (at(10), at(11)), (at(12), at(13)), (at(16), at(17))]
+    assert merge_intervals(intervals) == [(at(9), at(14)), (at(16), at(17))]
+
+def test_merge_empty():
+    assert merge_intervals([]) == []
+    # An empty interval inside a block disappears, on its own it stays a point
+    assert merge_intervals([(at(9), at(10)), (at(9, 30), at(9, 30)), (at(11), at(11))]) == [(at(9), at(10)), (at(11), at(11))]
+
+def test_clip_to_window():
+    intervals = [(at(7), at(9)), (at(8), at(10)), (at(11), at(12)), (at(12), at(15)), (at(15), at(16))]
+    # Intervals only touching the window edges are left out
+    assert list(clip(intervals, at(9), at(13))) == [(at(9), at(10)), (at(11), at(12)), (at(12), at(13))]
+    assert list(clip(intervals, at(10), at(10))) == []
+
+def test_free_slots_between_merged_blocks():
+    busy = merge_intervals([(at(9), at(10)), (at(9, 30), at(11)), (at(13), at(14))])
+    assert free_slots(busy, at(8), at(17)) == [(at(8), at(9)), (at(11), at(13)), (at(14), at(17))]
+    assert free_slots(busy, at(8), at(17), min_length=timedelta(hours=2)) == [(at(11), at(13)), (at(14), at(17))]
+
+def test_free_slots_with_busy_past_the_window():
+    busy = [(at(7), at(9)), (at(16), at(18))]
+    assert free_slots(busy, at(8), at(17)) == [(at(9), at(16))]
+    assert free_slots([(at(7), at(18))], at(8), at(17)) == []
+    assert free_slots([], at(8), at(17)) == [(at(8), at(17))]
+
+def test_interval_index_overlaps():
+    index = IntervalIndex([(at(9), at(17), 'long'), (at(10), at(11), 'a'), (at(11), at(12), 'b'), (at(12), at(12), 'empty')])
+    assert len(index) == 3
+    # Half-open: touching intervals do not overlap
+    assert index.overlapping(at(11), at(11, 30)) == ['long', 'b']
+    assert index.overlapping(at(10, 30), at(11, 30)) == ['long', 'a', 'b']
+    assert index.overlapping(at(17), at(18)) == []
+    assert index.overlapping(at(12), at(12)) == []
+
+def test_free_slots_over_merged_member_intervals():
+    # Busy time of three members, overlapping and out of order, one block starting before the window
+    members = {
+        'alice': [(at(9), at(10)), (at(14), at(15))],
+        'bob': [(at(9, 30), at(11)), (at(7), at(8, 30))],
+        'carol': [(at(11), at(12)), (at(15), at(15, 45))],
+    }
+    busy = merge_intervals(clip((interval for intervals in members.values() for interval in intervals), at(8), at(17)))
+    assert busy == [(at(8), at(8, 30)), (at(9), at(12)), (at(14), at(15, 45))]
+    assert free_slots(busy, at(8), at(17), timedelta(minutes=30)) == [(at(8, 30), at(9)), (at(12), at(14)), (at(15, 45), at(17))]
+    assert free_slots(busy, at(8), at(17), timedelta(hours=1, minutes=30)) == [(at(12), at(14))]
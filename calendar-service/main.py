@@ -8,11 +8,14 @@ from datetime import timedelta
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_socketio import SocketIO
-from threading import BoundedSemaphore
 import os
 from dotenv import load_dotenv
 from models.model import Calendar, Event, UserCalendar
 from models.database import db
+from models.routing import router, engine_options, replica_binds
+from services.concurrency_limiter import ConcurrencyLimiter
+# Registers the ringredis:// rate limit storage schemes
+from services.ring_rate_limit import RingRedisStorage
 
 def create_app(db):
     load_dotenv(os.path.join(os.path.dirname(__file__), '../calendar-db/.env'))
@@ -29,20 +32,70 @@ def create_app(db):
 
     app.config['SQLALCHEMY_DATABASE_URI'] = f'postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options('DB_PRIMARY')
+    # Comma separated 'host' or 'host:port' list of streaming replicas serving the reads
+    replica_hosts = [host for host in os.getenv('POSTGRES_REPLICA_HOSTS', '').split(',') if host]
+    app.config['SQLALCHEMY_BINDS'] = replica_binds(replica_hosts, db_user, db_password, db_name, db_port)
+    app.config['REPLICA_MAX_LAG'] = float(os.getenv('REPLICA_MAX_LAG', 5))
+    app.config['REPLICA_CHECK_INTERVAL'] = float(os.getenv('REPLICA_CHECK_INTERVAL', 5))
+    app.config['REPLICA_STICKY_SECONDS'] = float(os.getenv('REPLICA_STICKY_SECONDS', 5))
+    # Read-your-writes deadlines shared by every instance of the service
+    app.config['REPLICA_STICKY_URL'] = os.getenv('REPLICA_STICKY_URL', 'redis://redis:6379/2')
     app.secret_key = 'super secret key'
     app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(days=1)
+    app.config['HEALTH_CHECK_INTERVAL'] = float(os.getenv('HEALTH_CHECK_INTERVAL', 10))
+    app.config['HEALTH_MAX_AGE'] = float(os.getenv('HEALTH_MAX_AGE', 30))
+    # Rate limits are shared by every instance: moving windows sharded over the Redis nodes
+    app.config['RATELIMIT_STORAGE_URI'] = os.getenv('RATELIMIT_STORAGE_URI', 'ringredis+sentinel://redis_node_a@sentinel_node_a:26379,redis_node_b@sentinel_node_b:26379,redis_node_c@sentinel_node_c:26379/mymaster')
+    app.config['RATELIMIT_STRATEGY'] = 'moving-window'
+    app.config['RATELIMIT_STORAGE_OPTIONS'] = {
+        'lease_fraction': float(os.getenv('RATELIMIT_LEASE_FRACTION', 0.05)),
+        'max_lease': int(os.getenv('RATELIMIT_MAX_LEASE', 100)),
+        'lease_ttl': float(os.getenv('RATELIMIT_LEASE_TTL', 0.5)),
+        # The user service keeps its tokens in database 0 of the same nodes
+        'db': int(os.getenv('RATELIMIT_REDIS_DB', 2)),
+    }
+    # Per-process limits while the Redis nodes are unreachable
+    app.config['RATELIMIT_IN_MEMORY_FALLBACK_ENABLED'] = True
+    app.config['LOG_HOST'] = os.getenv('LOG_HOST', 'logstash')
+    app.config['LOG_PORT'] = int(os.getenv('LOG_PORT', 5044))
+    app.config['LOG_QUEUE_SIZE'] = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+    app.config['LOG_BATCH_SIZE'] = int(os.getenv('LOG_BATCH_SIZE', 100))
+    app.config['LOG_FLUSH_INTERVAL'] = float(os.getenv('LOG_FLUSH_INTERVAL', 1.0))
+    app.config['LOG_QUEUE_POLICY'] = os.getenv('LOG_QUEUE_POLICY', 'drop')
 
-    socketio = SocketIO(app, cors_allowed_origins="*", logger=True, engineio_logger=True, async_mode='gevent', message_queue='redis://redis:6379/0')
+    app.config['MESSAGE_QUEUE_URL'] = os.getenv('MESSAGE_QUEUE_URL', 'redis://redis:6379/0')
+    app.config['EVENT_CACHE_URL'] = os.getenv('EVENT_CACHE_URL', 'redis://redis:6379/1')
+    app.config['EVENT_CACHE_TTL'] = float(os.getenv('EVENT_CACHE_TTL', 300))
+    app.config['MEMBERSHIP_CACHE_SIZE'] = int(os.getenv('MEMBERSHIP_CACHE_SIZE', 10000))
+    app.config['FANOUT_WINDOW'] = float(os.getenv('FANOUT_WINDOW', 0.05))
+    app.config['FANOUT_MAX_PENDING'] = int(os.getenv('FANOUT_MAX_PENDING', 1000))
+    # 'rooms' sends socket messages to the sender's calendar rooms only, 'all' to every client
+    app.config['SOCKET_MESSAGE_SCOPE'] = os.getenv('SOCKET_MESSAGE_SCOPE', 'rooms')
+    # 'copy' loads bulk events with PostgreSQL COPY, 'insert' with multi-row INSERTs
+    app.config['BULK_INSERT_METHOD'] = os.getenv('BULK_INSERT_METHOD', 'copy')
+    app.config['ICS_IMPORT_BATCH'] = int(os.getenv('ICS_IMPORT_BATCH', 1000))
+    app.config['FREEBUSY_MAX_DAYS'] = int(os.getenv('FREEBUSY_MAX_DAYS', 92))
+
+    socketio = SocketIO(app, cors_allowed_origins="*", logger=True, engineio_logger=True, async_mode='gevent', message_queue=app.config['MESSAGE_QUEUE_URL'])
     jwt = JWTManager(app)
     limiter = Limiter(get_remote_address)
-    semaphore = BoundedSemaphore(2)
+    # Adaptive per-route concurrency limits (start at 2 concurrent requests, like the old semaphore)
+    concurrency_limiter = ConcurrencyLimiter(
+        initial_limit=int(os.getenv('CONCURRENCY_INITIAL_LIMIT', 2)),
+        max_limit=int(os.getenv('CONCURRENCY_MAX_LIMIT', 20)),
+        max_queue=int(os.getenv('CONCURRENCY_MAX_QUEUE', 10)),
+        queue_timeout=float(os.getenv('CONCURRENCY_QUEUE_TIMEOUT', 1.0)),
+        latency_target=float(os.getenv('CONCURRENCY_LATENCY_TARGET', 0.5)),
+    )
 
     db.init_app(app)
+    router.init_app(app, db)
     limiter.init_app(app)
 
-    return app, db, jwt, limiter, semaphore , socketio 
+    return app, db, jwt, limiter, concurrency_limiter, socketio
 
 if __name__ == '__main__':
-    app, db, jwt, limiter, semaphore, socketio  = create_app(db)
+    app, db, jwt, limiter, concurrency_limiter, socketio = create_app(db)
     import routes.routes
     socketio.run(app=app, host='0.0.0.0', port=5002)
\ No newline at end of file
@@ -0,0 +1,19 @@
+-- Indexes for the hot lookups and unique calendar membership.
+-- Event.calendar_id lookups are served by the leading column of ix_event_calendar_id_event_start.
+
+CREATE INDEX IF NOT EXISTS ix_calendar_calendar_name ON calendar (calendar_name);
+
+CREATE INDEX IF NOT EXISTS ix_event_calendar_id_event_start ON event (calendar_id, event_start, id);
+
+-- Keep the oldest row of duplicated memberships before enforcing uniqueness.
+-- Joins from instances not migrated yet wait until the index exists (reads still go through),
+-- so no duplicate can slip in between the DELETE and the CREATE UNIQUE INDEX.
+LOCK TABLE user_calendar IN SHARE ROW EXCLUSIVE MODE;
+
+DELETE FROM user_calendar duplicate
+USING user_calendar original
+WHERE duplicate.username = original.username
+  AND duplicate.calendar_id = original.calendar_id
+  AND duplicate.id > original.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_user_calendar_username_calendar_id ON user_calendar (username, calendar_id);
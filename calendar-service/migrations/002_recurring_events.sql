@@ -0,0 +1,7 @@
+-- Recurring events are stored once, as a rule, and expanded on read.
+
+ALTER TABLE event ADD COLUMN IF NOT EXISTS rrule VARCHAR(255);
+ALTER TABLE event ADD COLUMN IF NOT EXISTS recurrence_until TIMESTAMP;
+ALTER TABLE event ADD COLUMN IF NOT EXISTS recurrence_exdates TIMESTAMP[];
+
+CREATE INDEX IF NOT EXISTS ix_event_recurring_calendar_id_event_start ON event (calendar_id, event_start) WHERE rrule IS NOT NULL;
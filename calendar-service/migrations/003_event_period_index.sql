@@ -0,0 +1,9 @@
+-- GiST index for overlap (&&) lookups of single events on (calendar_id, tsrange(event_start, event_end)).
+-- btree_gist provides the GiST operator class for the integer calendar_id column.
+-- Older rows may end before they start, which tsrange rejects: their period is clamped to empty.
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+CREATE INDEX IF NOT EXISTS ix_event_calendar_id_period ON event
+USING gist (calendar_id, tsrange(event_start, GREATEST(event_end, event_start), '[)'))
+WHERE rrule IS NULL;
@@ -0,0 +1,14 @@
+-- Databases that applied 003 before its period was clamped have an index the conflict query no longer matches.
+
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_indexes
+        WHERE indexname = 'ix_event_calendar_id_period' AND indexdef NOT ILIKE '%greatest%'
+    ) THEN
+        DROP INDEX ix_event_calendar_id_period;
+        CREATE INDEX ix_event_calendar_id_period ON event
+        USING gist (calendar_id, tsrange(event_start, GREATEST(event_end, event_start), '[)'))
+        WHERE rrule IS NULL;
+    END IF;
+END $$;
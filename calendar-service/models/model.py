@@ -2,7 +2,7 @@ from models.database import db
 
 class Calendar(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    calendar_name = db.Column(db.String(100), nullable=False)
+    calendar_name = db.Column(db.String(100), nullable=False, index=True)
     calendar_password = db.Column(db.String(100), nullable=False)
 
     def __repr__(self):
@@ -16,6 +16,20 @@ class Event(db.Model):
     created_by = db.Column(db.String(100), nullable=False)
     calendar_id = db.Column(db.Integer, db.ForeignKey('calendar.id'), nullable=False)
     calendar = db.relationship('Calendar', backref=db.backref('event', lazy=True))
+    # Recurring series: event_start/event_end are the first occurrence, expanded on read
+    rrule = db.Column(db.String(255), nullable=True)
+    # Last occurrence start (from UNTIL or COUNT), None for a series without end
+    recurrence_until = db.Column(db.DateTime, nullable=True)
+    recurrence_exdates = db.Column(db.ARRAY(db.DateTime), nullable=True)
+
+    __table_args__ = (
+        # Range reads and keyset pagination on (event_start, id) within a calendar
+        db.Index('ix_event_calendar_id_event_start', 'calendar_id', 'event_start', 'id'),
+        # Recurring series of a calendar, a small subset of the table
+        db.Index('ix_event_recurring_calendar_id_event_start', 'calendar_id', 'event_start', postgresql_where=db.text('rrule IS NOT NULL')),
+        # The GiST overlap index ix_event_calendar_id_period needs the btree_gist extension,
+        # it is created by migrations/003_event_period_index.sql
+    )
 
     def __repr__(self):
         return f'<Event {self.event_name}>'
@@ -26,5 +40,10 @@ class UserCalendar(db.Model):
     calendar_id = db.Column(db.Integer, db.ForeignKey('calendar.id'), nullable=False)
     calendar = db.relationship('Calendar', backref=db.backref('user_calendar', lazy=True))
 
+    __table_args__ = (
+        # A user is a member of a calendar at most once, also serves lookups by username
+        db.Index('uq_user_calendar_username_calendar_id', 'username', 'calendar_id', unique=True),
+    )
+
     def __repr__(self):
         return f'<UserCalendar {self.user_id}>'
\ No newline at end of file
@@ -0,0 +1,236 @@
+import itertools
+import logging
+import os
+import threading
+import time
+
+from flask import has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+from redis import Redis
+from sqlalchemy import Select, text
+
+logger = logging.getLogger(__name__)
+
+# Replay delay of a replica in seconds, 0 while it has replayed everything it received
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+def engine_options(prefix):
+    """Pool settings of one database target, read from <prefix>_POOL_SIZE, <prefix>_MAX_OVERFLOW, ..."""
+    return {
+        'pool_size': int(os.getenv(f'{prefix}_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv(f'{prefix}_MAX_OVERFLOW', 10)),
+        'pool_timeout': float(os.getenv(f'{prefix}_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.getenv(f'{prefix}_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': os.getenv(f'{prefix}_POOL_PRE_PING', 'true').lower() == 'true',
+    }
+
+def replica_binds(hosts, user, password, name, port):
+    """SQLALCHEMY_BINDS entries for the replicas, `hosts` being a list of 'host' or 'host:port'."""
+    binds = {}
+    for index, host in enumerate(hosts):
+        host, _, host_port = host.partition(':')
+        binds[f'replica_{index}'] = {
+            'url': f'postgresql://{user}:{password}@{host}:{host_port or port}/{name}',
+            **engine_options('DB_REPLICA'),
+        }
+    return binds
+
+def request_client_key():
+    """Read-your-writes key of the current request: the JWT identity if verified, else the client address."""
+    if not has_request_context():
+        return None
+    try:
+        identity = get_jwt_identity()
+    except RuntimeError:
+        # jwt_required was not used on this route
+        identity = None
+    if identity is not None:
+        return f'user:{identity}'
+    return f"client:{request.headers.get('X-Forwarded-For', request.remote_addr)}"
+
+class ReplicaRouter:
+    """Picks the engine of every session statement: replicas for plain reads, the primary otherwise.
+
+    Replicas are the SQLALCHEMY_BINDS entries named replica_*. A background
+    thread measures their replay lag every `check_interval` seconds; a
+    replica that lags more than `max_lag` seconds or fails the check gets no
+    reads until it catches up. Without a usable replica every read goes to
+    the primary.
+
+    After a commit that wrote something, the writer's reads stay on the
+    primary for `sticky_seconds`, so a client always sees its own writes.
+    The writer is identified by `sticky_key()` (see request_client_key).
+    The deadline is a short-lived key in the Redis at REPLICA_STICKY_URL,
+    shared by every instance, so it holds whichever instance serves the
+    next request; while that Redis cannot be read, reads go to the primary.
+    Without REPLICA_STICKY_URL it only holds within one instance.
+    """
+
+    def __init__(self, sticky_key=request_client_key):
+        self.sticky_key = sticky_key
+        self.replicas = {}
+        self.max_lag = 5.0
+        self.check_interval = 5.0
+        self.sticky_seconds = 5.0
+        self._lock = threading.Lock()
+        self._lag = {}
+        self._healthy = []
+        self._next = itertools.count()
+        self._sticky = {}
+        self.sticky_store = None
+        self._checked_at = None
+        self.routed = {'primary': 0, 'replica': 0}
+
+    def init_app(self, app, db):
+        self.max_lag = app.config.get('REPLICA_MAX_LAG', self.max_lag)
+        self.check_interval = app.config.get('REPLICA_CHECK_INTERVAL', self.check_interval)
+        self.sticky_seconds = app.config.get('REPLICA_STICKY_SECONDS', self.sticky_seconds)
+        if app.config.get('REPLICA_STICKY_URL'):
+            self.sticky_store = Redis.from_url(app.config['REPLICA_STICKY_URL'], socket_timeout=1)
+        with app.app_context():
+            self.replicas = {key: engine for key, engine in db.engines.items() if key and key.startswith('replica_')}
+        if self.replicas:
+            threading.Thread(target=self._run, daemon=True, name='replica-lag-checker').start()
+        return self
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Replica lag checks failed to run: {e}")
+            time.sleep(self.check_interval)
+
+    def check(self):
+        """Measures the lag of every replica once and updates the set of usable ones."""
+        lag = {}
+        for key, engine in self.replicas.items():
+            try:
+                with engine.connect() as connection:
+                    lag[key] = float(connection.execute(REPLICA_LAG_QUERY).scalar())
+            except Exception as e:
+                logger.warning(f"Replica {key} lag check failed: {e}")
+                lag[key] = None
+        healthy = [key for key, seconds in lag.items() if seconds is not None and seconds <= self.max_lag]
+        if set(healthy) != set(self._healthy):
+            logger.info(f"Usable replicas changed to {healthy}: {lag}")
+        self._lag = lag
+        self._healthy = healthy
+        self._checked_at = time.time()
+
+    def replica(self):
+        """Returns the key of the next usable replica (round robin), or None."""
+        healthy = self._healthy
+        if not healthy:
+            return None
+        return healthy[next(self._next) % len(healthy)]
+
+    def is_usable(self, key):
+        return key in self._healthy
+
+    def stick(self, key):
+        if key is None or self.sticky_seconds <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._sticky[key] = now + self.sticky_seconds
+            if len(self._sticky) > 10000:
+                self._sticky = {k: until for k, until in self._sticky.items() if until > now}
+        if self.sticky_store is not None:
+            try:
+                self.sticky_store.set(f'replica:sticky:{key}', 1, px=int(self.sticky_seconds * 1000))
+            except Exception as e:
+                logger.warning(f"Could not share the read-your-writes deadline of {key}: {e}")
+
+    def is_sticky(self, key):
+        if key is None:
+            return False
+        until = self._sticky.get(key)
+        if until is not None and until > time.monotonic():
+            return True
+        if self.sticky_store is None:
+            return False
+        try:
+            return bool(self.sticky_store.exists(f'replica:sticky:{key}'))
+        except Exception as e:
+            # Unknown: the primary is always up to date
+            logger.warning(f"Could not read the read-your-writes deadline of {key}: {e}")
+            return True
+
+    def count(self, target):
+        self.routed[target] += 1
+
+    def stats(self):
+        return {
+            'replicas': {
+                key: {
+                    'usable': key in self._healthy,
+                    'lag_seconds': self._lag.get(key),
+                    'pool': engine.pool.status(),
+                }
+                for key, engine in self.replicas.items()
+            },
+            'max_lag': self.max_lag,
+            'checked_at': self._checked_at,
+            'sticky_seconds': self.sticky_seconds,
+            'sticky_shared': self.sticky_store is not None,
+            'sticky_clients': sum(1 for until in list(self._sticky.values()) if until > time.monotonic()),
+            'routed': dict(self.routed),
+        }
+
+router = ReplicaRouter()
+
+def use_primary(session):
+    """Sends the remaining reads of a session to the primary."""
+    session.info['primary_only'] = True
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session sending plain SELECTs to a replica and everything else to the primary.
+
+    The primary also serves every read of a session once it has written
+    (those rows are not committed anywhere else yet), of a session whose
+    client has just committed (see ReplicaRouter), SELECT ... FOR UPDATE,
+    text() statements and raw connections. A session keeps reading from the
+    same replica, so its reads never go back in time.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        primary = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None or not router.replicas:
+            return primary
+        if self._flushing or not isinstance(clause, Select) or clause._for_update_arg is not None:
+            self.info['wrote'] = True
+            router.count('primary')
+            return primary
+        if self.info.get('wrote') or self._primary_only():
+            router.count('primary')
+            return primary
+        key = self.info.get('replica')
+        if key is None or not router.is_usable(key):
+            key = self.info['replica'] = router.replica()
+        if key is None:
+            router.count('primary')
+            return primary
+        router.count('replica')
+        return router.replicas[key]
+
+    def _primary_only(self):
+        # Checked once per session, the client cannot write in between through another session
+        if 'primary_only' not in self.info:
+            self.info['primary_only'] = router.is_sticky(router.sticky_key())
+        return self.info['primary_only']
+
+    def commit(self):
+        # Pending objects are flushed by the commit itself
+        super().commit()
+        if self.info.pop('wrote', False):
+            router.stick(router.sticky_key())
+            self.info['primary_only'] = True
+
+    def rollback(self):
+        super().rollback()
+        self.info.pop('wrote', None)
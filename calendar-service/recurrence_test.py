@@ -0,0 +1,77 @@
+import pytest
+from datetime import datetime, timedelta
+from itertools import islice
+
+from services.recurrence import MAX_COUNT, MAX_INTERVAL, ExpansionCache, last_start, occurrences, parse_rrule, recurrence_columns
+
+START = datetime(2024, 1, 31, 9, 0)
+
+def test_parse_rrule():
+    rule = parse_rrule('RRULE:FREQ=WEEKLY;INTERVAL=2;BYDAY=FR,MO;COUNT=4')
+    assert rule.freq == 'WEEKLY'
+    assert rule.interval == 2
+    assert rule.count == 4
+    assert rule.byday == (0, 4)
+
+@pytest.mark.parametrize('text', [
+    'FREQ=HOURLY',
+    'FREQ=DAILY;BYMONTH=1',
+    'FREQ=DAILY;COUNT=2;UNTIL=20240101',
+    'FREQ=DAILY;INTERVAL=0',
+    f'FREQ=DAILY;INTERVAL={MAX_INTERVAL + 1}',
+    f'FREQ=DAILY;COUNT={MAX_COUNT + 1}',
+    'FREQ=MONTHLY;BYDAY=MO',
+])
+def test_parse_rrule_rejects(text):
+    with pytest.raises(ValueError):
+        parse_rrule(text)
+
+def test_daily_occurrences_in_window():
+    rule = parse_rrule('FREQ=DAILY;INTERVAL=3')
+    starts = list(occurrences(rule, START, datetime(2024, 2, 4), datetime(2024, 2, 12)))
+    assert starts == [datetime(2024, 2, 6, 9, 0), datetime(2024, 2, 9, 9, 0)]
+
+def test_weekly_byday_occurrences():
+    rule = parse_rrule('FREQ=WEEKLY;BYDAY=MO,WE')
+    starts = list(islice(occurrences(rule, START), 4))
+    assert starts == [START, datetime(2024, 2, 5, 9, 0), datetime(2024, 2, 7, 9, 0), datetime(2024, 2, 12, 9, 0)]
+
+def test_monthly_skips_missing_days():
+    rule = parse_rrule('FREQ=MONTHLY')
+    starts = list(islice(occurrences(rule, START), 3))
+    assert starts == [START, datetime(2024, 3, 31, 9, 0), datetime(2024, 5, 31, 9, 0)]
+
+def test_until_and_exdates():
+    rule = parse_rrule('FREQ=DAILY;UNTIL=20240203')
+    until = last_start(rule, START)
+    starts = list(occurrences(rule, START, until=until, exdates=[datetime(2024, 2, 1, 9, 0)]))
+    assert starts == [START, datetime(2024, 2, 2, 9, 0), datetime(2024, 2, 3, 9, 0)]
+
+def test_count_resolves_last_start():
+    assert recurrence_columns('FREQ=WEEKLY;COUNT=3', START)['recurrence_until'] == START + timedelta(weeks=2)
+
+@pytest.mark.parametrize('text', [
+    f'FREQ=YEARLY;INTERVAL={MAX_INTERVAL}',
+    f'FREQ=DAILY;INTERVAL={MAX_INTERVAL}',
+    f'FREQ=WEEKLY;INTERVAL={MAX_INTERVAL};BYDAY=MO,SU',
+    f'FREQ=MONTHLY;INTERVAL={MAX_INTERVAL}',
+])
+def test_open_series_end_before_datetime_max(text):
+    rule = parse_rrule(text)
+    starts = list(islice(occurrences(rule, START, datetime(9000, 1, 1)), 100))
+    assert starts and starts[-1] <= datetime.max
+    assert list(occurrences(rule, START, datetime.max - timedelta(days=1))) == []
+
+def test_count_past_datetime_max():
+    rule = parse_rrule(f'FREQ=YEARLY;INTERVAL={MAX_INTERVAL};COUNT=20')
+    assert last_start(rule, START) == datetime(9024, 1, 31, 9, 0)
+
+def test_expansion_cache():
+    cache = ExpansionCache(maxsize=1)
+    rule = parse_rrule('FREQ=DAILY')
+    window = (datetime(2024, 2, 1), datetime(2024, 2, 3))
+    first = cache.expand('series', rule, START, *window, None, ())
+    assert cache.expand('series', rule, START, *window, None, ()) is first
+    assert cache.stats()['hits'] == 1
+    cache.expand('other', rule, START, *window, None, ())
+    assert cache.stats()['size'] == 1
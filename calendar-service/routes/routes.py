@@ -1,34 +1,126 @@
-from flask import request, jsonify, session
-from flask_socketio import emit, join_room, leave_room
+from flask import request, jsonify, session, Response, stream_with_context
+from flask_socketio import emit, join_room, leave_room, rooms
 from models.model import Calendar, Event, UserCalendar
 from flask_limiter.util import get_remote_address
 from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token
-from __main__ import app, db, jwt, limiter, semaphore, socketio
+from __main__ import app, db, jwt, limiter, concurrency_limiter, socketio
+import io
+import time
+from datetime import timedelta
 import logging
 import logstash
+from itertools import chain
+from redis import Redis
+from sqlalchemy.exc import IntegrityError
+from models.routing import router, use_primary
+from services.health import HealthMonitor, database_probe
+from services.log_shipper import BatchingLogHandler
+from services.event_queries import calendar_members, member_busy_intervals, parse_datetime, parse_page_args, calendar_events_page, feed_page, feed_event_to_dict, stream_events_page
+from services.event_cache import EventCache
+from services.membership_cache import MembershipCache
+from services.socket_auth import SocketSessions
+from services.fanout import RoomBroadcaster
+from services.bulk_insert import MAX_BULK_EVENTS, parse_events, insert_events, summarize
+from services.icalendar import export_calendar, parse_events as parse_ics_events, batches
+from services.recurrence import expansion_cache
+from services.intervals import merge_intervals, clip, free_slots
+from services.conflicts import CONFLICT_MODES, check_conflicts
+from services.ring_rate_limit import RingRedisStorage
 
-# Set up logging
+# Set up logging, records are shipped to Logstash in batches from a background thread
 logger = logging.getLogger('python-logstash-logger')
 logger.setLevel(logging.INFO)
-logger.addHandler(logstash.TCPLogstashHandler('logstash', 5044, version=1))
+log_shipper = BatchingLogHandler(
+    logstash.TCPLogstashHandler(app.config['LOG_HOST'], app.config['LOG_PORT'], version=1),
+    capacity=app.config['LOG_QUEUE_SIZE'],
+    batch_size=app.config['LOG_BATCH_SIZE'],
+    flush_interval=app.config['LOG_FLUSH_INTERVAL'],
+    policy=app.config['LOG_QUEUE_POLICY'],
+)
+logger.addHandler(log_shipper)
+
+# Background health probes, the status endpoints only read the cached result
+message_queue = Redis.from_url(app.config['MESSAGE_QUEUE_URL'], socket_timeout=1)
+health = HealthMonitor(
+    {
+        'database': database_probe(app, db),
+        'message_queue': message_queue.ping,
+    },
+    critical=['database'],
+    interval=app.config['HEALTH_CHECK_INTERVAL'],
+    max_age=app.config['HEALTH_MAX_AGE'],
+).start()
+
+# Rendered get_events pages, invalidated whenever an event is added to the calendar
+event_cache = EventCache(Redis.from_url(app.config['EVENT_CACHE_URL'], socket_timeout=1), ttl=app.config['EVENT_CACHE_TTL'])
+
+# Calendar ids and memberships verified by socket sessions, evictions are shared through the message queue
+memberships = MembershipCache(message_queue, maxsize=app.config['MEMBERSHIP_CACHE_SIZE']).listen()
+
+# Socket sessions are authenticated once at connect, handlers only check the session
+sockets = SocketSessions()
+
+# Room notifications are coalesced and sent as one batch per room every FANOUT_WINDOW seconds
+broadcaster = RoomBroadcaster(socketio, window=app.config['FANOUT_WINDOW'], max_pending=app.config['FANOUT_MAX_PENDING']).start()
+
+def find_calendar(calendar_name):
+    # Calendar names are not unique: a name always resolves to its oldest calendar, so every instance caches the same id
+    return Calendar.query.filter_by(calendar_name=calendar_name).order_by(Calendar.id).first()
+
+def load_calendar_id(calendar_name):
+    calendar = find_calendar(calendar_name)
+    return calendar.id if calendar else None
+
+def load_user_calendar_id(username):
+    # The calendar the user joined first, the same one on every instance
+    user_calendar = UserCalendar.query.filter_by(username=username).order_by(UserCalendar.id).first()
+    return user_calendar.calendar_id if user_calendar else None
+
+def load_membership(username, calendar_id):
+    return UserCalendar.query.filter_by(username=username, calendar_id=calendar_id).first() is not None
 
 @socketio.on('connect')
-@jwt_required()
 def connect():
+    sockets.open()
     print('Connected')
     emit('message', f"{request.sid} has connected")
 
 @socketio.on('disconnect')
-@jwt_required()
 def disconnect():
     print('Disconnected')
+    memberships.forget_session(request.sid)
+    sockets.close()
     emit('message', f"{request.sid} has disconnected")
 
+@socketio.on('authenticate')
+def authenticate(data):
+    try:
+        sockets.refresh(data['token'])
+    except (KeyError, TypeError, ValueError) as e:
+        emit('message', str(e))
+        return
+    emit('message', 'Session refreshed')
+
 @socketio.on('message')
-@jwt_required()
+@sockets.required
 def message(data):
     print(f"Message: {data}")
-    emit('message', data, broadcast=True)
+    if app.config['SOCKET_MESSAGE_SCOPE'] == 'all':
+        emit('message', data, broadcast=True)
+        return
+    # Only the calendar rooms of the sender (or the one named in the message) receive it
+    joined = [room for room in rooms() if room != request.sid]
+    calendar_name = data.get('calendar_name') if isinstance(data, dict) else None
+    if calendar_name is not None:
+        if calendar_name not in joined:
+            emit('message', 'Join the calendar before sending messages to it')
+            return
+        joined = [calendar_name]
+    if not joined:
+        emit('message', 'Join a calendar before sending messages')
+        return
+    for room in joined:
+        broadcaster.publish(room, 'message', {'from': sockets.identity(), 'data': data})
 
 # @socketio.on("created_event")
 # def created_event(data):
@@ -36,75 +128,138 @@ def message(data):
 #     emit("event_created", data)
 
 @socketio.on("join_calendar")
-@jwt_required()
+@sockets.required
 def join_calendar(data):
-    username = get_jwt_identity()
+    username = sockets.identity()
     calendar_name = data['calendar_name']
-    calendar = Calendar.query.filter_by(calendar_name=calendar_name).first()
-    if not calendar:
+    calendar_id = memberships.calendar_id(calendar_name, load_calendar_id)
+    if calendar_id is None:
         emit("message", "Calendar does not exist", broadcast=True)
-    user_calendar = UserCalendar.query.filter_by(username=username, calendar_id=calendar.id).first()
-    if user_calendar:
+        return
+    if memberships.is_member(request.sid, username, calendar_id, load_membership):
+        # Membership is unique, only (re)join the room
+        join_room(calendar_name)
         emit("message", "User in calendar", room=calendar_name)
-    user_calendar = UserCalendar(username=username, calendar_id=calendar.id)
+        return
+    user_calendar = UserCalendar(username=username, calendar_id=calendar_id)
     db.session.add(user_calendar)
-    db.session.commit()
+    try:
+        db.session.commit()
+        joined = True
+    except IntegrityError:
+        # Joined concurrently, uq_user_calendar_username_calendar_id already holds the membership
+        db.session.rollback()
+        joined = False
+    # The memberships of the user changed, every instance reloads what it cached about them
+    memberships.remove(username, calendar_id)
+    memberships.add(request.sid, username, calendar_id)
 
     join_room(calendar_name)
+    if not joined:
+        emit("message", "User in calendar", room=calendar_name)
+        return
     emit("message", f"Joined calendar {calendar_name}", room=calendar_name, broadcast=True)
 
 @socketio.on("leave_calendar")
-@jwt_required()
+@sockets.required
 def leave_calendar(data):
-    username = get_jwt_identity()
+    username = sockets.identity()
     calendar_name = data['calendar_name']
-    calendar = Calendar.query.filter_by(calendar_name=calendar_name).first()
-    if not calendar:
+    calendar_id = memberships.calendar_id(calendar_name, load_calendar_id)
+    if calendar_id is None:
         emit("message", "Calendar does not exist")
-    user_calendar = UserCalendar.query.filter_by(username=username, calendar_id=calendar.id).first()
-    if not user_calendar:
-        emit("message", "User not in calendar")
-    db.session.delete(user_calendar)
+        return
+    # Delete directly instead of looking the membership up first
+    deleted = UserCalendar.query.filter_by(username=username, calendar_id=calendar_id).delete()
     db.session.commit()
+    memberships.remove(username, calendar_id)
+    if not deleted:
+        emit("message", "User not in calendar")
+        return
 
     leave_room(calendar_name)
     emit("message", f"Left calendar {calendar_name}")
 
 # Event for checking the status of the service and the database
 @app.route('/api/calendar/status', methods=['GET', 'POST'])
+@app.route('/api/calendar/status/ready', methods=['GET'])
 def status():
-    try:
-        semaphore.acquire()
-        calendars = Calendar.query.all()
-        events = Event.query.all()
-        user_calendars = UserCalendar.query.all()
-        if calendars and events and user_calendars:
-            logger.info('microservice: Service and database are up and running', extra={'service': 'calendar-service' ,'status': 'success'})
-            return jsonify({'message': 'Service and database are up and running'}), 200
-    finally:
-        semaphore.release()
+    ready, payload = health.readiness()
+    if not ready:
+        return jsonify({'message': 'Service is not ready', **payload}), 503
+    return jsonify({'message': 'Service and database are up and running', **payload}), 200
+
+# Event for checking that the service process is alive
+@app.route('/api/calendar/status/live', methods=['GET'])
+def liveness():
+    return jsonify(health.liveness()), 200
+
+# Event for checking the concurrency limits of the service
+@app.route('/api/calendar/limits', methods=['GET'])
+def limits_status():
+    return jsonify(concurrency_limiter.stats()), 200
+
+# Event for checking the shared rate limit counters of the service
+@app.route('/api/calendar/rate_limits', methods=['GET'])
+def rate_limits_status():
+    storage = limiter.storage
+    if isinstance(storage, RingRedisStorage):
+        return jsonify(storage.stats()), 200
+    return jsonify({'storage': type(storage).__name__}), 200
+
+# Event for checking the log shipping counters of the service
+@app.route('/api/calendar/log_shipper', methods=['GET'])
+def log_shipper_status():
+    return jsonify(log_shipper.stats()), 200
+
+# Event for checking the hit/miss counters of the event cache
+@app.route('/api/calendar/event_cache', methods=['GET'])
+def event_cache_status():
+    return jsonify(event_cache.stats()), 200
+
+# Event for checking the socket membership cache of the service
+@app.route('/api/calendar/membership_cache', methods=['GET'])
+def membership_cache_status():
+    return jsonify(memberships.stats()), 200
+
+# Event for checking the authenticated socket sessions of the service
+@app.route('/api/calendar/socket_sessions', methods=['GET'])
+def socket_sessions_status():
+    return jsonify(sockets.stats()), 200
+
+# Event for checking the room fan-out rates and batch sizes of the service
+@app.route('/api/calendar/fanout', methods=['GET'])
+def fanout_status():
+    return jsonify(broadcaster.stats()), 200
+
+# Event for checking the read replica routing of the service
+@app.route('/api/calendar/db_routing', methods=['GET'])
+def db_routing_status():
+    return jsonify(router.stats()), 200
+
+# Event for checking the recurring event expansion cache of the service
+@app.route('/api/calendar/recurrence_cache', methods=['GET'])
+def recurrence_cache_status():
+    return jsonify(expansion_cache.stats()), 200
 
 # Event for creating a new calendar
 @app.route('/api/calendar/create_calendar', methods=['POST'])
 @jwt_required()
 @limiter.limit("5 per minute")
+@concurrency_limiter.limit('create_calendar')
 def create_calendar():
-    try:
-        semaphore.acquire()
-        data = request.get_json()
-        calendar_name = data['calendar_name']
-        calendar_password = data['calendar_password']
-        if Calendar.query.filter_by(calendar_name=calendar_name).first():
-            logger.error('microservice: Calendar already exists', extra={'service': 'calendar-service' ,'status': 'error'})
-            return jsonify({'message': 'Calendar already exists'}), 409
-
-        new_calendar = Calendar(calendar_name=calendar_name, calendar_password=calendar_password)
-        db.session.add(new_calendar)
-        db.session.commit()
-        logger.info('microservice: New calendar created', extra={'service': 'calendar-service' ,'status': 'success'})
-        return jsonify({'message': 'New calendar created'}), 201
-    finally:
-        semaphore.release()
+    data = request.get_json()
+    calendar_name = data['calendar_name']
+    calendar_password = data['calendar_password']
+    if Calendar.query.filter_by(calendar_name=calendar_name).first():
+        logger.error('microservice: Calendar already exists', extra={'service': 'calendar-service' ,'status': 'error'})
+        return jsonify({'message': 'Calendar already exists'}), 409
+
+    new_calendar = Calendar(calendar_name=calendar_name, calendar_password=calendar_password)
+    db.session.add(new_calendar)
+    db.session.commit()
+    logger.info('microservice: New calendar created', extra={'service': 'calendar-service' ,'status': 'success'})
+    return jsonify({'message': 'New calendar created'}), 201
 
 # Event for joining a calendar
 # @app.route('/api/calendar/join_calendar', methods=['POST'])
@@ -167,48 +322,256 @@ def create_calendar():
 
 # Event for creating a new event
 @socketio.on('create_event')
-@jwt_required()
+@sockets.required
 def create_event(data):
-    username = get_jwt_identity()
+    username = sockets.identity()
     event_name = data['event_name']
     event_start = data['event_start']
     event_end = data['event_end']
     calendar_name = data['calendar_name']
-    calendar = Calendar.query.filter_by(calendar_name=calendar_name).first()
-    if not calendar:
-        return jsonify({'message': 'Calendar does not exist'}), 404
-    user_calendar = UserCalendar.query.filter_by(username=username, calendar_id=calendar.id).first()
-    if not user_calendar:
-        return jsonify({'message': 'User not in calendar'}), 404
-    new_event = Event(event_name=event_name, event_start=event_start, event_end=event_end, created_by=username, calendar_id=calendar.id)
+    calendar_id = memberships.calendar_id(calendar_name, load_calendar_id)
+    if calendar_id is None:
+        emit("message", "Calendar does not exist")
+        return
+    if not memberships.is_member(request.sid, username, calendar_id, load_membership):
+        emit("message", "User not in calendar")
+        return
+    conflict_mode = data.get('conflicts', 'ignore')
+    if conflict_mode not in CONFLICT_MODES:
+        emit("message", f"'conflicts' must be one of {', '.join(CONFLICT_MODES)}")
+        return
+    try:
+        rows = parse_events([data], username, calendar_id)
+    except ValueError as e:
+        emit("message", str(e))
+        return
+    conflicts, allowed = check_conflicts(calendar_id, rows, conflict_mode)
+    if not allowed:
+        db.session.rollback()
+        emit("conflicts", {'calendar_name': calendar_name, 'created': False, 'conflicts_with': conflicts[0]['conflicts_with']})
+        return
+    new_event = Event(**rows[0])
     db.session.add(new_event)
+    db.session.flush()
+    # Read the id before the commit expires the object
+    event_id = new_event.id
     db.session.commit()
+    event_cache.invalidate(calendar_id)
+    if conflicts:
+        emit("conflicts", {'calendar_name': calendar_name, 'created': True, 'id': event_id, 'conflicts_with': conflicts[0]['conflicts_with']})
 
-    # Emit event to all users in the calendar
-    emit("created_event", f"New event {event_name} created by {username}", room=calendar_name)
+    # Notify all users in the calendar, batched with the other events of the window
+    broadcaster.publish(calendar_name, 'created_event', {'id': event_id, 'event_name': event_name, 'event_start': event_start, 'event_end': event_end, 'created_by': username, 'rrule': rows[0]['rrule']})
     print(f"New event {event_name} created by {username}")
 
+def create_events_in(calendar_name, calendar_id, username, items, conflict_mode='ignore'):
+    """Validates and inserts a batch of events in one transaction, then sends one room notification.
+
+    Returns (created, conflicts). With conflict_mode 'reject' nothing is
+    inserted when any event conflicts. Raises ValueError on invalid input,
+    nothing is inserted then either.
+    """
+    if not isinstance(items, list) or not items:
+        raise ValueError("'events' must be a non-empty list")
+    if len(items) > MAX_BULK_EVENTS:
+        raise ValueError(f"At most {MAX_BULK_EVENTS} events per request")
+    if conflict_mode not in CONFLICT_MODES:
+        raise ValueError(f"'conflicts' must be one of {', '.join(CONFLICT_MODES)}")
+    rows = parse_events(items, username, calendar_id)
+    conflicts, allowed = check_conflicts(calendar_id, rows, conflict_mode)
+    if not allowed:
+        db.session.rollback()
+        return 0, conflicts
+    insert_events(rows, method=app.config['BULK_INSERT_METHOD'])
+    db.session.commit()
+    event_cache.invalidate(calendar_id)
+    broadcaster.publish(calendar_name, 'created_events', summarize(rows, username))
+    return len(rows), conflicts
+
+# Event for creating many events at once
+@socketio.on('create_events')
+@sockets.required
+def create_events(data):
+    username = sockets.identity()
+    calendar_name = data['calendar_name']
+    calendar_id = memberships.calendar_id(calendar_name, load_calendar_id)
+    if calendar_id is None:
+        emit("message", "Calendar does not exist")
+        return
+    if not memberships.is_member(request.sid, username, calendar_id, load_membership):
+        emit("message", "User not in calendar")
+        return
+    try:
+        created, conflicts = create_events_in(calendar_name, calendar_id, username, data.get('events'), data.get('conflicts', 'ignore'))
+    except ValueError as e:
+        emit("message", str(e))
+        return
+    if conflicts:
+        emit("conflicts", {'calendar_name': calendar_name, 'created': bool(created), 'conflicts': conflicts})
+    emit("message", f"{created} events created in {calendar_name}")
 
-# Event for getting all events in a calendar
+# Event for creating many events at once over HTTP
+@app.route('/api/calendar/events/bulk', methods=['POST'])
+@jwt_required()
+@limiter.limit("5 per minute")
+@concurrency_limiter.limit('bulk_events')
+def bulk_events():
+    data = request.get_json()
+    username = get_jwt_identity()
+    calendar_name = data['calendar_name']
+    calendar = find_calendar(calendar_name)
+    if not calendar:
+        return jsonify({'message': 'Calendar does not exist'}), 404
+    if not load_membership(username, calendar.id):
+        return jsonify({'message': 'User not in calendar'}), 404
+    try:
+        created, conflicts = create_events_in(calendar_name, calendar.id, username, data.get('events'), data.get('conflicts', 'ignore'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    if not created:
+        return jsonify({'message': 'Events conflict with existing events', 'created': 0, 'conflicts': conflicts}), 409
+    logger.info('microservice: Events created in bulk', extra={'service': 'calendar-service' ,'status': 'success'})
+    return jsonify({'message': 'Events created', 'created': created, 'conflicts': conflicts}), 201
+
+
+# Event for getting the events in a calendar, filtered by time range and paginated
 @app.route('/api/calendar/get_events', methods=['GET'])
 @jwt_required()
 @limiter.limit("5 per minute")
+@concurrency_limiter.limit('get_events')
 def get_events():
     try:
-        semaphore.acquire()
-        username = get_jwt_identity()
-        user_calendar = UserCalendar.query.filter_by(username=username).first()
-        if not user_calendar:
-            logger.error('microservice: User not in calendar', extra={'service': 'calendar-service' ,'status': 'error'})
-            return jsonify({'message': 'User not in calendar'}), 404
-        events = Event.query.filter_by(calendar_id=user_calendar.calendar_id).all()
-        if not events:
-            logger.error('microservice: No events found', extra={'service': 'calendar-service' ,'status': 'error'})
-            return jsonify({'message': 'No events found'}), 404
-        event_list = []
-        for event in events:
-            event_list.append({'event_name': event.event_name, 'event_start': event.event_start, 'event_end': event.event_end, 'created_by': event.created_by})
+        start, end, after, limit = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    username = get_jwt_identity()
+    # Cached, so a cached page is served without any database query
+    calendar_id = memberships.user_calendar_id(username, load_user_calendar_id)
+    if calendar_id is None:
+        logger.error('microservice: User not in calendar', extra={'service': 'calendar-service' ,'status': 'error'})
+        return jsonify({'message': 'User not in calendar'}), 404
+    params = (start, end, after, limit)
+    body, version = event_cache.lookup(calendar_id, params)
+    lock = None
+    if body is None and version is not None:
+        lock = event_cache.acquire_fill_lock(calendar_id, params, version)
+        if lock is None:
+            # Another request is rendering this page, reuse its result
+            body = event_cache.wait_for_fill(calendar_id, params, version)
+    if body is not None:
         logger.info('microservice: Events found', extra={'service': 'calendar-service' ,'status': 'success'})
-        return jsonify({'events': event_list}), 200
-    finally:
-        semaphore.release()
\ No newline at end of file
+        return Response(body, mimetype='application/json'), 200
+
+    if lock is not None:
+        # A cached page is shared until the next write, never fill it from a lagging replica
+        use_primary(db.session)
+    rows = iter(calendar_events_page(calendar_id, start, end, after, limit))
+    first = next(rows, None)
+    if first is None and after is None:
+        if lock is not None:
+            event_cache.release_fill_lock(calendar_id, params, version, lock)
+        logger.error('microservice: No events found', extra={'service': 'calendar-service' ,'status': 'error'})
+        return jsonify({'message': 'No events found'}), 404
+    logger.info('microservice: Events found', extra={'service': 'calendar-service' ,'status': 'success'})
+    page = stream_events_page(chain([first], rows) if first is not None else rows, limit)
+    if lock is not None:
+        page = event_cache.filling(page, calendar_id, params, version, lock)
+    return Response(stream_with_context(page), mimetype='application/json'), 200
+
+# Event for exporting a whole calendar as an iCalendar (.ics) file, streamed
+@app.route('/api/calendar/export', methods=['GET'])
+@jwt_required()
+@limiter.limit("5 per minute")
+@concurrency_limiter.limit('export_calendar', max_limit=4, latency_target=60.0)
+def export():
+    username = get_jwt_identity()
+    calendar_name = request.args.get('calendar', '')
+    calendar = find_calendar(calendar_name)
+    if not calendar or not load_membership(username, calendar.id):
+        return jsonify({'message': 'Calendar does not exist or user not in calendar'}), 404
+    logger.info('microservice: Calendar exported', extra={'service': 'calendar-service' ,'status': 'success'})
+    headers = {'Content-Disposition': f'attachment; filename="{calendar.id}.ics"'}
+    return Response(stream_with_context(export_calendar(calendar.id, calendar_name)), mimetype='text/calendar', headers=headers), 200
+
+# Event for importing an iCalendar (.ics) file into a calendar, parsed and inserted in batches
+@app.route('/api/calendar/import', methods=['POST'])
+@jwt_required()
+@limiter.limit("5 per minute")
+@concurrency_limiter.limit('import_calendar', max_limit=4, latency_target=60.0)
+def import_events():
+    username = get_jwt_identity()
+    calendar_name = request.args.get('calendar', '')
+    calendar = find_calendar(calendar_name)
+    if not calendar or not load_membership(username, calendar.id):
+        return jsonify({'message': 'Calendar does not exist or user not in calendar'}), 404
+    summary = None
+    created = 0
+    # The body is read line by line, only one batch of events is held at a time
+    lines = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    try:
+        for batch in batches(parse_ics_events(lines), app.config['ICS_IMPORT_BATCH']):
+            rows = parse_events(batch, username, calendar.id, offset=created)
+            created += insert_events(rows, method=app.config['BULK_INSERT_METHOD'])
+            summary = summarize(rows, username, summary)
+    except (ValueError, UnicodeDecodeError) as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
+    if not created:
+        return jsonify({'message': 'No events found'}), 400
+    # One transaction for the whole file, a failed import leaves nothing behind
+    db.session.commit()
+    event_cache.invalidate(calendar.id)
+    broadcaster.publish(calendar_name, 'created_events', summary)
+    logger.info('microservice: Calendar imported', extra={'service': 'calendar-service' ,'status': 'success'})
+    return jsonify({'message': 'Events imported', 'created': created}), 201
+
+# Event for getting the merged busy blocks and the free slots of all the members of a calendar
+@app.route('/api/calendar/freebusy', methods=['GET'])
+@jwt_required()
+@limiter.limit("5 per minute")
+@concurrency_limiter.limit('freebusy')
+def freebusy():
+    username = get_jwt_identity()
+    calendar_name = request.args.get('calendar', '')
+    try:
+        start = parse_datetime(request.args['from'])
+        end = parse_datetime(request.args['to'])
+        min_length = timedelta(minutes=request.args.get('min_minutes', 30, type=int))
+    except (KeyError, ValueError) as e:
+        return jsonify({'message': f"'from' and 'to' are required ISO 8601 datetimes: {e}"}), 400
+    if start >= end or end - start > timedelta(days=app.config['FREEBUSY_MAX_DAYS']):
+        return jsonify({'message': f"'from' must be before 'to', at most {app.config['FREEBUSY_MAX_DAYS']} days apart"}), 400
+    calendar = find_calendar(calendar_name)
+    if not calendar or not load_membership(username, calendar.id):
+        return jsonify({'message': 'Calendar does not exist or user not in calendar'}), 404
+    started = time.perf_counter()
+    # Busy time of a member: the events they created in their calendars (see member_busy_intervals)
+    busy = merge_intervals(clip(member_busy_intervals(calendar.id, start, end), start, end))
+    free = free_slots(busy, start, end, min_length)
+    logger.info('microservice: Free/busy computed', extra={'service': 'calendar-service' ,'status': 'success'})
+    return jsonify({
+        'calendar_name': calendar_name,
+        'from': start,
+        'to': end,
+        'members': calendar_members(calendar.id),
+        'busy': [{'start': block_start, 'end': block_end} for block_start, block_end in busy],
+        'free': [{'start': slot_start, 'end': slot_end} for slot_start, slot_end in free],
+        'compute_ms': round((time.perf_counter() - started) * 1000, 3),
+    }), 200
+
+# Event for getting one time-ordered feed of the events of all the user's calendars
+@app.route('/api/calendar/feed', methods=['GET'])
+@jwt_required()
+@limiter.limit("5 per minute")
+@concurrency_limiter.limit('feed')
+def feed():
+    try:
+        start, end, after, limit = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    username = get_jwt_identity()
+    calendar_names = request.args.getlist('calendar')
+    rows = feed_page(username, calendar_names, start, end, after, limit)
+    logger.info('microservice: Feed requested', extra={'service': 'calendar-service' ,'status': 'success'})
+    page = stream_events_page(rows, limit, to_dict=feed_event_to_dict)
+    return Response(stream_with_context(page), mimetype='application/json'), 200
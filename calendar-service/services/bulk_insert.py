@@ -0,0 +1,88 @@
+import csv
+import io
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from models.database import db
+from models.model import Event
+from services.event_queries import parse_datetime
+from services.recurrence import recurrence_columns
+
+MAX_BULK_EVENTS = 10000
+
+# Columns written by COPY, in the order of the CSV fields
+COPY_COLUMNS = ('event_name', 'event_start', 'event_end', 'created_by', 'calendar_id', 'rrule', 'recurrence_until', 'recurrence_exdates')
+
+def parse_events(items, username, calendar_id, offset=0):
+    """Validates bulk event payloads into insert rows. Raises ValueError naming the first bad item.
+
+    `offset` is the index of the first item when a larger import is validated batch by batch.
+    """
+    rows = []
+    for index, item in enumerate(items, offset):
+        try:
+            event_name = item['event_name']
+            event_start = _as_datetime(item['event_start'])
+            event_end = _as_datetime(item['event_end'])
+            exdates = [_as_datetime(value) for value in item.get('exdates') or ()]
+            recurrence = recurrence_columns(item.get('rrule'), event_start, exdates)
+        except (KeyError, TypeError, ValueError, OverflowError) as e:
+            raise ValueError(f"Invalid event at index {index}: {e}") from e
+        if not isinstance(event_name, str) or not 0 < len(event_name) <= 100:
+            raise ValueError(f"Invalid event at index {index}: event_name must be 1 to 100 characters")
+        if event_start is None or event_end is None or event_end < event_start:
+            raise ValueError(f"Invalid event at index {index}: event_end must not be before event_start")
+        rows.append({'event_name': event_name, 'event_start': event_start, 'event_end': event_end, 'created_by': username, 'calendar_id': calendar_id, **recurrence})
+    return rows
+
+def _as_datetime(value):
+    # Parsed imports already carry datetimes, JSON payloads carry ISO 8601 strings
+    return value if isinstance(value, datetime) else parse_datetime(value)
+
+def insert_events(rows, method='copy'):
+    """Inserts event rows in the current transaction, the caller commits. Returns the row count.
+
+    'copy' streams the rows to PostgreSQL with a single COPY, 'insert' sends
+    multi-row INSERT statements (SQLAlchemy batches executemany into
+    INSERT ... VALUES (...), (...)). Other databases always use 'insert'.
+    """
+    if not rows:
+        return 0
+    if method == 'copy' and db.session.get_bind().dialect.name == 'postgresql':
+        _copy(rows)
+    else:
+        db.session.execute(insert(Event), rows)
+    return len(rows)
+
+def _copy_value(value):
+    # Lists become PostgreSQL array literals, None an unquoted empty field (NULL)
+    if isinstance(value, list):
+        return '{' + ','.join(f'"{item}"' for item in value) + '}'
+    return value
+
+def _copy(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_copy_value(row[column]) for column in COPY_COLUMNS])
+    buffer.seek(0)
+    # Raw psycopg2 cursor on the session's connection, so COPY joins the session transaction
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {Event.__table__.name} ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+def summarize(rows, username, summary=None):
+    """Single room notification item describing a bulk insert, extending `summary` for batched imports."""
+    first = min(row['event_start'] for row in rows).isoformat()
+    last = max(row['event_start'] for row in rows).isoformat()
+    if summary is None:
+        return {'count': len(rows), 'created_by': username, 'first_start': first, 'last_start': last}
+    return {
+        'count': summary['count'] + len(rows),
+        'created_by': username,
+        'first_start': min(summary['first_start'], first),
+        'last_start': max(summary['last_start'], last),
+    }
@@ -0,0 +1,62 @@
+"""Rows/second of event imports: one commit per event versus the bulk insert paths.
+
+Runs against the configured database, in a scratch calendar that is removed afterwards.
+Run from the calendar-service directory:
+    python3 -m services.bulk_insert_benchmark [--events 10000]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from main import create_app, db, Calendar, Event
+from services.bulk_insert import insert_events, parse_events
+
+CALENDAR_NAME = 'bulk-insert-benchmark'
+
+def make_rows(count, calendar_id):
+    # Built like the rows of a real import, recurrence columns included
+    start = datetime(2025, 1, 1, 18)
+    return parse_events(
+        ({'event_name': f'Practice {i}', 'event_start': start + timedelta(days=i), 'event_end': start + timedelta(days=i, hours=2)} for i in range(count)),
+        'benchmark', calendar_id,
+    )
+
+def one_commit_per_event(rows):
+    # What importing through the create_event handler costs
+    for row in rows:
+        db.session.add(Event(**row))
+        db.session.commit()
+
+def bulk(method):
+    def run(rows):
+        insert_events(rows, method=method)
+        db.session.commit()
+    return run
+
+def report(count):
+    app, _, _, _, _, _ = create_app(db)
+    with app.app_context():
+        calendar = Calendar(calendar_name=CALENDAR_NAME, calendar_password='benchmark')
+        db.session.add(calendar)
+        db.session.commit()
+        calendar_id = calendar.id
+        try:
+            print(f"{count} events per run")
+            for name, run in (('one commit per event', one_commit_per_event), ('multi-row insert', bulk('insert')), ('COPY', bulk('copy'))):
+                rows = make_rows(count, calendar_id)
+                start = time.perf_counter()
+                run(rows)
+                elapsed = time.perf_counter() - start
+                print(f"  {name:22} {elapsed:8.3f} s  {count / elapsed:12,.0f} rows/s")
+                Event.query.filter_by(calendar_id=calendar_id).delete()
+                db.session.commit()
+        finally:
+            db.session.rollback()
+            Event.query.filter_by(calendar_id=calendar_id).delete()
+            Calendar.query.filter_by(id=calendar_id).delete()
+            db.session.commit()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bulk event insert throughput')
+    parser.add_argument('--events', type=int, default=10000)
+    report(parser.parse_args().events)
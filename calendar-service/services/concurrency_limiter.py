@@ -0,0 +1,149 @@
+import functools
+import threading
+import time
+
+from flask import Response, jsonify
+
+class AdaptiveLimit:
+    """Concurrency limit for one route, adjusted with AIMD on observed latency.
+
+    Requests above the limit wait in a bounded queue for at most
+    `queue_timeout` seconds. When the queue is full or the wait times out the
+    request is rejected straight away. Every completed request moves the
+    limit: latency above `latency_target` multiplies it by `backoff`, latency
+    below it adds 1/limit while the limit is actually being used.
+    """
+
+    def __init__(self, name, initial_limit=2, min_limit=1, max_limit=20, max_queue=10,
+                 queue_timeout=1.0, latency_target=0.5, backoff=0.9):
+        self.name = name
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.waiting = 0
+        self.peak_in_flight = 0
+        self.accepted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.latency_avg = None
+
+    def acquire(self):
+        """Takes a slot, waiting in the queue if needed. Returns False when rejected."""
+        with self._cond:
+            if self.in_flight < int(self.limit) and not self.waiting:
+                self._admit(0.0)
+                return True
+            if self.waiting >= self.max_queue:
+                self.rejected_queue_full += 1
+                return False
+
+            start = time.monotonic()
+            deadline = start + self.queue_timeout
+            self.waiting += 1
+            try:
+                while self.in_flight >= int(self.limit):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected_timeout += 1
+                        # Pass on a wakeup this waiter may have consumed
+                        self._cond.notify()
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self._admit(time.monotonic() - start)
+            return True
+
+    def _admit(self, waited):
+        self.in_flight += 1
+        self.accepted += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        self.queue_wait_total += waited
+        self.queue_wait_max = max(self.queue_wait_max, waited)
+
+    def release(self, latency):
+        """Frees a slot and feeds the request latency back into the limit."""
+        with self._cond:
+            saturated = self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+            self.latency_avg = latency if self.latency_avg is None else 0.9 * self.latency_avg + 0.1 * latency
+            if latency > self.latency_target:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+            elif saturated:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify(max(1, int(self.limit) - self.in_flight))
+
+    def stats(self):
+        return {
+            'limit': round(self.limit, 2),
+            'in_flight': self.in_flight,
+            'peak_in_flight': self.peak_in_flight,
+            'waiting': self.waiting,
+            'accepted': self.accepted,
+            'rejected_queue_full': self.rejected_queue_full,
+            'rejected_timeout': self.rejected_timeout,
+            'queue_wait_avg_ms': round(self.queue_wait_total / self.accepted * 1000, 3) if self.accepted else 0.0,
+            'queue_wait_max_ms': round(self.queue_wait_max * 1000, 3),
+            'latency_avg_ms': round(self.latency_avg * 1000, 3) if self.latency_avg is not None else None,
+        }
+
+class ConcurrencyLimiter:
+    """Per-route adaptive concurrency limits, applied through the `limit` decorator.
+
+    Usage:
+    ```
+    concurrency_limiter = ConcurrencyLimiter(initial_limit=2)
+
+    @app.route('/api/example')
+    @concurrency_limiter.limit('example', max_queue=5)
+    def example():
+        ...
+    ```
+    Keyword arguments given to the constructor are the defaults for every
+    route and can be overridden per route.
+    """
+
+    def __init__(self, reject_status=503, retry_after=1, **defaults):
+        self.reject_status = reject_status
+        self.retry_after = retry_after
+        self.defaults = defaults
+        self.limits = {}
+
+    def limit(self, name=None, **overrides):
+        def decorator(f):
+            route_limit = AdaptiveLimit(name or f.__name__, **{**self.defaults, **overrides})
+            self.limits[route_limit.name] = route_limit
+
+            @functools.wraps(f)
+            def wrapper(*args, **kwargs):
+                if not route_limit.acquire():
+                    return self._reject()
+                start = time.monotonic()
+                try:
+                    result = f(*args, **kwargs)
+                except BaseException:
+                    route_limit.release(time.monotonic() - start)
+                    raise
+                response = result[0] if isinstance(result, tuple) else result
+                if isinstance(response, Response) and response.is_streamed:
+                    # Keep the slot until the streamed body has been sent, and measure up to then
+                    response.call_on_close(lambda: route_limit.release(time.monotonic() - start))
+                else:
+                    route_limit.release(time.monotonic() - start)
+                return result
+            return wrapper
+        return decorator
+
+    def _reject(self):
+        return jsonify({'message': 'Service overloaded, try again later'}), self.reject_status, {'Retry-After': str(self.retry_after)}
+
+    def stats(self):
+        return {name: route_limit.stats() for name, route_limit in self.limits.items()}
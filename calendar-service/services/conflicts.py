@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta
+from itertools import islice
+
+from sqlalchemy import DateTime, bindparam, func, text
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from models.database import db
+from models.model import Event
+from services.event_queries import EVENT_COLUMNS, Occurrence, recurring_series
+from services.intervals import IntervalIndex, merge_intervals
+from services.recurrence import occurrences, parse_rrule
+
+CONFLICT_MODES = ('ignore', 'check', 'reject')
+# New recurring series are checked over this horizon, and at most this many occurrences
+SERIES_HORIZON = timedelta(days=366)
+MAX_SERIES_OCCURRENCES = 1000
+
+# Namespace of the per-calendar advisory locks taken while checking for conflicts
+CONFLICT_LOCK_NAMESPACE = 72310002
+
+def lock_calendar_writes(calendar_id):
+    """Serialises conflict-checked writes to a calendar until the end of the transaction."""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        db.session.execute(text('SELECT pg_advisory_xact_lock(:namespace, :calendar_id)'), {'namespace': CONFLICT_LOCK_NAMESPACE, 'calendar_id': calendar_id})
+
+def _period(start, end):
+    # Half-open, like the intervals compared in memory: back-to-back events do not conflict.
+    # Rows older than the event_end check may end before they start, tsrange would reject them
+    # (same expression as the GiST index, so it stays usable)
+    return func.tsrange(start, func.greatest(end, start), '[)')
+
+def single_events_overlapping(calendar_id, start, end):
+    """Single events of a calendar overlapping [start, end).
+
+    Served by the GiST index on (calendar_id, tsrange(event_start,
+    GREATEST(event_end, event_start))) through the && operator.
+    """
+    return (
+        db.session.query(*EVENT_COLUMNS)
+        .filter(Event.calendar_id == calendar_id, Event.rrule.is_(None))
+        .filter(_period(Event.event_start, Event.event_end).op('&&')(_period(start, end)))
+    )
+
+def single_events_overlapping_any(calendar_id, windows):
+    """Single events of a calendar overlapping any of the [start, end) windows, in one query.
+
+    The windows are joined as unnested arrays, so the GiST index is probed
+    once per window instead of scanning everything between the first and the last.
+    """
+    window = func.unnest(
+        bindparam('window_starts', [start for start, _ in windows], type_=ARRAY(DateTime)),
+        bindparam('window_ends', [end for _, end in windows], type_=ARRAY(DateTime)),
+    ).table_valued('window_start', 'window_end').render_derived()
+    return (
+        db.session.query(*EVENT_COLUMNS)
+        .join(window, _period(Event.event_start, Event.event_end).op('&&')(_period(window.c.window_start, window.c.window_end)))
+        .filter(Event.calendar_id == calendar_id, Event.rrule.is_(None))
+        .distinct()
+    )
+
+def overlapping_events(calendar_id, windows):
+    """Returns the events and series occurrences of a calendar overlapping any of the sorted, disjoint windows."""
+    rows = list(single_events_overlapping_any(calendar_id, windows))
+    # Series are few, take every one that can occur in the windows and expand it within each of them
+    for series in recurring_series(calendar_id, windows[0][0], windows[-1][1]):
+        rule = parse_rrule(series.rrule)
+        duration = series.event_end - series.event_start
+        seen = set()
+        for start, end in windows:
+            # One-off windows, not worth an entry in the expansion cache
+            for occurrence_start in occurrences(rule, series.event_start, start - duration, end, series.recurrence_until, series.recurrence_exdates):
+                if occurrence_start in seen or datetime.max - duration < occurrence_start or occurrence_start + duration <= start:
+                    continue
+                seen.add(occurrence_start)
+                rows.append(Occurrence(series.id, series.event_name, occurrence_start, occurrence_start + duration, series.created_by, series.rrule))
+    return rows
+
+def new_event_periods(row):
+    """Returns the [start, end) periods a new event would occupy, bounded for recurring series."""
+    if not row.get('rrule'):
+        return [(row['event_start'], row['event_end'])]
+    duration = row['event_end'] - row['event_start']
+    horizon = row['event_start'] + min(SERIES_HORIZON, datetime.max - row['event_start'])
+    starts = occurrences(parse_rrule(row['rrule']), row['event_start'], None, horizon,
+                         row['recurrence_until'], row['recurrence_exdates'])
+    return [(start, start + duration) for start in islice(starts, MAX_SERIES_OCCURRENCES) if start <= datetime.max - duration]
+
+def conflict_to_dict(row):
+    return {'id': row.id, 'event_name': row.event_name, 'event_start': row.event_start.isoformat(), 'event_end': row.event_end.isoformat(), 'rrule': row.rrule}
+
+def find_conflicts(calendar_id, rows):
+    """Returns [{index, conflicts_with}] for the new event rows overlapping existing events or each other.
+
+    Existing events overlapping the periods of the batch (merged into
+    disjoint windows, so a distant event does not pull in everything in
+    between) are read with one indexed query and put in an in-memory
+    IntervalIndex with the batch itself, so every new event costs a bisect
+    instead of a query.
+    """
+    periods = [new_event_periods(row) for row in rows]
+    # Empty periods cannot overlap anything
+    windows = merge_intervals((start, end) for event_periods in periods for start, end in event_periods if start < end)
+    if not windows:
+        return []
+    existing = IntervalIndex((row.event_start, row.event_end, conflict_to_dict(row)) for row in overlapping_events(calendar_id, windows))
+    batch = IntervalIndex((start, end, index) for index, event_periods in enumerate(periods) for start, end in event_periods)
+
+    conflicts = []
+    for index, event_periods in enumerate(periods):
+        found = {}
+        for start, end in event_periods:
+            for event in existing.overlapping(start, end):
+                found.setdefault(('event', event['id'], event['event_start']), event)
+            if len(rows) > 1:
+                for other in batch.overlapping(start, end):
+                    if other != index:
+                        found.setdefault(('batch', other), {'index': other})
+        if found:
+            conflicts.append({'index': index, 'conflicts_with': list(found.values())})
+    return conflicts
+
+def check_conflicts(calendar_id, rows, mode):
+    """Applies a conflict mode to new event rows. Returns (conflicts, whether the rows may be inserted).
+
+    'ignore' checks nothing. 'check' and 'reject' lock the calendar's
+    conflict-checked writes until the end of the transaction and look for
+    conflicts, 'reject' refuses the rows if there is any.
+    """
+    if mode == 'ignore':
+        return [], True
+    lock_calendar_writes(calendar_id)
+    conflicts = find_conflicts(calendar_id, rows)
+    return conflicts, not (conflicts and mode == 'reject')
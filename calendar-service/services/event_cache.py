@@ -0,0 +1,201 @@
+import hashlib
+import logging
+import time
+import uuid
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# Pages larger than this are zlib-compressed before they are stored
+COMPRESS_MIN_SIZE = 1024
+
+# Reads the calendar version and the page stored for it in one round-trip
+LOOKUP_SCRIPT = """
+local version = redis.call('GET', KEYS[1]) or '0'
+return {version, redis.call('GET', ARGV[1] .. version .. ARGV[2])}
+"""
+
+# Stores a page only if no invalidation happened since it was read from the database
+FILL_SCRIPT = """
+if (redis.call('GET', KEYS[1]) or '0') == ARGV[1] then
+    redis.call('SET', KEYS[2], ARGV[2], 'PX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+# Deletes the fill lock only if we still own it
+UNLOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+class EventCache:
+    """Read-through Redis cache of rendered get_events pages, one namespace per calendar.
+
+    Each calendar has a version counter and pages are stored under the
+    version they were rendered for, so invalidating a calendar is a single
+    INCR and older pages simply expire. A page rendered from the database is
+    only stored if the version did not move in the meantime, so a write that
+    commits during a fill never leaves a stale page behind. On a miss, a
+    short Redis lock lets one request per page query the database while the
+    others wait for its result.
+
+    Redis errors never fail a request, the cache is then bypassed.
+    """
+
+    def __init__(self, redis_client, ttl=300, lock_timeout=5.0, wait_timeout=2.0, poll_interval=0.05):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._lookup = redis_client.register_script(LOOKUP_SCRIPT)
+        self._fill = redis_client.register_script(FILL_SCRIPT)
+        self._unlock = redis_client.register_script(UNLOCK_SCRIPT)
+        self.hits = 0
+        self.misses = 0
+        self.fills = 0
+        self.stale_fills = 0
+        self.invalidations = 0
+        self.lock_waits = 0
+        self.shared_fills = 0
+        self.errors = 0
+
+    @staticmethod
+    def _version_key(calendar_id):
+        return f'calendar_events:{calendar_id}:version'
+
+    @staticmethod
+    def _page_suffix(params):
+        return ':' + hashlib.blake2b(repr(params).encode(), digest_size=8).hexdigest()
+
+    def _page_key(self, calendar_id, version, params):
+        return f'calendar_events:{calendar_id}:v{version}{self._page_suffix(params)}'
+
+    @staticmethod
+    def _encode(body):
+        raw = body.encode()
+        if len(raw) >= COMPRESS_MIN_SIZE:
+            return b'z' + zlib.compress(raw)
+        return b'j' + raw
+
+    @staticmethod
+    def _decode(value):
+        return (zlib.decompress(value[1:]) if value[:1] == b'z' else value[1:]).decode()
+
+    def lookup(self, calendar_id, params):
+        """Returns (body, version): the cached page or None, and the version to fill it for."""
+        try:
+            version, value = self._lookup(
+                keys=[self._version_key(calendar_id)],
+                args=[f'calendar_events:{calendar_id}:v', self._page_suffix(params)],
+            )
+        except Exception as e:
+            self._error('lookup', e)
+            return None, None
+        version = version.decode() if isinstance(version, bytes) else str(version)
+        if value is None:
+            self.misses += 1
+            return None, version
+        self.hits += 1
+        return self._decode(value), version
+
+    def acquire_fill_lock(self, calendar_id, params, version):
+        """Returns a lock token if this request should fill the page, None if another one already is."""
+        token = uuid.uuid4().hex
+        try:
+            if self.redis.set(self._lock_key(calendar_id, params, version), token, nx=True, px=int(self.lock_timeout * 1000)):
+                return token
+        except Exception as e:
+            self._error('lock', e)
+            # Without Redis every request goes to the database on its own
+            return token
+        return None
+
+    def release_fill_lock(self, calendar_id, params, version, token):
+        try:
+            self._unlock(keys=[self._lock_key(calendar_id, params, version)], args=[token])
+        except Exception as e:
+            self._error('unlock', e)
+
+    def _lock_key(self, calendar_id, params, version):
+        return self._page_key(calendar_id, version, params) + ':lock'
+
+    def wait_for_fill(self, calendar_id, params, version):
+        """Waits for the request holding the fill lock to store the page, None on timeout.
+
+        The lookup was already counted as a miss, a page found here counts as a shared fill.
+        """
+        self.lock_waits += 1
+        page_key = self._page_key(calendar_id, version, params)
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            try:
+                value = self.redis.get(page_key)
+            except Exception as e:
+                self._error('wait', e)
+                return None
+            if value is not None:
+                self.shared_fills += 1
+                return self._decode(value)
+        return None
+
+    def fill(self, calendar_id, params, version, body):
+        """Stores a rendered page unless the calendar was invalidated since `version` was read."""
+        try:
+            stored = self._fill(
+                keys=[self._version_key(calendar_id), self._page_key(calendar_id, version, params)],
+                args=[version, self._encode(body), int(self.ttl * 1000)],
+            )
+        except Exception as e:
+            self._error('fill', e)
+            return
+        if stored:
+            self.fills += 1
+        else:
+            self.stale_fills += 1
+
+    def filling(self, chunks, calendar_id, params, version, token):
+        """Passes streamed chunks through and stores the complete page at the end.
+
+        The fill lock is released however the stream ends; a page that was not
+        sent completely is not stored.
+        """
+        sent = []
+        try:
+            for chunk in chunks:
+                sent.append(chunk)
+                yield chunk
+            self.fill(calendar_id, params, version, ''.join(sent))
+        finally:
+            self.release_fill_lock(calendar_id, params, version, token)
+
+    def invalidate(self, calendar_id):
+        """Moves the calendar to a new version, every cached page of it becomes unreachable."""
+        try:
+            self.redis.incr(self._version_key(calendar_id))
+            self.invalidations += 1
+        except Exception as e:
+            self._error('invalidate', e)
+
+    def _error(self, operation, e):
+        self.errors += 1
+        logger.warning(f"Event cache {operation} failed: {e}")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            'fills': self.fills,
+            'stale_fills': self.stale_fills,
+            'invalidations': self.invalidations,
+            'lock_waits': self.lock_waits,
+            'shared_fills': self.shared_fills,
+            'errors': self.errors,
+        }
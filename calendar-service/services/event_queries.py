@@ -0,0 +1,212 @@
+import base64
+import heapq
+import json
+from collections import namedtuple
+from datetime import datetime, timezone
+from itertools import islice
+
+from flask import current_app
+from sqlalchemy import and_, or_, tuple_
+
+from models.database import db
+from models.model import Calendar, Event, UserCalendar
+from services.recurrence import expansion_cache, parse_rrule
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Columns returned for every event, read as plain rows instead of ORM objects
+EVENT_COLUMNS = (Event.id, Event.event_name, Event.event_start, Event.event_end, Event.created_by, Event.rrule)
+# Extra columns needed to expand a recurring series
+SERIES_COLUMNS = EVENT_COLUMNS + (Event.recurrence_until, Event.recurrence_exdates)
+
+# One expanded occurrence of a recurring series, shaped like an event row
+Occurrence = namedtuple('Occurrence', 'id event_name event_start event_end created_by rrule calendar_name', defaults=(None,))
+
+def parse_datetime(value):
+    """Parses an ISO 8601 date or datetime into a naive UTC datetime (None stays None)."""
+    if value is None:
+        return None
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def encode_cursor(event_start, event_id):
+    """Encodes the (event_start, id) position of the last returned event as an opaque token."""
+    raw = json.dumps([event_start.isoformat(), event_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token):
+    """Decodes a token produced by encode_cursor, raising ValueError when it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        event_start, event_id = json.loads(raw)
+        return datetime.fromisoformat(event_start), int(event_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+
+def parse_page_args(args):
+    """Reads from/to/cursor/limit query parameters. Raises ValueError on bad input."""
+    start = parse_datetime(args.get('from'))
+    end = parse_datetime(args.get('to'))
+    if start and end and start >= end:
+        raise ValueError("'from' must be before 'to'")
+    after = decode_cursor(args['cursor']) if args.get('cursor') else None
+    limit = args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    if limit < 1:
+        raise ValueError("'limit' must be positive")
+    return start, end, after, min(limit, MAX_PAGE_SIZE)
+
+def _page(query, start, end, after, limit):
+    """Applies the time range, cursor, (event_start, id) order and limit + 1 to a query of single events."""
+    query = query.filter(Event.rrule.is_(None))
+    if start is not None:
+        query = query.filter(Event.event_start >= start)
+    if end is not None:
+        query = query.filter(Event.event_start < end)
+    if after is not None:
+        query = query.filter(tuple_(Event.event_start, Event.id) > tuple_(*after))
+    return query.order_by(Event.event_start, Event.id).limit(limit + 1).yield_per(200)
+
+def _series(query, start, end):
+    """Restricts a query to the recurring series that can have an occurrence starting in [start, end)."""
+    query = query.filter(Event.rrule.isnot(None))
+    if end is not None:
+        query = query.filter(Event.event_start < end)
+    if start is not None:
+        query = query.filter(or_(Event.recurrence_until.is_(None), Event.recurrence_until >= start))
+    return query
+
+def events_page(calendar_id, start=None, end=None, after=None, limit=DEFAULT_PAGE_SIZE):
+    """Returns a lazy result of at most limit + 1 single events of a calendar ordered by (event_start, id).
+
+    Served by the (calendar_id, event_start, id) index: `from`/`to` bound
+    event_start and the cursor continues strictly after the last (event_start, id) seen.
+    """
+    query = db.session.query(*EVENT_COLUMNS).filter(Event.calendar_id == calendar_id)
+    return _page(query, start, end, after, limit)
+
+def recurring_series(calendar_id, start=None, end=None):
+    """Returns the recurring series of a calendar that can occur in [start, end)."""
+    query = db.session.query(*SERIES_COLUMNS).filter(Event.calendar_id == calendar_id)
+    return _series(query, start, end)
+
+def calendar_events_page(calendar_id, start=None, end=None, after=None, limit=DEFAULT_PAGE_SIZE):
+    """Page of a calendar with the occurrences of its recurring series merged in."""
+    return with_occurrences(
+        events_page(calendar_id, start, end, after, limit),
+        recurring_series(calendar_id, start, end),
+        start, end, after, limit,
+    )
+
+def _feed_query(username, calendar_names, columns):
+    memberships = db.session.query(UserCalendar.calendar_id).filter(UserCalendar.username == username)
+    query = (
+        db.session.query(*columns, Calendar.calendar_name)
+        .join(Calendar, Calendar.id == Event.calendar_id)
+        .filter(Event.calendar_id.in_(memberships.scalar_subquery()))
+    )
+    if calendar_names:
+        query = query.filter(Calendar.calendar_name.in_(calendar_names))
+    return query
+
+def feed_events(username, calendar_names=None, start=None, end=None, after=None, limit=DEFAULT_PAGE_SIZE):
+    """Returns one merged, time-ordered page of single events from every calendar the user belongs to.
+
+    Membership is a semi-join on UserCalendar, so the feed is a single query
+    and a duplicated membership row cannot duplicate events.
+    """
+    return _page(_feed_query(username, calendar_names, EVENT_COLUMNS), start, end, after, limit)
+
+def feed_page(username, calendar_names=None, start=None, end=None, after=None, limit=DEFAULT_PAGE_SIZE):
+    """Feed page with the occurrences of the recurring series of those calendars merged in."""
+    series = _series(_feed_query(username, calendar_names, SERIES_COLUMNS), start, end)
+    return with_occurrences(feed_events(username, calendar_names, start, end, after, limit), series, start, end, after, limit)
+
+def _order(row):
+    return row.event_start, row.id
+
+def series_occurrences(series, lower, end, after=None):
+    """Lazily yields the occurrences of one series starting in [lower, end) and after the cursor."""
+    duration = series.event_end - series.event_start
+    exdates = tuple(series.recurrence_exdates or ())
+    key = (series.id, series.rrule, series.event_start, series.recurrence_until, exdates)
+    calendar_name = getattr(series, 'calendar_name', None)
+    starts = expansion_cache.expand(key, parse_rrule(series.rrule), series.event_start, lower, end, series.recurrence_until, exdates)
+    for start in starts:
+        if after is not None and (start, series.id) <= after:
+            continue
+        if datetime.max - duration < start:
+            # The occurrence would end past datetime.max
+            return
+        yield Occurrence(series.id, series.event_name, start, start + duration, series.created_by, series.rrule, calendar_name)
+
+def with_occurrences(rows, series, start, end, after, limit):
+    """Merges the occurrences of recurring series into a page of single events, in (event_start, id) order.
+
+    Series are expanded lazily and only within the requested window, so the
+    page stops as soon as limit + 1 rows are known, however long a series runs.
+    """
+    lower = after[0] if after is not None and (start is None or after[0] > start) else start
+    streams = [series_occurrences(row, lower, end, after) for row in series]
+    if not streams:
+        return rows
+    return islice(heapq.merge(rows, *streams, key=_order), limit + 1)
+
+def calendar_members(calendar_id):
+    return [username for (username,) in db.session.query(UserCalendar.username).filter(UserCalendar.calendar_id == calendar_id).order_by(UserCalendar.username)]
+
+def member_busy_intervals(calendar_id, start, end):
+    """Yields (start, end) of the events of the members of a calendar overlapping [start, end).
+
+    A member is busy during the events they created in any calendar they
+    still belong to, not during every event of a shared calendar; events
+    have no attendees. Both conditions are semi-joins, and recurring series
+    contribute their occurrences in the window.
+    """
+    members = db.session.query(UserCalendar.username).filter(UserCalendar.calendar_id == calendar_id)
+    creator_is_member = (
+        db.session.query(UserCalendar.id)
+        .filter(UserCalendar.calendar_id == Event.calendar_id, UserCalendar.username == Event.created_by)
+        .exists()
+    )
+    by_members = and_(Event.created_by.in_(members.scalar_subquery()), creator_is_member)
+    single = (
+        db.session.query(Event.event_start, Event.event_end)
+        .filter(by_members, Event.rrule.is_(None), Event.event_start < end, Event.event_end > start)
+        .yield_per(5000)
+    )
+    for row in single:
+        yield row.event_start, row.event_end
+    for series in _series(db.session.query(*SERIES_COLUMNS).filter(by_members), start, end):
+        # Occurrences starting up to one duration before the window still overlap it
+        for occurrence in series_occurrences(series, start - (series.event_end - series.event_start), end):
+            yield occurrence.event_start, occurrence.event_end
+
+def event_to_dict(row):
+    return {'id': row.id, 'event_name': row.event_name, 'event_start': row.event_start, 'event_end': row.event_end, 'created_by': row.created_by, 'rrule': row.rrule}
+
+def feed_event_to_dict(row):
+    return dict(event_to_dict(row), calendar_name=row.calendar_name)
+
+def stream_events_page(rows, limit, to_dict=event_to_dict):
+    """Streams a page as {"events": [...], "next_cursor": ...} without building it in memory.
+
+    `rows` must hold up to limit + 1 rows, the extra one only tells whether
+    there is a next page.
+    """
+    dumps = current_app.json.dumps
+    yield '{"events":['
+    last = None
+    has_more = False
+    for index, row in enumerate(rows):
+        if index == limit:
+            has_more = True
+            break
+        yield (',' if index else '') + dumps(to_dict(row))
+        last = row
+    next_cursor = encode_cursor(last.event_start, last.id) if has_more else None
+    yield '],"next_cursor":' + dumps(next_cursor) + '}'
@@ -0,0 +1,96 @@
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+class RoomBroadcaster:
+    """Coalesces room notifications and emits them as one batch per room and event.
+
+    `publish` only appends the item to the pending buffer of its (room,
+    event); a background task flushes every buffer each `window` seconds as
+    a single `{"room": ..., "items": [...], "dropped": n}` emit. A buffer
+    holds at most `max_pending` items, older ones are dropped first and
+    reported in `dropped`, so a chatty room cannot grow memory or flood the
+    message queue.
+    """
+
+    def __init__(self, socketio, window=0.05, max_pending=1000):
+        self.socketio = socketio
+        self.window = window
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        # (room, event) -> [deque of items, dropped count]
+        self._pending = {}
+        self._started = False
+        self.published = 0
+        self.emitted_items = 0
+        self.batches = 0
+        self.max_batch = 0
+        self.dropped = 0
+        self.items_per_second = 0.0
+        self.batches_per_second = 0.0
+
+    def start(self):
+        if not self._started:
+            self._started = True
+            self.socketio.start_background_task(self._run)
+        return self
+
+    def publish(self, room, event, item):
+        with self._lock:
+            buffer = self._pending.get((room, event))
+            if buffer is None:
+                buffer = self._pending[(room, event)] = [deque(maxlen=self.max_pending), 0]
+            if len(buffer[0]) == self.max_pending:
+                buffer[1] += 1
+                self.dropped += 1
+            buffer[0].append(item)
+            self.published += 1
+
+    def _run(self):
+        last = time.monotonic()
+        while True:
+            self.socketio.sleep(self.window)
+            try:
+                items, batches = self.flush()
+            except Exception as e:
+                logger.error(f"Room fan-out flush failed: {e}")
+                continue
+            now = time.monotonic()
+            elapsed = max(now - last, 1e-6)
+            last = now
+            # Exponentially weighted rates over roughly the last second of flushes
+            weight = min(1.0, elapsed)
+            self.items_per_second += weight * (items / elapsed - self.items_per_second)
+            self.batches_per_second += weight * (batches / elapsed - self.batches_per_second)
+
+    def flush(self):
+        """Emits every pending buffer. Returns (items, batches) sent."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        items = 0
+        for (room, event), (buffer, dropped) in pending.items():
+            batch = list(buffer)
+            self.socketio.emit(event, {'room': room, 'items': batch, 'dropped': dropped}, to=room)
+            items += len(batch)
+            self.max_batch = max(self.max_batch, len(batch))
+        self.emitted_items += items
+        self.batches += len(pending)
+        return items, len(pending)
+
+    def stats(self):
+        return {
+            'window_ms': round(self.window * 1000, 3),
+            'max_pending': self.max_pending,
+            'pending_rooms': len(self._pending),
+            'published': self.published,
+            'emitted_items': self.emitted_items,
+            'batches': self.batches,
+            'avg_batch_size': round(self.emitted_items / self.batches, 2) if self.batches else 0.0,
+            'max_batch_size': self.max_batch,
+            'dropped': self.dropped,
+            'items_per_second': round(self.items_per_second, 2),
+            'batches_per_second': round(self.batches_per_second, 2),
+        }
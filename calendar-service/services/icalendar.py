@@ -0,0 +1,187 @@
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from models.database import db
+from models.model import Event
+from services.event_queries import EVENT_COLUMNS
+
+PRODID = '-//PAD//calendar-service//EN'
+# Events rendered per streamed chunk
+EXPORT_CHUNK_EVENTS = 200
+# Content lines longer than this many octets are folded (RFC 5545, 3.1)
+FOLD_OCTETS = 75
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+
+def _unescape(text):
+    out = []
+    chars = iter(text)
+    for char in chars:
+        if char == '\\':
+            char = next(chars, '')
+            out.append('\n' if char in 'nN' else char)
+        else:
+            out.append(char)
+    return ''.join(out)
+
+def _fold(line):
+    raw = line.encode()
+    if len(raw) <= FOLD_OCTETS:
+        return line + '\r\n'
+    parts = []
+    start = 0
+    width = FOLD_OCTETS
+    while start < len(raw):
+        end = min(start + width, len(raw))
+        # Never split a UTF-8 sequence
+        while end < len(raw) and (raw[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(raw[start:end].decode())
+        start = end
+        width = FOLD_OCTETS - 1
+    return '\r\n '.join(parts) + '\r\n'
+
+def _format_datetime(value):
+    # Stored datetimes are naive UTC
+    return value.strftime('%Y%m%dT%H%M%SZ')
+
+def _vevent(row, calendar_name, stamp):
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{row.id}-{calendar_name}@calendar-service',
+        f'DTSTAMP:{stamp}',
+        f'DTSTART:{_format_datetime(row.event_start)}',
+        f'DTEND:{_format_datetime(row.event_end)}',
+        f'SUMMARY:{_escape(row.event_name)}',
+        f'ORGANIZER;CN={_escape(row.created_by)}:mailto:{row.created_by}',
+    ]
+    if row.rrule:
+        lines.append(f'RRULE:{row.rrule}')
+        if row.recurrence_exdates:
+            lines.append('EXDATE:' + ','.join(_format_datetime(exdate) for exdate in row.recurrence_exdates))
+    lines.append('END:VEVENT')
+    return ''.join(_fold(line) for line in lines)
+
+def export_calendar(calendar_id, calendar_name):
+    """Streams a calendar as .ics text in chunks of EXPORT_CHUNK_EVENTS events.
+
+    Events are read through a server-side cursor (yield_per), so memory does
+    not depend on the size of the calendar.
+    """
+    rows = (
+        db.session.query(*EVENT_COLUMNS, Event.recurrence_exdates)
+        .filter(Event.calendar_id == calendar_id)
+        .order_by(Event.event_start, Event.id)
+        .yield_per(1000)
+    )
+    return render_calendar(rows, calendar_name)
+
+def render_calendar(rows, calendar_name, stamp=None):
+    """Renders event rows (with recurrence_exdates) as .ics text, in chunks of EXPORT_CHUNK_EVENTS events."""
+    stamp = stamp or _format_datetime(datetime.now(timezone.utc))
+    yield ''.join(_fold(line) for line in (
+        'BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{PRODID}', 'CALSCALE:GREGORIAN', f'X-WR-CALNAME:{_escape(calendar_name)}',
+    ))
+    chunk = []
+    for row in rows:
+        chunk.append(_vevent(row, calendar_name, stamp))
+        if len(chunk) == EXPORT_CHUNK_EVENTS:
+            yield ''.join(chunk)
+            chunk = []
+    yield ''.join(chunk) + 'END:VCALENDAR\r\n'
+
+def _content_lines(lines):
+    """Unfolds physical lines into content lines."""
+    current = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current:
+            yield current
+        current = line
+    if current:
+        yield current
+
+def _parse_content_line(line):
+    """Splits 'NAME;PARAM=VALUE:value' into (NAME, {PARAM: VALUE}, value)."""
+    head, _, value = line.partition(':')
+    # A ':' inside a quoted parameter value does not end the name part
+    while head.count('"') % 2:
+        rest, _, value = value.partition(':')
+        head = f'{head}:{rest}'
+    name, *params = head.split(';')
+    return name.upper(), dict(param.split('=', 1) for param in params if '=' in param), value
+
+def _parse_datetime(params, value):
+    """Returns (naive UTC datetime, is_date) for a DTSTART/DTEND value."""
+    if params.get('VALUE', '').upper() == 'DATE' or len(value) == 8:
+        return datetime.strptime(value, '%Y%m%d'), True
+    if value.endswith('Z'):
+        return datetime.strptime(value, '%Y%m%dT%H%M%SZ'), False
+    parsed = datetime.strptime(value, '%Y%m%dT%H%M%S')
+    if 'TZID' in params:
+        # Floating times without TZID are taken as UTC
+        parsed = parsed.replace(tzinfo=ZoneInfo(params['TZID'].strip('"'))).astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed, False
+
+def parse_events(lines):
+    """Incrementally parses .ics text lines and yields one event dict per VEVENT.
+
+    Only VEVENT components are read (SUMMARY, DTSTART, DTEND, RRULE,
+    EXDATE); anything else is skipped. A VEVENT without DTEND ends when it
+    starts, or a day later for all-day events. Raises ValueError on a
+    malformed VEVENT.
+    """
+    event = None
+    depth = 0
+    for number, line in enumerate(_content_lines(lines), 1):
+        name, params, value = _parse_content_line(line)
+        if name == 'BEGIN':
+            if value.upper() == 'VEVENT' and event is None:
+                event = {}
+            elif event is not None:
+                # Nested component such as VALARM
+                depth += 1
+            continue
+        if name == 'END' and event is not None:
+            if depth:
+                depth -= 1
+                continue
+            if 'event_start' not in event:
+                raise ValueError(f"VEVENT ending at line {number} has no DTSTART")
+            if 'event_end' not in event:
+                event['event_end'] = event['event_start'] + (timedelta(days=1) if event.pop('all_day', False) else timedelta(0))
+            event.pop('all_day', None)
+            event.setdefault('event_name', 'Untitled')
+            yield event
+            event = None
+            continue
+        if event is None or depth:
+            continue
+        try:
+            if name == 'SUMMARY':
+                event['event_name'] = _unescape(value)[:100]
+            elif name == 'DTSTART':
+                event['event_start'], event['all_day'] = _parse_datetime(params, value)
+            elif name == 'DTEND':
+                event['event_end'], _ = _parse_datetime(params, value)
+            elif name == 'RRULE':
+                event['rrule'] = value
+            elif name == 'EXDATE':
+                event.setdefault('exdates', []).extend(_parse_datetime(params, item)[0] for item in value.split(','))
+        except (ValueError, KeyError) as e:
+            raise ValueError(f"Invalid {name} at line {number}: {e}") from e
+
+def batches(events, size):
+    """Groups an event iterator into lists of at most `size` events."""
+    batch = []
+    for event in events:
+        batch.append(event)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -1,9 +1,11 @@
 from main import create_app, db, Calendar, Event, UserCalendar
+from services.migrate import migrate
 
 def init_db(db):
-    app, db, jwt, limiter, semaphore, socketio = create_app(db)
+    app, db, jwt, limiter, concurrency_limiter, socketio = create_app(db)
     with app.app_context():
         db.create_all()
+        migrate(db)
         if db.session.query(Calendar).filter_by(calendar_name='test').first():
             print("Database already initialized")
             return
@@ -0,0 +1,72 @@
+from bisect import bisect_left
+from datetime import timedelta
+
+def merge_intervals(intervals):
+    """Merges (start, end) intervals into sorted, disjoint busy blocks with one sort and one sweep.
+
+    Touching intervals are merged too, so a block never ends where the next one starts.
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+def clip(intervals, window_start, window_end):
+    """Yields the parts of the intervals that fall inside [window_start, window_end)."""
+    for start, end in intervals:
+        if start < window_end and end > window_start:
+            yield max(start, window_start), min(end, window_end)
+
+def free_slots(busy, window_start, window_end, min_length=timedelta(0)):
+    """Returns the gaps of at least `min_length` between sorted, disjoint busy blocks inside the window."""
+    slots = []
+    cursor = window_start
+    for start, end in busy:
+        if start - cursor >= min_length and start > cursor:
+            slots.append((cursor, start))
+        cursor = max(cursor, end)
+    if window_end - cursor >= min_length and window_end > cursor:
+        slots.append((cursor, window_end))
+    return slots
+
+class IntervalIndex:
+    """Static index of [start, end) intervals answering overlap queries.
+
+    Intervals are sorted by start, with a running maximum of their ends. A
+    query bisects to the last interval starting before its end and walks
+    back only while some earlier interval can still reach its start, so a
+    lookup costs O(log n + k) for intervals of bounded length. Empty
+    intervals never overlap anything.
+    """
+
+    def __init__(self, items):
+        # items: iterable of (start, end, value)
+        entries = sorted((item for item in items if item[0] < item[1]), key=lambda item: item[0])
+        self._starts = [entry[0] for entry in entries]
+        self._entries = entries
+        self._max_end = []
+        reach = None
+        for _, end, _ in entries:
+            reach = end if reach is None or end > reach else reach
+            self._max_end.append(reach)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def overlapping(self, start, end):
+        """Returns the values of the intervals overlapping [start, end), ordered by start."""
+        if not start < end:
+            return []
+        found = []
+        index = bisect_left(self._starts, end) - 1
+        while index >= 0 and self._max_end[index] > start:
+            entry_start, entry_end, value = self._entries[index]
+            if entry_end > start:
+                found.append(value)
+            index -= 1
+        found.reverse()
+        return found
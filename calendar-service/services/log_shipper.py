@@ -0,0 +1,105 @@
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+class BatchingLogHandler(logging.Handler):
+    """Ships log records to a target handler from a background thread, in batches.
+
+    `emit` only puts the record in a bounded queue, so the request path never
+    waits on the network. When the queue is full the record is dropped
+    (policy 'drop') or the caller waits up to `block_timeout` seconds for
+    space (policy 'block'). For socket handlers such as
+    logstash.TCPLogstashHandler a whole batch is written with a single send.
+    """
+
+    def __init__(self, target, capacity=10000, batch_size=100, flush_interval=1.0, policy='drop', block_timeout=1.0):
+        super().__init__()
+        if policy not in ('drop', 'block'):
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.target = target
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self._queue = queue.Queue(maxsize=capacity)
+        self._closed = threading.Event()
+        self._batched_send = isinstance(target, logging.handlers.SocketHandler)
+        self.enqueued = 0
+        self.shipped = 0
+        self.dropped = 0
+        self.batches = 0
+        self.flush_latency_total = 0.0
+        self.flush_latency_max = 0.0
+        self._worker = threading.Thread(target=self._run, daemon=True, name='log-shipper')
+        self._worker.start()
+
+    def emit(self, record):
+        try:
+            # Render the message now, the arguments may change before the worker formats it
+            record.msg = record.getMessage()
+            record.args = None
+            if self.policy == 'block':
+                self._queue.put(record, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(record)
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def _run(self):
+        while not (self._closed.is_set() and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._ship(batch)
+
+    def _ship(self, batch):
+        start = time.perf_counter()
+        try:
+            if self._batched_send:
+                self.target.send(b''.join(self.target.makePickle(record) for record in batch))
+                if self.target.sock is None:
+                    # SocketHandler swallows connection errors and closes its socket
+                    raise ConnectionError('Log target is not reachable')
+            else:
+                for record in batch:
+                    self.target.handle(record)
+        except Exception:
+            self.dropped += len(batch)
+            return
+        latency = time.perf_counter() - start
+        self.shipped += len(batch)
+        self.batches += 1
+        self.flush_latency_total += latency
+        self.flush_latency_max = max(self.flush_latency_max, latency)
+
+    def close(self):
+        """Stops accepting records and waits for the queue to drain."""
+        self._closed.set()
+        self._worker.join(timeout=self.flush_interval + 5)
+        self.target.close()
+        super().close()
+
+    def stats(self):
+        return {
+            'policy': self.policy,
+            'queued': self._queue.qsize(),
+            'capacity': self._queue.maxsize,
+            'enqueued': self.enqueued,
+            'shipped': self.shipped,
+            'dropped': self.dropped,
+            'batches': self.batches,
+            'avg_batch_size': round(self.shipped / self.batches, 2) if self.batches else 0.0,
+            'flush_latency_avg_ms': round(self.flush_latency_total / self.batches * 1000, 3) if self.batches else 0.0,
+            'flush_latency_max_ms': round(self.flush_latency_max * 1000, 3),
+        }
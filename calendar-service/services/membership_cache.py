@@ -0,0 +1,179 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+# Pub/sub channel on the message queue Redis used to evict memberships on every instance
+EVICTION_CHANNEL = 'calendar-service:membership-evictions'
+
+logger = logging.getLogger(__name__)
+
+class MembershipCache:
+    """Per-process cache of calendar name -> id, of verified memberships for socket handlers
+    and of the calendar of each user for REST reads.
+
+    A membership is cached for the Socket.IO sessions (sids) that verified
+    it and dropped when the last of them disconnects, so the cache only holds
+    memberships of connected users. Leaving a calendar evicts the membership
+    here and, through a pub/sub channel on the message queue Redis, on every
+    other calendar-service instance. Calendars are never renamed or deleted,
+    so only name -> id lookups that found a calendar are cached, in a bounded LRU.
+    The calendar of a user is kept in another bounded LRU until the user
+    leaves it (the same evictions), a user without a calendar is not cached.
+    """
+
+    def __init__(self, redis_client, maxsize=10000, channel=EVICTION_CHANNEL):
+        self.redis = redis_client
+        self.maxsize = maxsize
+        self.channel = channel
+        self._lock = threading.Lock()
+        self._calendar_ids = OrderedDict()
+        # username -> calendar_id of the user, for REST handlers
+        self._user_calendars = OrderedDict()
+        # (username, calendar_id) -> sids that verified the membership
+        self._members = {}
+        # sid -> (username, calendar_id) memberships it verified
+        self._sessions = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def calendar_id(self, calendar_name, load):
+        """Returns the id of a calendar, calling `load(calendar_name)` on a miss (None if it does not exist)."""
+        with self._lock:
+            calendar_id = self._calendar_ids.get(calendar_name)
+            if calendar_id is not None:
+                self._calendar_ids.move_to_end(calendar_name)
+                self.hits += 1
+                return calendar_id
+            self.misses += 1
+        calendar_id = load(calendar_name)
+        if calendar_id is not None:
+            with self._lock:
+                self._calendar_ids[calendar_name] = calendar_id
+                while len(self._calendar_ids) > self.maxsize:
+                    self._calendar_ids.popitem(last=False)
+        return calendar_id
+
+    def user_calendar_id(self, username, load):
+        """Returns the calendar id of a user, calling `load(username)` on a miss (None if in no calendar)."""
+        with self._lock:
+            calendar_id = self._user_calendars.get(username)
+            if calendar_id is not None:
+                self._user_calendars.move_to_end(username)
+                self.hits += 1
+                return calendar_id
+            self.misses += 1
+        calendar_id = load(username)
+        if calendar_id is not None:
+            with self._lock:
+                self._user_calendars[username] = calendar_id
+                while len(self._user_calendars) > self.maxsize:
+                    self._user_calendars.popitem(last=False)
+        return calendar_id
+
+    def is_member(self, sid, username, calendar_id, load):
+        """Checks a membership, calling `load(username, calendar_id)` on a miss and caching a positive answer for `sid`."""
+        key = (username, calendar_id)
+        with self._lock:
+            if key in self._members:
+                self._members[key].add(sid)
+                self._sessions.setdefault(sid, set()).add(key)
+                self.hits += 1
+                return True
+            self.misses += 1
+        if not load(username, calendar_id):
+            return False
+        self.add(sid, username, calendar_id)
+        return True
+
+    def add(self, sid, username, calendar_id):
+        """Records a membership verified (or just created) by the session `sid`."""
+        key = (username, calendar_id)
+        with self._lock:
+            self._members.setdefault(key, set()).add(sid)
+            self._sessions.setdefault(sid, set()).add(key)
+
+    def remove(self, username, calendar_id):
+        """Evicts a membership on this instance and publishes the eviction to the others."""
+        self._evict(username, calendar_id)
+        try:
+            self.redis.publish(self.channel, json.dumps([username, calendar_id]))
+        except Exception as e:
+            logger.warning(f"Membership eviction could not be published: {e}")
+
+    def _evict(self, username, calendar_id):
+        key = (username, calendar_id)
+        with self._lock:
+            if self._user_calendars.get(username) == calendar_id:
+                del self._user_calendars[username]
+            sids = self._members.pop(key, None)
+            if sids is None:
+                return
+            self.evictions += 1
+            for sid in sids:
+                keys = self._sessions.get(sid)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._sessions[sid]
+
+    def forget_session(self, sid):
+        """Drops the memberships only this disconnected session was using."""
+        with self._lock:
+            for key in self._sessions.pop(sid, ()):
+                sids = self._members.get(key)
+                if sids is not None:
+                    sids.discard(sid)
+                    if not sids:
+                        del self._members[key]
+
+    def clear(self):
+        with self._lock:
+            self.evictions += len(self._members)
+            self._members.clear()
+            self._sessions.clear()
+            self._user_calendars.clear()
+
+    def listen(self):
+        """Starts the background listener applying evictions published by other instances."""
+        threading.Thread(target=self._listen, daemon=True, name='membership-cache').start()
+        return self
+
+    def _listen(self):
+        backoff = 1
+        while True:
+            pubsub = None
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # Evictions may have been missed while we were not subscribed
+                self.clear()
+                backoff = 1
+                while True:
+                    # Polling with a timeout keeps the client's socket_timeout from ending the subscription
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        username, calendar_id = json.loads(message['data'])
+                        self._evict(username, calendar_id)
+            except Exception as e:
+                logger.warning(f"Membership cache listener failed, retrying in {backoff}s: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                if pubsub is not None:
+                    pubsub.close()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'calendars': len(self._calendar_ids),
+            'memberships': len(self._members),
+            'user_calendars': len(self._user_calendars),
+            'sessions': len(self._sessions),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            'evictions': self.evictions,
+        }
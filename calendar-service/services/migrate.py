@@ -0,0 +1,65 @@
+import os
+import re
+import sys
+
+from sqlalchemy import text
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+# Arbitrary key for the advisory lock serialising migrations across service instances
+MIGRATION_LOCK_KEY = 72310001
+
+def available_migrations():
+    """Returns [(version, name, path)] for every NNN_name.sql file, ordered by version."""
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = re.fullmatch(r'(\d+)_(\w+)\.sql', filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    return sorted(migrations)
+
+def migrate(db):
+    """Applies pending migrations, each in its own transaction. Returns the applied versions.
+
+    Migrations are written to be idempotent, so they are also safe on a
+    database whose tables were just created by db.create_all().
+    """
+    applied_now = []
+    with db.engine.connect() as connection:
+        # Session-level lock, held across the per-migration transactions below
+        connection.execute(text('SELECT pg_advisory_lock(:key)'), {'key': MIGRATION_LOCK_KEY})
+        connection.commit()
+        try:
+            with connection.begin():
+                connection.execute(text(
+                    'CREATE TABLE IF NOT EXISTS schema_migrations ('
+                    'version INTEGER PRIMARY KEY, name VARCHAR(200) NOT NULL, applied_at TIMESTAMP NOT NULL DEFAULT now())'
+                ))
+                applied = set(connection.execute(text('SELECT version FROM schema_migrations')).scalars())
+
+            for version, name, path in available_migrations():
+                if version in applied:
+                    continue
+                with open(path) as f:
+                    sql = f.read()
+                with connection.begin():
+                    connection.execution_options(no_parameters=True).exec_driver_sql(sql)
+                    connection.execute(
+                        text('INSERT INTO schema_migrations (version, name) VALUES (:version, :name)'),
+                        {'version': version, 'name': name},
+                    )
+                print(f"Applied migration {version:03d}_{name}")
+                applied_now.append(version)
+        finally:
+            connection.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': MIGRATION_LOCK_KEY})
+            connection.commit()
+    return applied_now
+
+if __name__ == '__main__':
+    from main import create_app, db
+    app, db, jwt, limiter, concurrency_limiter, socketio = create_app(db)
+    with app.app_context():
+        if '--check-plans' in sys.argv:
+            from services.query_plans import check_query_plans
+            sys.exit(0 if check_query_plans(db) else 1)
+        applied = migrate(db)
+        print(f"{len(applied)} migration(s) applied" if applied else "Database schema is up to date")
@@ -0,0 +1,51 @@
+import json
+from datetime import datetime, timedelta
+
+from models.database import db
+from models.model import Calendar, UserCalendar
+from services.event_queries import events_page, feed_events, recurring_series
+from services.conflicts import single_events_overlapping
+
+def hot_queries():
+    """Returns (name, query, expected index) for the queries on the request path."""
+    now = datetime(2024, 1, 1)
+    return [
+        ('calendar by name', db.session.query(Calendar).filter_by(calendar_name='test'), 'ix_calendar_calendar_name'),
+        ('membership check', db.session.query(UserCalendar).filter_by(username='admin', calendar_id=1), 'uq_user_calendar_username_calendar_id'),
+        ('memberships of a user', db.session.query(UserCalendar).filter_by(username='admin'), 'uq_user_calendar_username_calendar_id'),
+        ('events page', events_page(1, start=now, after=(now, 1)), 'ix_event_calendar_id_event_start'),
+        ('events feed', feed_events('admin', start=now), 'ix_event_calendar_id_event_start'),
+        ('recurring series', recurring_series(1, start=now), 'ix_event_recurring_calendar_id_event_start'),
+        ('conflict check', single_events_overlapping(1, now, now + timedelta(hours=1)), 'ix_event_calendar_id_period'),
+    ]
+
+def _index_names(plan):
+    """Yields every index used anywhere in an EXPLAIN (FORMAT JSON) plan tree."""
+    if 'Index Name' in plan:
+        yield plan['Index Name']
+    for child in plan.get('Plans', []):
+        yield from _index_names(child)
+
+def check_query_plans(db):
+    """EXPLAINs every hot query and reports whether it uses its expected index.
+
+    Sequential scans are disabled for the check: on small tables the planner
+    rightly prefers them, here we only prove that an index path exists and
+    is the one chosen over the alternatives.
+    """
+    ok = True
+    with db.engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+            for name, query, expected in hot_queries():
+                compiled = query.statement.compile(dialect=db.engine.dialect)
+                result = connection.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + str(compiled), compiled.params).scalar()
+                plan = (json.loads(result) if isinstance(result, str) else result)[0]['Plan']
+                used = sorted(set(_index_names(plan)))
+                passed = expected in used
+                ok = ok and passed
+                print(f"{'OK  ' if passed else 'FAIL'} {name}: expected {expected}, plan uses {used or 'no index'}")
+        finally:
+            transaction.rollback()
+    return ok
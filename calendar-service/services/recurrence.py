@@ -0,0 +1,204 @@
+import calendar
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY')
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+# COUNT is resolved to a last occurrence when the event is saved, by walking the series once
+MAX_COUNT = 10000
+# Larger intervals only describe series reaching past datetime.max after a few occurrences
+MAX_INTERVAL = 1000
+# Windows with more occurrences than this are expanded every time instead of cached
+MAX_CACHED_OCCURRENCES = 1000
+
+Rule = namedtuple('Rule', 'freq interval count until byday')
+
+def parse_rrule(text):
+    """Parses the supported RRULE subset: FREQ, INTERVAL, COUNT, UNTIL and BYDAY (WEEKLY only).
+
+    Raises ValueError for anything else, so a rule is never half understood.
+    """
+    parts = {}
+    for part in text.upper().removeprefix('RRULE:').split(';'):
+        name, sep, value = part.partition('=')
+        if not sep or name in parts:
+            raise ValueError(f"Invalid RRULE part: {part}")
+        parts[name] = value
+    unsupported = set(parts) - {'FREQ', 'INTERVAL', 'COUNT', 'UNTIL', 'BYDAY', 'WKST'}
+    if unsupported:
+        raise ValueError(f"Unsupported RRULE parts: {', '.join(sorted(unsupported))}")
+    freq = parts.get('FREQ')
+    if freq not in FREQUENCIES:
+        raise ValueError(f"FREQ must be one of {', '.join(FREQUENCIES)}")
+    interval = int(parts.get('INTERVAL', 1))
+    count = int(parts['COUNT']) if 'COUNT' in parts else None
+    if not 0 < interval <= MAX_INTERVAL or (count is not None and not 0 < count <= MAX_COUNT):
+        raise ValueError(f"INTERVAL must be between 1 and {MAX_INTERVAL} and COUNT between 1 and {MAX_COUNT}")
+    if count is not None and 'UNTIL' in parts:
+        raise ValueError("COUNT and UNTIL cannot be combined")
+    until = _parse_until(parts['UNTIL']) if 'UNTIL' in parts else None
+    byday = None
+    if 'BYDAY' in parts:
+        if freq != 'WEEKLY':
+            raise ValueError("BYDAY is only supported with FREQ=WEEKLY")
+        days = parts['BYDAY'].split(',')
+        if not set(days) <= set(WEEKDAYS):
+            raise ValueError(f"BYDAY must list weekdays from {','.join(WEEKDAYS)}")
+        byday = tuple(sorted({WEEKDAYS.index(day) for day in days}))
+    return Rule(freq, interval, count, until, byday)
+
+def _parse_until(value):
+    # UNTIL is a UTC date-time or a date (then the whole day is included)
+    if len(value) == 8:
+        return datetime.strptime(value, '%Y%m%d') + timedelta(days=1) - timedelta(microseconds=1)
+    return datetime.strptime(value.rstrip('Z'), '%Y%m%dT%H%M%S')
+
+def _add_months(value, months):
+    """Returns `value` moved by whole months, or None if that day does not exist in the target month.
+
+    Raises OverflowError past datetime.max.
+    """
+    month_index = value.month - 1 + months
+    year, month = value.year + month_index // 12, month_index % 12 + 1
+    if year > datetime.max.year:
+        raise OverflowError("date value out of range")
+    if value.day > calendar.monthrange(year, month)[1]:
+        return None
+    return value.replace(year=year, month=month)
+
+def _starts(rule, dtstart, lower):
+    """Yields every start of the series from the first one at or after `lower`, without bounds.
+
+    The first period that can reach `lower` is computed directly, so skipping
+    years of a long series costs nothing. Every series ends before
+    datetime.max, however far its rule would go.
+    """
+    lower = dtstart if lower is None or lower < dtstart else lower
+    if rule.freq in ('MONTHLY', 'YEARLY'):
+        return _monthly_starts(rule.interval * (12 if rule.freq == 'YEARLY' else 1), dtstart, lower)
+    period = timedelta(days=7 * rule.interval if rule.freq == 'WEEKLY' else rule.interval)
+    if rule.byday is None:
+        return _periodic_starts(period, dtstart, lower)
+    return _weekday_starts(period, rule.byday, dtstart, lower)
+
+def _periodic_starts(period, dtstart, lower):
+    try:
+        start = dtstart + -(-(lower - dtstart) // period) * period
+        while True:
+            yield start
+            start += period
+    except OverflowError:
+        return
+
+def _weekday_starts(period, byday, dtstart, lower):
+    week = dtstart - timedelta(days=dtstart.weekday())
+    k = (lower - week) // period
+    offsets = [timedelta(days=day) for day in byday]
+    try:
+        while True:
+            base = week + k * period
+            for offset in offsets:
+                if base + offset >= lower:
+                    yield base + offset
+            k += 1
+    except OverflowError:
+        return
+
+def _monthly_starts(months, dtstart, lower):
+    elapsed = (lower.year - dtstart.year) * 12 + lower.month - dtstart.month
+    k = max(0, elapsed // months - 1)
+    try:
+        while True:
+            start = _add_months(dtstart, k * months)
+            if start is not None and start >= lower:
+                yield start
+            k += 1
+    except OverflowError:
+        return
+
+def recurrence_columns(rrule, event_start, exdates=None):
+    """Validates a recurrence and returns the Event column values for it (all None for a single event)."""
+    if not rrule:
+        if exdates:
+            raise ValueError("'exdates' needs an 'rrule'")
+        return {'rrule': None, 'recurrence_until': None, 'recurrence_exdates': None}
+    rule = parse_rrule(rrule)
+    return {
+        'rrule': rrule.upper().removeprefix('RRULE:'),
+        'recurrence_until': last_start(rule, event_start),
+        'recurrence_exdates': sorted(exdates) if exdates else None,
+    }
+
+def last_start(rule, dtstart):
+    """Returns the last start of a series (None if it never ends), applying COUNT or UNTIL.
+
+    A COUNT reaching past datetime.max ends at the last start before it.
+    """
+    if rule.count is not None:
+        start = None
+        for index, start in enumerate(_starts(rule, dtstart, None), 1):
+            if index == rule.count:
+                break
+        return start
+    return rule.until
+
+def occurrences(rule, dtstart, lower=None, upper=None, until=None, exdates=()):
+    """Lazily yields the starts of a series with lower <= start < upper, up to `until` inclusive.
+
+    `lower`, `upper` and `until` may be None for an open bound; starts listed
+    in `exdates` are skipped.
+    """
+    excluded = set(exdates or ())
+    for start in _starts(rule, dtstart, lower):
+        if (upper is not None and start >= upper) or (until is not None and start > until):
+            return
+        if start not in excluded:
+            yield start
+
+class ExpansionCache:
+    """Bounded LRU cache of the occurrence starts of a series within a closed window."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def expand(self, series_key, rule, dtstart, lower, upper, until, exdates):
+        """Returns an iterable of starts; open windows are never cached since they may be endless."""
+        if upper is None or self.maxsize <= 0:
+            return occurrences(rule, dtstart, lower, upper, until, exdates)
+        key = (series_key, lower, upper)
+        with self._lock:
+            starts = self._entries.get(key)
+            if starts is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return starts
+            self.misses += 1
+        starts = []
+        for start in occurrences(rule, dtstart, lower, upper, until, exdates):
+            starts.append(start)
+            if len(starts) > MAX_CACHED_OCCURRENCES:
+                return occurrences(rule, dtstart, lower, upper, until, exdates)
+        starts = tuple(starts)
+        with self._lock:
+            self._entries[key] = starts
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return starts
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+        }
+
+expansion_cache = ExpansionCache(maxsize=int(os.getenv('RECURRENCE_CACHE_SIZE', 1024)))
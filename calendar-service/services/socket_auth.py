@@ -0,0 +1,78 @@
+import functools
+import time
+
+from flask import request
+from flask_jwt_extended import decode_token, get_jwt, get_jwt_identity, verify_jwt_in_request
+from flask_socketio import disconnect, emit
+
+class SocketSessions:
+    """JWT authentication done once per Socket.IO session instead of on every event.
+
+    `open` verifies the handshake token at connect and binds its identity
+    and expiry to the session id. Handlers wrapped with `required` then only
+    look the sid up and compare the expiry with the clock. An expired session
+    is told so and disconnected, unless the client sent a fresh token for the
+    same identity with the `authenticate` event before that.
+    """
+
+    def __init__(self):
+        # sid -> (identity, expires_at)
+        self._sessions = {}
+        self.opened = 0
+        self.rejected = 0
+        self.refreshed = 0
+        self.expired = 0
+
+    def open(self):
+        """Authenticates the connecting session, raising ConnectionRefusedError without a valid token."""
+        try:
+            verify_jwt_in_request()
+        except Exception as e:
+            self.rejected += 1
+            raise ConnectionRefusedError('Missing or invalid token') from e
+        identity = get_jwt_identity()
+        self._sessions[request.sid] = (identity, get_jwt().get('exp', float('inf')))
+        self.opened += 1
+        return identity
+
+    def refresh(self, token):
+        """Extends the current session with a fresh token. Raises ValueError if it does not match."""
+        session = self._sessions.get(request.sid)
+        try:
+            claims = decode_token(token)
+        except Exception as e:
+            raise ValueError('Invalid token') from e
+        if session is None or claims['sub'] != session[0]:
+            raise ValueError('Token does not belong to this session')
+        self._sessions[request.sid] = (session[0], claims.get('exp', float('inf')))
+        self.refreshed += 1
+
+    def close(self):
+        self._sessions.pop(request.sid, None)
+
+    def identity(self):
+        """Returns the identity bound to the current session."""
+        return self._sessions[request.sid][0]
+
+    def required(self, f):
+        """Runs the handler only for an authenticated, unexpired session."""
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            session = self._sessions.get(request.sid)
+            if session is None or session[1] <= time.time():
+                if self._sessions.pop(request.sid, None) is not None:
+                    self.expired += 1
+                emit('message', 'Session expired, reconnect with a valid token')
+                disconnect()
+                return None
+            return f(*args, **kwargs)
+        return wrapper
+
+    def stats(self):
+        return {
+            'sessions': len(self._sessions),
+            'opened': self.opened,
+            'rejected': self.rejected,
+            'refreshed': self.refreshed,
+            'expired': self.expired,
+        }
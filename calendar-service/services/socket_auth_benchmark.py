@@ -0,0 +1,46 @@
+"""Per-event authentication cost of socket handlers: @jwt_required() versus SocketSessions.
+
+Run from the calendar-service directory:
+    python3 -m services.socket_auth_benchmark [--events 100000]
+"""
+import argparse
+import time
+
+from flask import Flask, request
+from flask_jwt_extended import JWTManager, create_access_token, get_jwt_identity, jwt_required
+
+from services.socket_auth import SocketSessions
+
+def per_event_seconds(wrapped, events):
+    start = time.perf_counter()
+    for _ in range(events):
+        wrapped()
+    return (time.perf_counter() - start) / events
+
+def report(events):
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'benchmark'
+    JWTManager(app)
+    with app.app_context():
+        token = create_access_token(identity='benchmark-user')
+
+    sockets = SocketSessions()
+    before = jwt_required()(lambda: get_jwt_identity())
+    after = sockets.required(lambda: sockets.identity())
+
+    # Socket events run in the request context of the handshake, with the sid set on the request
+    with app.test_request_context(headers={'Authorization': f'Bearer {token}'}):
+        request.sid = 'benchmark-sid'
+        sockets.open()
+        before_cost = per_event_seconds(before, events)
+        after_cost = per_event_seconds(after, events)
+
+    print(f"{events} events per handler")
+    print(f"  @jwt_required():         {before_cost * 1e6:8.2f} us/event")
+    print(f"  @sockets.required:       {after_cost * 1e6:8.2f} us/event")
+    print(f"  speedup:                 {before_cost / after_cost:8.1f}x")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Socket handler authentication cost per event')
+    parser.add_argument('--events', type=int, default=100000)
+    report(parser.parse_args().events)
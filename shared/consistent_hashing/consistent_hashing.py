@@ -0,0 +1,93 @@
+import hashlib
+from array import array
+from bisect import bisect_right
+
+def _sha256_hash(value):
+    """Full-width SHA-256 hash, kept for rings built before the fast mode existed."""
+    return int(hashlib.sha256(value.encode()).hexdigest(), 16)
+
+def _blake2b64_hash(value):
+    """Fixed-width 64-bit hash (BLAKE2b truncated to 8 bytes, computed in C)."""
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+# Available hash functions; the 64-bit ones allow the compact array layout
+HASH_FUNCTIONS = {
+    'sha256': (_sha256_hash, False),
+    'blake2b64': (_blake2b64_hash, True),
+}
+
+class ConsistentHashRing:
+    def __init__(self, replicas=3, hash_function='sha256'):
+        if hash_function not in HASH_FUNCTIONS:
+            raise ValueError(f"Unknown hash function: {hash_function}")
+        self.replicas = replicas
+        self.hash_function = hash_function
+        self._hash, self._fixed_width = HASH_FUNCTIONS[hash_function]
+        self.ring = {}
+        self.sorted_keys = self._new_keys()
+        # Node owning each position of sorted_keys (parallel array)
+        self._owners = []
+
+    def _new_keys(self, values=()):
+        # 64-bit hashes fit in a packed unsigned array, SHA-256 ints do not
+        return array('Q', values) if self._fixed_width else list(values)
+
+    def _get_hash(self, value):
+        """Generates a consistent hash for the given value."""
+        return self._hash(value)
+
+    def _rebuild(self):
+        """Rebuilds the sorted point array and its owner list from the ring."""
+        self.sorted_keys = self._new_keys(sorted(self.ring))
+        self._owners = [self.ring[key] for key in self.sorted_keys]
+
+    def add_node(self, node):
+        """Adds a node with replicas to the ring."""
+        for i in range(self.replicas):
+            replica_key = self._get_hash(f"{node}_{i}")
+            self.ring[replica_key] = node
+        self._rebuild()
+
+    def remove_node(self, node):
+        """Removes a node and its replicas from the ring."""
+        for i in range(self.replicas):
+            replica_key = self._get_hash(f"{node}_{i}")
+            if self.ring.get(replica_key) == node:
+                del self.ring[replica_key]
+        self._rebuild()
+
+    def get_node(self, key):
+        """Returns the closest node for the given key."""
+        if not self.ring:
+            return None
+        pos = bisect_right(self.sorted_keys, self._hash(key))
+        if pos == len(self.sorted_keys):
+            pos = 0
+        return self._owners[pos]
+
+    def get_nodes(self, keys):
+        """Returns the closest node for each of the given keys, in order."""
+        if not self.ring:
+            return [None] * len(keys)
+        # Local bindings keep the per-key loop tight for large batches
+        sorted_keys, owners, hash_ = self.sorted_keys, self._owners, self._hash
+        size = len(sorted_keys)
+        nodes = []
+        append = nodes.append
+        for key in keys:
+            pos = bisect_right(sorted_keys, hash_(key))
+            append(owners[pos if pos < size else 0])
+        return nodes
+
+    def get_distribution(self):
+        """Returns the fraction of the hash space owned by each node."""
+        if not self.ring:
+            return {}
+        space = 2 ** 64 if self._fixed_width else 2 ** 256
+        shares = dict.fromkeys(self._owners, 0)
+        previous = self.sorted_keys[-1] - space
+        for point, node in zip(self.sorted_keys, self._owners):
+            # Each point owns the arc between the previous point and itself
+            shares[node] += point - previous
+            previous = point
+        return {node: share / space for node, share in shares.items()}
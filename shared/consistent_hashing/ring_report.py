@@ -0,0 +1,57 @@
+"""Distribution and throughput report for ConsistentHashRing configurations.
+
+Run from the shared directory:
+    python3 -m consistent_hashing.ring_report [--keys 100000] [--vnodes 256]
+"""
+import argparse
+import statistics
+import time
+
+from consistent_hashing.consistent_hashing import ConsistentHashRing
+
+NODES = ["redis_node_a", "redis_node_b", "redis_node_c"]
+
+def build_ring(replicas, hash_function):
+    ring = ConsistentHashRing(replicas=replicas, hash_function=hash_function)
+    for node in NODES:
+        ring.add_node(node)
+    return ring
+
+def measure(ring, keys):
+    """Returns per-node key counts, single lookups/s and batch lookups/s."""
+    start = time.perf_counter()
+    for key in keys:
+        ring.get_node(key)
+    single_rate = len(keys) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    nodes = ring.get_nodes(keys)
+    batch_rate = len(keys) / (time.perf_counter() - start)
+
+    counts = dict.fromkeys(NODES, 0)
+    for node in nodes:
+        counts[node] += 1
+    return counts, single_rate, batch_rate
+
+def report(configurations, key_count):
+    keys = [f"user_{i}" for i in range(key_count)]
+    expected = key_count / len(NODES)
+    print(f"{key_count} keys over {len(NODES)} nodes (ideal {expected:.0f} keys per node)\n")
+    for replicas, hash_function in configurations:
+        ring = build_ring(replicas, hash_function)
+        counts, single_rate, batch_rate = measure(ring, keys)
+        # Relative standard deviation of the load, 0% means perfectly balanced
+        spread = statistics.pstdev(counts.values()) / expected * 100
+        print(f"{hash_function} with {replicas} vnodes per node")
+        for node in NODES:
+            share = ring.get_distribution()[node] * 100
+            print(f"  {node}: {counts[node]} keys ({counts[node] / key_count * 100:.2f}%), ring share {share:.2f}%")
+        print(f"  load spread: {spread:.2f}%  max/ideal: {max(counts.values()) / expected:.3f}")
+        print(f"  get_node: {single_rate:,.0f} lookups/s  get_nodes: {batch_rate:,.0f} lookups/s\n")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Consistent hash ring distribution and throughput report')
+    parser.add_argument('--keys', type=int, default=100000)
+    parser.add_argument('--vnodes', type=int, default=256)
+    args = parser.parse_args()
+    report([(3, 'sha256'), (args.vnodes, 'sha256'), (args.vnodes, 'blake2b64')], args.keys)
@@ -0,0 +1,60 @@
+import pytest
+
+from consistent_hashing.consistent_hashing import ConsistentHashRing
+
+NODES = ['redis_node_a', 'redis_node_b', 'redis_node_c']
+KEYS = [f'user:{index}' for index in range(5000)]
+
+def build(hash_function, nodes=NODES, replicas=64):
+    ring = ConsistentHashRing(replicas=replicas, hash_function=hash_function)
+    for node in nodes:
+        ring.add_node(node)
+    return ring
+
+@pytest.mark.parametrize('hash_function', ['sha256', 'blake2b64'])
+def test_get_nodes_matches_get_node(hash_function):
+    ring = build(hash_function)
+    assert ring.get_nodes(KEYS) == [ring.get_node(key) for key in KEYS]
+
+@pytest.mark.parametrize('hash_function', ['sha256', 'blake2b64'])
+def test_adding_a_node_only_moves_keys_to_it(hash_function):
+    ring = build(hash_function)
+    before = ring.get_nodes(KEYS)
+    ring.add_node('redis_node_d')
+    after = ring.get_nodes(KEYS)
+    moved = [(old, new) for old, new in zip(before, after) if old != new]
+    assert moved and all(new == 'redis_node_d' for _, new in moved)
+    # Roughly the new node's share of the keys, not a reshuffle
+    assert len(moved) < len(KEYS) / 2
+
+@pytest.mark.parametrize('hash_function', ['sha256', 'blake2b64'])
+def test_removing_a_node_only_moves_its_keys(hash_function):
+    ring = build(hash_function)
+    before = ring.get_nodes(KEYS)
+    ring.remove_node('redis_node_b')
+    after = ring.get_nodes(KEYS)
+    for old, new in zip(before, after):
+        assert new == old if old != 'redis_node_b' else new != 'redis_node_b'
+    # Adding it back restores the original placement
+    ring.add_node('redis_node_b')
+    assert ring.get_nodes(KEYS) == before
+
+def test_hash_modes_have_the_same_structure():
+    sha, blake = build('sha256'), build('blake2b64')
+    for ring in (sha, blake):
+        assert len(ring.sorted_keys) == len(ring.ring) == len(NODES) * 64
+        assert list(ring.sorted_keys) == sorted(ring.ring)
+        assert set(ring.get_nodes(KEYS)) == set(NODES)
+        distribution = ring.get_distribution()
+        assert set(distribution) == set(NODES)
+        assert sum(distribution.values()) == pytest.approx(1.0)
+    assert sha.sorted_keys.__class__ is list
+    assert blake.sorted_keys.typecode == 'Q'
+
+def test_empty_ring():
+    ring = ConsistentHashRing(hash_function='blake2b64')
+    assert ring.get_node('key') is None
+    assert ring.get_nodes(['a', 'b']) == [None, None]
+    assert ring.get_distribution() == {}
+    with pytest.raises(ValueError):
+        ConsistentHashRing(hash_function='md5')
@@ -0,0 +1,85 @@
+import time
+
+import fakeredis
+import pytest
+
+from services import ring_rate_limit
+from services.ring_rate_limit import RingRedisStorage
+
+URI = 'ringredis://redis_node_a:6379,redis_node_b:6379,redis_node_c:6379'
+
+@pytest.fixture
+def servers(monkeypatch):
+    """One fake Redis server per node, shared by every storage built in the test."""
+    servers = {}
+
+    def connect(host, port, db, socket_timeout, decode_responses):
+        server = servers.setdefault(host, fakeredis.FakeServer())
+        return fakeredis.FakeRedis(server=server, db=db, decode_responses=decode_responses)
+
+    monkeypatch.setattr(ring_rate_limit, 'Redis', connect)
+    return servers
+
+def used(storage, key):
+    window_key = storage._key(key)
+    return int(storage.clients[storage._node(key)].get(f'{window_key}:used') or 0)
+
+def test_small_limit_is_checked_exactly(servers):
+    storage = RingRedisStorage(URI)
+    assert [storage.acquire_entry('login', 5, 60) for _ in range(7)] == [True] * 5 + [False] * 2
+    assert storage.stats()['remote_checks'] == 7
+    assert storage.stats()['local_hits'] == 0
+    assert storage.get_moving_window('login', 5, 60)[1] == 5
+
+def test_lease_serves_hits_locally(servers):
+    storage = RingRedisStorage(URI, lease_ttl=60)
+    assert all(storage.acquire_entry('events', 100, 60) for _ in range(5))
+    # One lease of 5 entries: the first hit goes to Redis, the next four are local
+    assert storage.stats()['remote_checks'] == 1
+    assert storage.stats()['local_hits'] == 4
+    assert storage.acquire_entry('events', 100, 60)
+    assert used(storage, 'events') == 10
+    # Leased entries not handed out yet are not reported as hits
+    assert storage.get_moving_window('events', 100, 60)[1] == 6
+
+def test_entries_expire_with_the_window(servers):
+    storage = RingRedisStorage(URI)
+    assert all(storage.acquire_entry('login', 5, 1) for _ in range(5))
+    assert not storage.acquire_entry('login', 5, 1)
+    time.sleep(1.1)
+    assert storage.acquire_entry('login', 5, 1)
+    assert storage.get_moving_window('login', 5, 1)[1] == 1
+
+def test_expired_lease_is_refunded(servers):
+    storage = RingRedisStorage(URI, lease_ttl=0.05)
+    assert storage.acquire_entry('events', 100, 60)
+    assert used(storage, 'events') == 5
+    time.sleep(0.1)
+    # The four unused entries go back before the next lease of five is granted
+    assert storage.acquire_entry('events', 100, 60)
+    assert storage.stats()['refunded'] == 4
+    assert used(storage, 'events') == 6
+    assert storage.get_moving_window('events', 100, 60)[1] == 2
+    window = storage.clients[storage._node('events')].zrange(storage._key('events'), 0, -1)
+    assert sorted(int(member.rsplit(':', 1)[1]) for member in window) == [1, 5]
+
+def test_refund_of_a_grant_gone_from_the_window_is_skipped(servers):
+    storage = RingRedisStorage(URI, lease_ttl=0.05)
+    assert storage.acquire_entry('events', 100, 1)
+    time.sleep(1.1)
+    assert storage.acquire_entry('events', 100, 1)
+    assert used(storage, 'events') == 5
+
+def test_instances_share_the_limit(servers):
+    first, second = RingRedisStorage(URI, lease_ttl=60), RingRedisStorage(URI, lease_ttl=60)
+    granted = sum(storage.acquire_entry('events', 100, 60) for _ in range(80) for storage in (first, second))
+    assert granted == 100
+
+def test_keys_spread_over_the_nodes(servers):
+    storage = RingRedisStorage(URI)
+    for index in range(60):
+        storage.acquire_entry(f'user:{index}', 5, 60)
+    assert sorted(servers) == ['redis_node_a', 'redis_node_b', 'redis_node_c']
+    for client in storage.clients.values():
+        assert any(True for _ in client.scan_iter(match='ratelimit:*'))
+    assert storage.reset() == 120
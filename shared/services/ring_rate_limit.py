@@ -0,0 +1,254 @@
+import itertools
+import os
+import threading
+import time
+import uuid
+
+from limits.storage import MovingWindowSupport, Storage
+from redis import Redis, RedisError
+from redis.sentinel import Sentinel
+
+from consistent_hashing.consistent_hashing import ConsistentHashRing
+
+# Grants up to ARGV[4] (at least ARGV[3]) entries of a sliding window, timed with the Redis clock.
+# KEYS[1] is a sorted set of grants scored by time, members '<id>:<size>'; KEYS[2] the number of entries granted.
+# First gives back ARGV[7] unused entries of the earlier grant ARGV[6], if it is still in the window.
+# Returns {granted, oldest grant time, entries in the window}, granted is 0 when the window is full.
+ACQUIRE_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local window, limit, amount, want = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local used = tonumber(redis.call('GET', KEYS[2]) or '0')
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now - window)
+for _, member in ipairs(expired) do
+    used = used - tonumber(string.match(member, ':(%d+)$'))
+end
+if #expired > 0 then
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+end
+local refund = tonumber(ARGV[7])
+if refund > 0 then
+    local score = redis.call('ZSCORE', KEYS[1], ARGV[6])
+    if score then
+        local kept = tonumber(string.match(ARGV[6], ':(%d+)$')) - refund
+        redis.call('ZREM', KEYS[1], ARGV[6])
+        if kept > 0 then
+            redis.call('ZADD', KEYS[1], score, string.match(ARGV[6], '^(.*):%d+$') .. ':' .. kept)
+        end
+        used = used - refund
+    end
+end
+if used < 0 then
+    used = 0
+end
+local granted = math.min(want, limit - used)
+if granted < amount then
+    granted = 0
+else
+    redis.call('ZADD', KEYS[1], now, ARGV[5] .. ':' .. granted)
+    used = used + granted
+end
+local ttl = math.ceil(window * 1000)
+redis.call('SET', KEYS[2], used, 'PX', ttl)
+redis.call('PEXPIRE', KEYS[1], ttl)
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+return {granted, tostring(oldest[2] or now), used}
+"""
+
+# Returns {oldest grant time, entries} of the window without changing it
+WINDOW_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local grants = redis.call('ZRANGEBYSCORE', KEYS[1], now - tonumber(ARGV[1]), '+inf', 'WITHSCORES')
+local used = 0
+for index = 1, #grants, 2 do
+    used = used + tonumber(string.match(grants[index], ':(%d+)$'))
+end
+return {tostring(grants[2] or now), used}
+"""
+
+# Fixed window counter, for the fixed-window strategies
+INCR_SCRIPT = """
+local value = redis.call('INCRBY', KEYS[1], ARGV[1])
+if value == tonumber(ARGV[1]) or ARGV[3] == '1' then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return value
+"""
+
+# Local leases are pruned of the expired ones past this many keys
+MAX_LEASES = 10000
+
+def _parse_nodes(uri):
+    """Returns (scheme, [(node, host, port)], service name) from a ringredis URI."""
+    scheme, _, rest = uri.partition('://')
+    locations, _, service = rest.partition('/')
+    nodes = []
+    for location in filter(None, locations.split(',')):
+        node, _, address = location.rpartition('@')
+        host, _, port = address.partition(':')
+        nodes.append((node or host, host, int(port or (26379 if scheme.endswith('+sentinel') else 6379))))
+    if not nodes:
+        raise ValueError(f"No Redis node in rate limit storage URI: {uri}")
+    return scheme, nodes, service or 'mymaster'
+
+class RingRedisStorage(Storage, MovingWindowSupport):
+    """Flask-Limiter storage sharding the counters over Redis nodes with ConsistentHashRing, used by both services.
+
+    URIs:
+    - ringredis://redis_node_a:6379,redis_node_b:6379
+    - ringredis+sentinel://redis_node_a@sentinel_node_a:26379,redis_node_b@sentinel_node_b:26379/mymaster
+      (one Sentinel per node, the node name is what the ring hashes)
+
+    Counters live in Redis database `db` of every node, apart from the
+    other data the services keep on those nodes.
+
+    Every check of the moving-window strategy is one atomic script on the
+    node owning the key, timed with the Redis clock so instances never
+    disagree about the window. A window is a sorted set of grants plus a
+    running total, so its size does not depend on the limit.
+
+    For large limits, a check leases a block of `lease_fraction * limit`
+    entries (at most `max_lease`) and serves the next hits of that key from
+    memory for up to `lease_ttl` seconds. Leased entries are counted when
+    they are granted, so a lease may let a few hits through up to
+    `lease_ttl` seconds early. Entries left when a lease expires are given
+    back by the next check of the same key; those of a key never checked
+    again stay counted until they leave the window. Limits too small to
+    lease (5 per minute) are checked exactly, one round-trip per hit.
+    """
+
+    STORAGE_SCHEME = ['ringredis', 'ringredis+sentinel']
+
+    def __init__(self, uri, wrap_exceptions=False, lease_fraction=0.05, max_lease=100, lease_ttl=0.5, key_prefix='ratelimit', vnodes=256, socket_timeout=1, db=0, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        scheme, nodes, service = _parse_nodes(uri)
+        self.ring = ConsistentHashRing(replicas=vnodes, hash_function='blake2b64')
+        self.clients = {}
+        for node, host, port in nodes:
+            if scheme.endswith('+sentinel'):
+                sentinel = Sentinel([(host, port)], socket_timeout=socket_timeout)
+                self.clients[node] = sentinel.master_for(service, socket_timeout=socket_timeout, db=db, decode_responses=True)
+            else:
+                self.clients[node] = Redis(host=host, port=port, db=db, socket_timeout=socket_timeout, decode_responses=True)
+            self.ring.add_node(node)
+        self.db = db
+        self.lease_fraction = lease_fraction
+        self.max_lease = max_lease
+        self.lease_ttl = lease_ttl
+        self.key_prefix = key_prefix
+        self._scripts = {
+            node: (client.register_script(ACQUIRE_SCRIPT), client.register_script(WINDOW_SCRIPT), client.register_script(INCR_SCRIPT))
+            for node, client in self.clients.items()
+        }
+        self._grant_id = f'{uuid.uuid4().hex[:12]}-{os.getpid()}'
+        self._grants = itertools.count()
+        self._lock = threading.Lock()
+        # key -> [entries left, lease end (monotonic), grant member]
+        self._leases = {}
+        self.local_hits = 0
+        self.remote_checks = 0
+        self.rejected = 0
+        self.refunded = 0
+
+    @property
+    def base_exceptions(self):
+        return RedisError
+
+    def _key(self, key):
+        return f'{self.key_prefix}:{key}'
+
+    def _node(self, key):
+        return self.ring.get_node(key)
+
+    def _lease_size(self, limit):
+        return min(self.max_lease, int(limit * self.lease_fraction))
+
+    def acquire_entry(self, key, limit, expiry, amount=1):
+        if amount > limit:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            lease = self._leases.get(key)
+            if lease is not None and lease[1] > now and lease[0] >= amount:
+                lease[0] -= amount
+                self.local_hits += 1
+                return True
+            # What is left of an expired or too small lease goes back to the window
+            lease = self._leases.pop(key, None)
+        refund_member, refund = (lease[2], lease[0]) if lease is not None and lease[0] > 0 else ('', 0)
+        node = self._node(key)
+        acquire = self._scripts[node][0]
+        want = max(amount, self._lease_size(limit))
+        window_key = self._key(key)
+        grant_id = f'{self._grant_id}.{next(self._grants)}'
+        granted, _, _ = acquire(
+            keys=[window_key, f'{window_key}:used'],
+            args=[expiry, limit, amount, want, grant_id, refund_member, refund],
+        )
+        granted = int(granted)
+        with self._lock:
+            self.remote_checks += 1
+            self.refunded += refund
+            if not granted:
+                self.rejected += 1
+                return False
+            if granted > amount:
+                self._leases[key] = [granted - amount, now + min(self.lease_ttl, expiry), f'{grant_id}:{granted}']
+                if len(self._leases) > MAX_LEASES:
+                    self._leases = {name: lease for name, lease in self._leases.items() if lease[1] > now}
+        return True
+
+    def get_moving_window(self, key, limit, expiry):
+        oldest, used = self._scripts[self._node(key)][1](keys=[self._key(key)], args=[expiry])
+        with self._lock:
+            lease = self._leases.get(key)
+            # Entries leased here but not handed out yet are not hits
+            unused = lease[0] if lease is not None and lease[1] > time.monotonic() else 0
+        return int(float(oldest)), max(0, int(used) - unused)
+
+    def incr(self, key, expiry, elastic_expiry=False, amount=1):
+        incr = self._scripts[self._node(key)][2]
+        return int(incr(keys=[self._key(key)], args=[amount, expiry, '1' if elastic_expiry else '0']))
+
+    def get(self, key):
+        return int(self.clients[self._node(key)].get(self._key(key)) or 0)
+
+    def get_expiry(self, key):
+        ttl = self.clients[self._node(key)].pttl(self._key(key))
+        return int(time.time() + max(ttl, 0) / 1000)
+
+    def check(self):
+        try:
+            return all(client.ping() for client in self.clients.values())
+        except RedisError:
+            return False
+
+    def reset(self):
+        with self._lock:
+            self._leases.clear()
+        deleted = 0
+        for client in self.clients.values():
+            keys = list(client.scan_iter(match=f'{self.key_prefix}:*', count=1000))
+            for index in range(0, len(keys), 1000):
+                deleted += client.delete(*keys[index:index + 1000])
+        return deleted
+
+    def clear(self, key):
+        with self._lock:
+            self._leases.pop(key, None)
+        window_key = self._key(key)
+        self.clients[self._node(key)].delete(window_key, f'{window_key}:used')
+
+    def stats(self):
+        checks = self.local_hits + self.remote_checks
+        return {
+            'nodes': sorted(self.clients),
+            'db': self.db,
+            'leases': len(self._leases),
+            'local_hits': self.local_hits,
+            'remote_checks': self.remote_checks,
+            'rejected': self.rejected,
+            'refunded': self.refunded,
+            'local_ratio': round(self.local_hits / checks, 4) if checks else None,
+        }
@@ -0,0 +1,116 @@
+import io
+
+import pytest
+
+from services import bulk_users
+from services.bulk_users import MAX_FIELD_LENGTH, provision_users, read_rows, validate
+
+class FakeSession:
+    def __init__(self):
+        self.commits = 0
+
+    def commit(self):
+        self.commits += 1
+
+class FakeDatabase:
+    def __init__(self):
+        self.session = FakeSession()
+
+@pytest.fixture
+def users(monkeypatch):
+    """A users table in memory; `taken` are registered by someone else between the check and the insert."""
+    table = {'registered': {'carol'}, 'taken': set(), 'batches': [], 'created': []}
+
+    def existing_usernames(usernames):
+        return {username for username in usernames if username in table['registered']}
+
+    def insert_users(rows, method='copy'):
+        table['batches'].append([row['username'] for row in rows])
+        # ON CONFLICT DO NOTHING: a concurrent registration is not returned
+        created = {row['username'] for row in rows if row['username'] not in table['taken']}
+        table['registered'] |= {row['username'] for row in rows}
+        return created
+
+    database = FakeDatabase()
+    monkeypatch.setattr(bulk_users, 'existing_usernames', existing_usernames)
+    monkeypatch.setattr(bulk_users, 'insert_users', insert_users)
+    monkeypatch.setattr(bulk_users, 'db', database)
+    table['session'] = database.session
+    return table
+
+def csv_rows(body):
+    return list(read_rows(io.StringIO(body, newline=''), 'text/csv'))
+
+def test_csv_rows_are_indexed_from_zero():
+    assert csv_rows('password,username\nsecret,alice\nhunter2,bob\n') == [
+        (0, {'username': 'alice', 'password': 'secret'}),
+        (1, {'username': 'bob', 'password': 'hunter2'}),
+    ]
+
+@pytest.mark.parametrize('body', ['username\nalice\n', 'user,password\nalice,secret\n', ''])
+def test_csv_without_both_columns_is_rejected(body):
+    with pytest.raises(ValueError, match='header'):
+        csv_rows(body)
+
+def test_ndjson_skips_blank_lines_and_keeps_bad_lines():
+    rows = list(read_rows(['{"username": "alice", "password": "x"}\n', '\n', '{not json\n', '[1]\n'], 'application/x-ndjson'))
+    assert [index for index, _ in rows] == [0, 1, 2]
+    assert isinstance(rows[1][1], ValueError)
+    assert rows[2][1] == [1]
+
+@pytest.mark.parametrize('item, error', [
+    ({'username': 'alice', 'password': ''}, 'password'),
+    ({'username': 'alice'}, 'password'),
+    ({'username': 'a' * (MAX_FIELD_LENGTH + 1), 'password': 'x'}, 'username'),
+    ({'username': 7, 'password': 'x'}, 'username'),
+    (['alice', 'x'], 'object'),
+    (ValueError('Invalid JSON: oops'), 'Invalid JSON'),
+])
+def test_invalid_rows(item, error):
+    with pytest.raises(ValueError, match=error):
+        validate(item)
+
+def test_csv_row_missing_a_value_is_invalid():
+    (_, item), = csv_rows('username,password\nalice\n')
+    with pytest.raises(ValueError, match='password'):
+        validate(item)
+
+def test_statuses_of_every_row(users):
+    rows = enumerate([
+        {'username': 'alice', 'password': 'a'},
+        {'username': 'carol', 'password': 'c'},
+        {'username': 'alice', 'password': 'again'},
+        {'username': 'dave', 'password': ''},
+        {'username': 'erin', 'password': 'e'},
+    ])
+    assert list(provision_users(rows, batch_size=10)) == [
+        {'index': 0, 'username': 'alice', 'status': 'created'},
+        {'index': 1, 'username': 'carol', 'status': 'exists'},
+        {'index': 2, 'username': 'alice', 'status': 'duplicate'},
+        {'index': 3, 'status': 'invalid', 'error': f'password must be 1 to {MAX_FIELD_LENGTH} characters'},
+        {'index': 4, 'username': 'erin', 'status': 'created'},
+    ]
+    # Existing usernames are never sent to the insert
+    assert users['batches'] == [['alice', 'erin']]
+
+def test_rows_skipped_by_on_conflict_are_reported_as_existing(users):
+    users['taken'] = {'bob'}
+    created = []
+    results = list(provision_users(enumerate([{'username': 'alice', 'password': 'a'}, {'username': 'bob', 'password': 'b'}]), on_created=created.append))
+    assert [result['status'] for result in results] == ['created', 'exists']
+    assert created == [{'alice'}]
+
+def test_duplicates_are_found_across_batches(users):
+    rows = enumerate({'username': name, 'password': 'x'} for name in ['alice', 'bob', 'alice', 'bob', 'frank'])
+    results = list(provision_users(rows, batch_size=2))
+    assert [result['status'] for result in results] == ['created', 'created', 'duplicate', 'duplicate', 'created']
+    # One commit per batch, the third batch holds a single row
+    assert users['session'].commits == 3
+
+def test_too_many_rows_stop_after_the_committed_batches(users):
+    rows = enumerate({'username': f'user{index}', 'password': 'x'} for index in range(5))
+    results = provision_users(rows, batch_size=2, max_rows=3)
+    assert [result['status'] for result in [next(results), next(results)]] == ['created', 'created']
+    with pytest.raises(ValueError, match='At most 3'):
+        next(results)
+    assert users['session'].commits == 1
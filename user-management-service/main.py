@@ -4,11 +4,14 @@ from flask_jwt_extended import JWTManager
 from datetime import timedelta
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from threading import BoundedSemaphore
 import os
 from dotenv import load_dotenv
 from models.model import User
 from models.database import db
+from models.routing import router, engine_options, replica_binds
+from services.concurrency_limiter import ConcurrencyLimiter
+# Registers the ringredis:// rate limit storage schemes
+from services.ring_rate_limit import RingRedisStorage
 
 
 load_dotenv(os.path.join(os.path.dirname(__file__), '../user-management-db/.env'))
@@ -25,17 +28,67 @@ print(f'postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}')
 
 app.config['SQLALCHEMY_DATABASE_URI'] = f'postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options('DB_PRIMARY')
+# Comma separated 'host' or 'host:port' list of streaming replicas serving the reads
+replica_hosts = [host for host in os.getenv('POSTGRES_REPLICA_HOSTS', '').split(',') if host]
+app.config['SQLALCHEMY_BINDS'] = replica_binds(replica_hosts, db_user, db_password, db_name, db_port)
+app.config['REPLICA_MAX_LAG'] = float(os.getenv('REPLICA_MAX_LAG', 5))
+app.config['REPLICA_CHECK_INTERVAL'] = float(os.getenv('REPLICA_CHECK_INTERVAL', 5))
+app.config['REPLICA_STICKY_SECONDS'] = float(os.getenv('REPLICA_STICKY_SECONDS', 5))
+# Read-your-writes deadlines shared by every instance of the service
+app.config['REPLICA_STICKY_URL'] = os.getenv('REPLICA_STICKY_URL', 'redis://redis:6379/2')
 app.secret_key = 'super secret key'
 app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(days=1)
+app.config['TOKEN_CACHE_SIZE'] = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+app.config['TOKEN_CACHE_TTL'] = int(os.getenv('TOKEN_CACHE_TTL', 3600))
+app.config['HEALTH_CHECK_INTERVAL'] = float(os.getenv('HEALTH_CHECK_INTERVAL', 10))
+app.config['HEALTH_MAX_AGE'] = float(os.getenv('HEALTH_MAX_AGE', 30))
+app.config['USERNAME_FILTER_CAPACITY'] = int(os.getenv('USERNAME_FILTER_CAPACITY', 1000000))
+app.config['USERNAME_FILTER_ERROR_RATE'] = float(os.getenv('USERNAME_FILTER_ERROR_RATE', 0.01))
+# Redis database of the username filter on its shard, apart from the tokens stored under the usernames in db 0
+app.config['USERNAME_FILTER_DB'] = int(os.getenv('USERNAME_FILTER_DB', 1))
+app.config['USERNAME_FILTER_REBUILD_INTERVAL'] = float(os.getenv('USERNAME_FILTER_REBUILD_INTERVAL', 3600))
+# 'copy' loads bulk registrations with PostgreSQL COPY, 'insert' with multi-row INSERTs
+app.config['BULK_REGISTER_METHOD'] = os.getenv('BULK_REGISTER_METHOD', 'copy')
+app.config['BULK_REGISTER_BATCH'] = int(os.getenv('BULK_REGISTER_BATCH', 1000))
+app.config['BULK_REGISTER_MAX_ROWS'] = int(os.getenv('BULK_REGISTER_MAX_ROWS', 100000))
+# Comma separated usernames allowed to register users in bulk, nobody by default
+app.config['BULK_REGISTER_ADMINS'] = frozenset(name for name in os.getenv('BULK_REGISTER_ADMINS', '').split(',') if name)
+# Rate limits are shared by every instance: moving windows sharded over the Redis nodes
+app.config['RATELIMIT_STORAGE_URI'] = os.getenv('RATELIMIT_STORAGE_URI', 'ringredis+sentinel://redis_node_a@sentinel_node_a:26379,redis_node_b@sentinel_node_b:26379,redis_node_c@sentinel_node_c:26379/mymaster')
+app.config['RATELIMIT_STRATEGY'] = 'moving-window'
+app.config['RATELIMIT_STORAGE_OPTIONS'] = {
+    'lease_fraction': float(os.getenv('RATELIMIT_LEASE_FRACTION', 0.05)),
+    'max_lease': int(os.getenv('RATELIMIT_MAX_LEASE', 100)),
+    'lease_ttl': float(os.getenv('RATELIMIT_LEASE_TTL', 0.5)),
+    # Not database 0, whose keyspace notifications feed the token cache
+    'db': int(os.getenv('RATELIMIT_REDIS_DB', 2)),
+}
+# Per-process limits while the Redis nodes are unreachable
+app.config['RATELIMIT_IN_MEMORY_FALLBACK_ENABLED'] = True
+app.config['LOG_HOST'] = os.getenv('LOG_HOST', 'logstash')
+app.config['LOG_PORT'] = int(os.getenv('LOG_PORT', 5044))
+app.config['LOG_QUEUE_SIZE'] = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+app.config['LOG_BATCH_SIZE'] = int(os.getenv('LOG_BATCH_SIZE', 100))
+app.config['LOG_FLUSH_INTERVAL'] = float(os.getenv('LOG_FLUSH_INTERVAL', 1.0))
+app.config['LOG_QUEUE_POLICY'] = os.getenv('LOG_QUEUE_POLICY', 'drop')
 
 jwt = JWTManager(app)
 limiter = Limiter(get_remote_address, default_limits=["5 per minute"])
-semaphore = BoundedSemaphore(2) # 2 concurrent requests
+# Adaptive per-route concurrency limits (start at 2 concurrent requests, like the old semaphore)
+concurrency_limiter = ConcurrencyLimiter(
+    initial_limit=int(os.getenv('CONCURRENCY_INITIAL_LIMIT', 2)),
+    max_limit=int(os.getenv('CONCURRENCY_MAX_LIMIT', 20)),
+    max_queue=int(os.getenv('CONCURRENCY_MAX_QUEUE', 10)),
+    queue_timeout=float(os.getenv('CONCURRENCY_QUEUE_TIMEOUT', 1.0)),
+    latency_target=float(os.getenv('CONCURRENCY_LATENCY_TARGET', 0.5)),
+)
 
 db.init_app(app)
+router.init_app(app, db)
 limiter.init_app(app)
 
-    # return app, db, jwt, limiter, semaphore
+    # return app, db, jwt, limiter, concurrency_limiter
     
 
 if __name__ == '__main__':
@@ -1,3 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
\ No newline at end of file
+from models.routing import RoutingSession
+
+# Reads go to the replicas when SQLALCHEMY_BINDS lists some, see models/routing.py
+db = SQLAlchemy(session_options={'class_': RoutingSession})
\ No newline at end of file
@@ -0,0 +1,61 @@
+from services.redis_topology import RedisTopology
+
+class FakeSentinel:
+    """Answers discovery requests with whatever master the test sets."""
+
+    def __init__(self, master):
+        self.master = master
+        self.sentinels = []
+
+    def master_for(self, service_name, **options):
+        return ('client', self.master)
+
+    def discover_master(self, service_name):
+        if self.master is None:
+            raise ConnectionError('sentinel down')
+        return self.master
+
+    def discover_slaves(self, service_name):
+        return [('replica', 6379)]
+
+def topology_with(masters):
+    sentinels = {node: FakeSentinel(master) for node, master in masters.items()}
+    return RedisTopology(sentinels), sentinels
+
+def test_failover_calls_the_callbacks_of_that_node_only():
+    topology, sentinels = topology_with({'redis_node_a': ('10.0.0.1', 6379), 'redis_node_b': ('10.0.0.2', 6379)})
+    failed_over = []
+    topology.on_failover(failed_over.append)
+    for node in sentinels:
+        assert topology.refresh(node)
+    # The first view of a node and unchanged masters are not failovers
+    assert topology.refresh('redis_node_a')
+    assert failed_over == []
+
+    sentinels['redis_node_a'].master = ('10.0.0.3', 6379)
+    assert topology.refresh('redis_node_a')
+    assert topology.refresh('redis_node_b')
+    assert failed_over == ['redis_node_a']
+    assert topology.client('redis_node_a') == ('client', ('10.0.0.3', 6379))
+    assert topology.nodes()['redis_node_a']['master'] == {'host': '10.0.0.3', 'port': 6379, 'role': 'master'}
+
+def test_failing_callback_does_not_stop_the_others():
+    topology, sentinels = topology_with({'redis_node_a': ('10.0.0.1', 6379)})
+    called = []
+
+    def broken(node):
+        raise RuntimeError('boom')
+
+    topology.on_failover(broken)
+    topology.on_failover(called.append)
+    topology.refresh('redis_node_a')
+    sentinels['redis_node_a'].master = ('10.0.0.3', 6379)
+    assert topology.refresh('redis_node_a')
+    assert called == ['redis_node_a']
+
+def test_unreachable_sentinel_keeps_the_cached_layout():
+    topology, sentinels = topology_with({'redis_node_a': ('10.0.0.1', 6379)})
+    topology.refresh('redis_node_a')
+    sentinels['redis_node_a'].master = None
+    assert not topology.refresh('redis_node_a')
+    assert topology.nodes()['redis_node_a']['master']['host'] == '10.0.0.1'
@@ -1,18 +1,32 @@
-from flask import Flask, request, session, jsonify, Blueprint
+from flask import Flask, request, session, jsonify, Blueprint, Response, stream_with_context
 from flask_limiter.util import get_remote_address
 from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token
-from main import app, db, jwt, limiter, semaphore
+from main import app, db, jwt, limiter, concurrency_limiter
 from models.model import User
 from time import sleep
 import logging
 import logstash
+import csv
+import io
+import json
+from collections import Counter
 from redis.sentinel import Sentinel
-from redis import StrictRedis
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+import os
 
 from consistent_hashing.consistent_hashing import ConsistentHashRing
+from services.redis_scan import parse_cursor, format_cursor, scan_nodes
+from services.redis_topology import RedisTopology
+from services.token_cache import TokenCache
+from models.routing import router, use_primary
+from services.health import HealthMonitor, database_probe
+from services.log_shipper import BatchingLogHandler
+from services.username_filter import UsernameFilter
+from services.bulk_users import CONTENT_TYPES, read_rows, provision_users
+from services.ring_rate_limit import RingRedisStorage
 
 # Consistent Hash Ring Initialization
-hash_ring = ConsistentHashRing(replicas=3)
+hash_ring = ConsistentHashRing(replicas=int(os.getenv('HASH_RING_VNODES', 256)), hash_function='blake2b64')
 hash_ring.add_node("redis_node_a")
 hash_ring.add_node("redis_node_b")
 hash_ring.add_node("redis_node_c")
@@ -24,122 +38,213 @@ sentinels = {
     "redis_node_c": Sentinel([("sentinel_node_c", 26379)], socket_timeout=1),
 }
 
-# Initialize Redis connections dynamically based on the master node for each Redis node
-def get_redis_clients():
-    redis_clients = {}
-    for node in ["redis_node_a", "redis_node_b", "redis_node_c"]:
-        master = sentinels[node].master_for("mymaster", decode_responses=True)
-        redis_clients[node] = master
-    return redis_clients
+# Cached master/replica layout, refreshed on Sentinel failover events
+topology = RedisTopology(sentinels).start()
 
-redis_clients = get_redis_clients()
+# In-process token cache in front of the Redis shards, kept in sync through keyspace notifications
+TOKEN_TTL = 3600
+token_cache = TokenCache(maxsize=app.config['TOKEN_CACHE_SIZE'], ttl=min(app.config['TOKEN_CACHE_TTL'], TOKEN_TTL)).listen(topology)
 
-# Set up logging
+# Set up logging, records are shipped to Logstash in batches from a background thread
 logger = logging.getLogger('python-logstash-logger')
 logger.setLevel(logging.INFO)
-logger.addHandler(logstash.TCPLogstashHandler('logstash', 5044, version=1))
+log_shipper = BatchingLogHandler(
+    logstash.TCPLogstashHandler(app.config['LOG_HOST'], app.config['LOG_PORT'], version=1),
+    capacity=app.config['LOG_QUEUE_SIZE'],
+    batch_size=app.config['LOG_BATCH_SIZE'],
+    flush_interval=app.config['LOG_FLUSH_INTERVAL'],
+    policy=app.config['LOG_QUEUE_POLICY'],
+)
+logger.addHandler(log_shipper)
 
 user = Blueprint('user', __name__)
 
-# Get the status of Redis nodes (master and replicas)
-def get_redis_nodes():
-    redis_nodes = {}
-    for node_name in sentinels:
-        # Get master node information
-        master = sentinels[node_name].master_for("mymaster", decode_responses=True)
-        
-        # Extract connection details from the master Redis client
-        master_host = master.connection_pool.get_connection('ping')._sock.getpeername()[0]
-        master_port = master.connection_pool.get_connection('ping')._sock.getpeername()[1]
-        
-        redis_nodes[node_name] = {
-            'master': {
-                'host': master_host,
-                'port': master_port,
-                'role': 'master'
-            },
-            'replicas': []
-        }
-        
-        # Get replica nodes information
-        replicas = sentinels[node_name].discover_slaves("mymaster")
-        for replica in replicas:
-            replica_connection = StrictRedis(host=replica['ip'], port=replica['port'], decode_responses=True)
-            redis_nodes[node_name]['replicas'].append({
-                'host': replica['ip'],
-                'port': replica['port'],
-                'role': 'replica'
-            })
-    
-    return redis_nodes
+def load_usernames():
+    with app.app_context():
+        # A lagging replica would miss the latest registrations
+        use_primary(db.session)
+        try:
+            for (username,) in db.session.query(User.username).yield_per(10000):
+                yield username
+        finally:
+            db.session.remove()
+
+# Bloom filter of registered usernames shared by all instances, rebuilt from the users table in the background
+USERNAME_FILTER_PREFIX = 'usernames:bloom'
+username_filter = UsernameFilter(
+    sentinels[hash_ring.get_node(USERNAME_FILTER_PREFIX)].master_for('mymaster', db=app.config['USERNAME_FILTER_DB']),
+    capacity=app.config['USERNAME_FILTER_CAPACITY'],
+    error_rate=app.config['USERNAME_FILTER_ERROR_RATE'],
+    prefix=USERNAME_FILTER_PREFIX,
+).start(load_usernames, interval=app.config['USERNAME_FILTER_REBUILD_INTERVAL'])
+
+@topology.on_failover
+def invalidate_username_filter(node):
+    # The new master may lack the last bits set on the old one
+    if node == hash_ring.get_node(USERNAME_FILTER_PREFIX):
+        username_filter.invalidate()
+        username_filter.rebuild_soon()
+
+# Background health probes, the status endpoints only read the cached result
+health = HealthMonitor(
+    {
+        'database': database_probe(app, db),
+        **{node: (lambda node=node: topology.client(node).ping()) for node in sentinels},
+    },
+    critical=['database'],
+    interval=app.config['HEALTH_CHECK_INTERVAL'],
+    max_age=app.config['HEALTH_MAX_AGE'],
+).start()
 
 @user.route('/api/user/status', methods=['GET'])
+@user.route('/api/user/status/ready', methods=['GET'])
+@limiter.exempt
 def status():
-    try:
-        semaphore.acquire()
-        users = db.session.query(User).all()
-        if users:
-            logger.info('microservice: Service and database are up and running', extra={'service': 'user-management-service' ,'status': 'success'})
-            return jsonify({'message': 'Service and database are up and running'}), 200
-    finally:
-        semaphore.release()
+    ready, payload = health.readiness()
+    if not ready:
+        return jsonify({'message': 'Service is not ready', **payload}), 503
+    return jsonify({'message': 'Service and database are up and running', **payload}), 200
+
+@user.route('/api/user/status/live', methods=['GET'])
+@limiter.exempt
+def liveness():
+    return jsonify(health.liveness()), 200
 
 @user.route('/api/user/register', methods=['POST'])
 # @limiter.limit("5 per minute")
+@concurrency_limiter.limit('register')
 def register():
-    try:
-        semaphore.acquire()
-        credentials = request.get_json()
+    credentials = request.get_json()
 
-        if not credentials or 'username' not in credentials or 'password' not in credentials:
-            logger.error('microservice: Missing username or password', extra={'service': 'user-management-service' ,'status': 'error'})
-            return "Missing username or password", 400
+    if not credentials or 'username' not in credentials or 'password' not in credentials:
+        logger.error('microservice: Missing username or password', extra={'service': 'user-management-service' ,'status': 'error'})
+        return "Missing username or password", 400
 
-        username = credentials['username']
-        password = credentials['password']
+    username = credentials['username']
+    password = credentials['password']
 
+    # A definite no from the username filter saves the existence query
+    if username_filter.might_contain(username):
         check_user = db.session.query(User).filter_by(username=username).first()
         if check_user:
             logger.error('microservice: User already exists', extra={'service': 'user-management-service' ,'status': 'error'})
             return "User already exists", 409
-        
-        new_user = User(username=username, password=password)
-        db.session.add(new_user)
+
+    # Added before the commit: a user missing from the filter could never log in
+    try:
+        username_filter.add(username)
+    except Exception as e:
+        logger.error(f'microservice: Username filter update failed: {e}', extra={'service': 'user-management-service' ,'status': 'error'})
+        username_filter.invalidate()
+
+    new_user = User(username=username, password=password)
+    db.session.add(new_user)
+    try:
         db.session.commit()
+    except IntegrityError:
+        # Registered concurrently by another request
+        db.session.rollback()
+        logger.error('microservice: User already exists', extra={'service': 'user-management-service' ,'status': 'error'})
+        return "User already exists", 409
+
+    logger.info('microservice: User registered successfully', extra={'service': 'user-management-service' ,'status': 'success'})
+    return jsonify({"message": "User registered successfully!"}), 201
+
+@user.route('/api/user/register/bulk', methods=['POST'])
+@jwt_required()
+@concurrency_limiter.limit('register_bulk', max_limit=2, max_queue=2, latency_target=30.0)
+def register_bulk():
+    # Creating accounts in bulk is reserved to the administrators
+    if get_jwt_identity() not in app.config['BULK_REGISTER_ADMINS']:
+        logger.error('microservice: Bulk registration not allowed', extra={'service': 'user-management-service' ,'status': 'error'})
+        return "Only administrators can register users in bulk", 403
+    # Body: CSV with a username,password header, or NDJSON {"username", "password"} lines
+    if request.mimetype not in CONTENT_TYPES:
+        return f"Content-Type must be one of {', '.join(CONTENT_TYPES)}", 415
+    content_type = request.mimetype
+    lines = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+
+    def add_to_filter(usernames):
+        try:
+            username_filter.add_many(usernames)
+        except Exception as e:
+            logger.error(f'microservice: Username filter update failed: {e}', extra={'service': 'user-management-service' ,'status': 'error'})
+            username_filter.invalidate()
+
+    def generate():
+        # Stream one NDJSON line per row as its batch is committed, then a summary line
+        counts = Counter()
+        try:
+            for result in provision_users(
+                read_rows(lines, content_type),
+                method=app.config['BULK_REGISTER_METHOD'],
+                batch_size=app.config['BULK_REGISTER_BATCH'],
+                max_rows=app.config['BULK_REGISTER_MAX_ROWS'],
+                on_created=add_to_filter,
+            ):
+                counts[result['status']] += 1
+                yield json.dumps(result) + '\n'
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            db.session.rollback()
+            logger.error(f'microservice: Bulk registration stopped: {e}', extra={'service': 'user-management-service' ,'status': 'error'})
+            yield json.dumps({'error': str(e)}) + '\n'
+        except SQLAlchemyError as e:
+            # The batch in progress is rolled back, the rows already streamed were committed.
+            # Only the driver error is reported, str(e) would carry the statement parameters (passwords).
+            db.session.rollback()
+            error = getattr(e, 'orig', None) or e
+            logger.error(f'microservice: Bulk registration stopped by the database: {error}', extra={'service': 'user-management-service' ,'status': 'error'})
+            yield json.dumps({'error': f'The database rejected a batch: {error}'.strip()}) + '\n'
+        logger.info('microservice: Users registered in bulk', extra={'service': 'user-management-service' ,'status': 'success'})
+        yield json.dumps({'summary': dict(counts)}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson'), 200
 
-        logger.info('microservice: User registered successfully', extra={'service': 'user-management-service' ,'status': 'success'})
-        return jsonify({"message": "User registered successfully!"}), 201
-    finally:
-        semaphore.release()
-    
 @user.route('/api/user/login', methods=['POST'])
+@concurrency_limiter.limit('login')
 def login():
     # sleep(30)
     try:
-        semaphore.acquire()
         credentials = request.get_json()
         username = credentials['username']
         password = credentials['password']
 
+        # Unknown usernames are rejected without a database query
+        if not username_filter.might_contain(username):
+            logger.error('Invalid credentials', extra={'service': 'user-management-service', 'status': 'error'})
+            return "Invalid credentials", 401
+
         # Check user in the database
         user = db.session.query(User).filter_by(username=username, password=password).first()
         if not user:
             logger.error('Invalid credentials', extra={'service': 'user-management-service', 'status': 'error'})
             return "Invalid credentials", 401
 
+        # Check the in-process cache first, hot users never reach Redis
+        cached_token = token_cache.get(username)
+        if cached_token:
+            logger.info('User found in cache', extra={'service': 'user-management-service', 'status': 'success'})
+            return jsonify({"message": "Logged in successfully (cached)!", "token": cached_token, "username": username}), 200
+
         # Determine which Redis node to use using consistent hashing
         redis_node = hash_ring.get_node(username)
-        redis_client = redis_clients[redis_node]
+        redis_client = topology.client(redis_node)
 
-        # Check if username is in cache
-        cached_token = redis_client.get(username)
+        # Check if username is in cache, reading the remaining TTL in the same round-trip
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.get(username)
+        pipe.ttl(username)
+        cached_token, ttl = pipe.execute()
         if cached_token:
+            token_cache.set(username, cached_token, ttl=ttl)
             logger.info('User found in cache', extra={'service': 'user-management-service', 'status': 'success'})
             return jsonify({"message": "Logged in successfully (cached)!", "token": cached_token, "username": username}), 200
 
         # Generate a new token and save to Redis
         jwt_token = create_access_token(identity=username)
-        redis_client.set(username, jwt_token, ex=3600)  # Cache for 1 hour
+        # Cached locally before the write so our own keyspace notification is recognised
+        token_cache.set(username, jwt_token, ttl=TOKEN_TTL, own_write=True)
+        redis_client.set(username, jwt_token, ex=TOKEN_TTL)  # Cache for 1 hour
 
         logger.info('Logged in successfully', extra={'service': 'user-management-service', 'status': 'success'})
         return jsonify({"message": "Logged in successfully!", "token": jwt_token, "username": username}), 200
@@ -147,46 +252,61 @@ def login():
     except Exception as e:
         logger.error(f"Exception occurred: {str(e)}", extra={'service': 'user-management-service', 'status': 'error'})
         return str(e), 500
-    finally:
-        semaphore.release()
 
 @user.route('/api/user/redis', methods=['GET'])
+@concurrency_limiter.limit('redis')
 def redis_status():
-    try:
-        semaphore.acquire()
-        redis_nodes = get_redis_nodes()
-        return jsonify(redis_nodes), 200
-    finally:
-        semaphore.release()
+    return jsonify(topology.nodes()), 200
+
+@user.route('/api/user/token_cache', methods=['GET'])
+def token_cache_status():
+    return jsonify(token_cache.stats()), 200
+
+@user.route('/api/user/limits', methods=['GET'])
+def limits_status():
+    return jsonify(concurrency_limiter.stats()), 200
+
+@user.route('/api/user/db_routing', methods=['GET'])
+def db_routing_status():
+    return jsonify(router.stats()), 200
+
+@user.route('/api/user/username_filter', methods=['GET'])
+def username_filter_status():
+    return jsonify(username_filter.stats()), 200
+
+@user.route('/api/user/rate_limits', methods=['GET'])
+def rate_limits_status():
+    storage = limiter.storage
+    if isinstance(storage, RingRedisStorage):
+        return jsonify(storage.stats()), 200
+    return jsonify({'storage': type(storage).__name__}), 200
+
+@user.route('/api/user/log_shipper', methods=['GET'])
+def log_shipper_status():
+    return jsonify(log_shipper.stats()), 200
 
 @user.route('/api/user/redis_content', methods=['GET'])
+@concurrency_limiter.limit('redis_content', max_limit=2, max_queue=2, latency_target=5.0)
 def redis_content():
+    # Optional parameters: match (SCAN pattern), limit (stop after this many keys), cursor (resume token)
+    match = request.args.get('match', '*')
+    limit = request.args.get('limit', type=int)
     try:
-        semaphore.acquire()
-        
-        # Initialize a dictionary to store the content from all Redis nodes
-        redis_content = {}
-
-        # Iterate over all Redis nodes
-        for node_name, redis_client in redis_clients.items():
-            # Get all keys from the Redis node
-            keys = redis_client.keys('*')  # Fetch all keys
-            node_data = {}
-
-            # For each key, fetch its corresponding value from Redis
-            for key in keys:
-                value = redis_client.get(key)
-                node_data[key] = value
-
-            # Add the node's data to the main dictionary
-            redis_content[node_name] = node_data
-        
-        # Return the collected data
+        redis_clients = topology.clients()
+        positions = parse_cursor(request.args.get('cursor'), redis_clients)
+    except ValueError as e:
+        return str(e), 400
+
+    def generate():
+        # Stream one NDJSON line per SCAN batch, then a final line with the resume cursor
+        try:
+            for node_name, data in scan_nodes(redis_clients, positions, match=match, limit=limit):
+                yield json.dumps({'node': node_name, 'data': data}) + '\n'
+        except Exception as e:
+            logger.error(f"Exception occurred while fetching Redis content: {str(e)}", extra={'service': 'user-management-service', 'status': 'error'})
+            yield json.dumps({'error': str(e)}) + '\n'
+            return
         logger.info('Redis content fetched successfully', extra={'service': 'user-management-service', 'status': 'success'})
-        return jsonify(redis_content), 200
+        yield json.dumps({'cursor': format_cursor(positions)}) + '\n'
 
-    except Exception as e:
-        logger.error(f"Exception occurred while fetching Redis content: {str(e)}", extra={'service': 'user-management-service', 'status': 'error'})
-        return str(e), 500
-    finally:
-        semaphore.release()
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson'), 200
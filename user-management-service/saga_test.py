@@ -0,0 +1,151 @@
+import asyncio
+import time
+
+import pytest
+
+from services.saga import OrchestrationBuilder, SagaBatchRunner, SagaDeadlineExceeded, SagaError
+
+def test_batch_with_reused_builder_keeps_sagas_apart():
+    created = []
+    compensated = []
+
+    def create():
+        created.append(object())
+        return created[-1]
+
+    def fail_second(resource):
+        if created.index(resource) == 1:
+            raise RuntimeError('second saga fails')
+
+    builder = OrchestrationBuilder()
+    builder.add_step(create, compensated.append)
+    builder.add_step(fail_second, lambda: None)
+
+    results = asyncio.run(SagaBatchRunner(max_concurrency=1).run([builder, builder, builder]))
+
+    assert len(created) == 3
+    assert isinstance(results[1], SagaError)
+    assert [results[0].steps[0].result, results[2].steps[0].result] == [created[0], created[2]]
+    # Only the failed saga's own resource is compensated
+    assert compensated == [created[1]]
+    assert builder.steps[0].result is None
+
+def test_dag_diamond_runs_branches_concurrently():
+    events = []
+
+    async def step(name, result, delay=0.0):
+        events.append(f'start {name}')
+        await asyncio.sleep(delay)
+        events.append(f'end {name}')
+        return result
+
+    builder = OrchestrationBuilder(dag=True)
+    builder.add_step(lambda: step('a', 'A'), lambda *_: None, name='a')
+    builder.add_step(lambda a: step('b', a + 'B', 0.02), lambda *_: None, name='b', depends_on=['a'])
+    builder.add_step(lambda a: step('c', a + 'C', 0.01), lambda *_: None, name='c', depends_on=['a'])
+    builder.add_step(lambda b, c: step('d', (b, c)), lambda *_: None, name='d', depends_on=['b', 'c'])
+
+    saga = asyncio.run(builder.execute())
+
+    assert saga.steps[3].result == ('AB', 'AC')
+    assert events[:4] == ['start a', 'end a', 'start b', 'start c']
+    assert events[-2:] == ['start d', 'end d']
+    assert saga.completed == [0, 2, 1, 3]
+
+def test_dag_failure_waits_for_running_sibling_and_compensates_in_reverse_completion_order():
+    compensated = []
+    started = []
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError('branch b failed')
+
+    async def slow_sibling():
+        await asyncio.sleep(0.03)
+        return 'c'
+
+    builder = OrchestrationBuilder(dag=True)
+    builder.add_step(lambda: 'a', compensated.append, name='a')
+    builder.add_step(lambda a: fail(), compensated.append, name='b', depends_on=['a'])
+    builder.add_step(lambda a: slow_sibling(), compensated.append, name='c', depends_on=['a'])
+    builder.add_step(lambda b, c: started.append('d'), compensated.append, name='d', depends_on=['b', 'c'])
+
+    with pytest.raises(SagaError) as error:
+        asyncio.run(builder.execute())
+
+    assert error.value.failed_step_index == 1
+    assert str(error.value.action_exception) == 'branch b failed'
+    assert error.value.other_failures == {}
+    # The running sibling finished and was compensated before the step it completed after
+    assert compensated == ['c', 'a']
+    assert started == []
+
+def test_dag_reports_other_failures():
+    async def fail(message, delay):
+        await asyncio.sleep(delay)
+        raise ValueError(message)
+
+    builder = OrchestrationBuilder(dag=True)
+    builder.add_step(lambda: fail('first', 0.01), lambda: None)
+    builder.add_step(lambda: fail('second', 0.02), lambda: None)
+
+    with pytest.raises(SagaError) as error:
+        asyncio.run(builder.execute())
+
+    assert error.value.failed_step_index == 0
+    assert list(error.value.other_failures) == [1]
+    assert {index: str(exc) for index, (exc, _) in error.value.failures.items()} == {0: 'first', 1: 'second'}
+    assert 'Other branches failed too' in str(error.value)
+
+def test_step_timeout_fails_the_step_and_compensates():
+    compensated = []
+    timings = []
+
+    async def hang():
+        await asyncio.sleep(1)
+
+    builder = OrchestrationBuilder(step_timeout=1, on_step_end=timings.append)
+    builder.add_step(lambda: 'created', compensated.append, name='create')
+    builder.add_step(hang, lambda: None, name='hang', timeout=0.02)
+
+    with pytest.raises(SagaError) as error:
+        asyncio.run(builder.execute())
+
+    assert error.value.failed_step_index == 1
+    assert isinstance(error.value.action_exception, asyncio.TimeoutError)
+    assert compensated == ['created']
+    assert [(timing.name, timing.compensated, timing.error is not None) for timing in timings] == [
+        ('create', False, False), ('hang', False, True), ('create', True, False),
+    ]
+    assert timings[1].duration < 0.5
+
+def test_deadline_exceeded_before_a_step_starts():
+    compensated = []
+    started = []
+
+    builder = OrchestrationBuilder(deadline=0.02)
+    builder.add_step(lambda: time.sleep(0.03) or 'slow', compensated.append)
+    builder.add_step(lambda *_: started.append('second'), lambda: None)
+
+    with pytest.raises(SagaError) as error:
+        asyncio.run(builder.execute())
+
+    assert error.value.failed_step_index == 1
+    assert isinstance(error.value.action_exception, SagaDeadlineExceeded)
+    assert started == []
+    # Compensations run whatever is left of the deadline
+    assert compensated == ['slow']
+
+def test_deadline_bounds_the_step_timeout():
+    async def hang():
+        await asyncio.sleep(1)
+
+    builder = OrchestrationBuilder(step_timeout=5, deadline=0.05)
+    builder.add_step(hang, lambda: None)
+
+    start = time.monotonic()
+    with pytest.raises(SagaError) as error:
+        asyncio.run(builder.execute())
+
+    assert isinstance(error.value.action_exception, asyncio.TimeoutError)
+    assert time.monotonic() - start < 0.5
@@ -0,0 +1,138 @@
+import csv
+import io
+import json
+from itertools import islice
+
+import psycopg2
+from sqlalchemy import select, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from models.database import db
+from models.model import User
+
+# Accepted request bodies: a CSV file with a username,password header, or one JSON object per line
+CONTENT_TYPES = ('text/csv', 'application/x-ndjson')
+# Length of the username and password columns
+MAX_FIELD_LENGTH = 80
+# Session-local staging table of the COPY method, emptied at every commit
+STAGING_TABLE = 'users_staging'
+
+def read_rows(lines, content_type):
+    """Yields (index, item) for every data row of the body; an unparsable NDJSON line gives a ValueError item."""
+    if content_type == 'text/csv':
+        reader = csv.DictReader(lines)
+        if not reader.fieldnames or not {'username', 'password'} <= set(reader.fieldnames):
+            raise ValueError("The CSV header must name the username and password columns")
+        yield from enumerate(reader)
+        return
+    index = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            item = ValueError(f"Invalid JSON: {e}")
+        yield index, item
+        index += 1
+
+def validate(item):
+    """Returns (username, password) from a row. Raises ValueError."""
+    if isinstance(item, ValueError):
+        raise item
+    if not isinstance(item, dict):
+        raise ValueError("A row must be an object with a username and a password")
+    for field in ('username', 'password'):
+        value = item.get(field)
+        if not isinstance(value, str) or not 0 < len(value) <= MAX_FIELD_LENGTH:
+            raise ValueError(f"{field} must be 1 to {MAX_FIELD_LENGTH} characters")
+    return item['username'], item['password']
+
+def existing_usernames(usernames):
+    """The subset of `usernames` already registered, in one query."""
+    if not usernames:
+        return set()
+    return set(db.session.scalars(select(User.username).where(User.username.in_(usernames))))
+
+def insert_users(rows, method='copy'):
+    """Inserts user rows in the current transaction, the caller commits. Returns the usernames created.
+
+    'copy' streams the rows into a temporary table with COPY and moves them
+    with one INSERT ... SELECT, 'insert' sends one multi-row INSERT. Both
+    skip usernames registered in the meantime (ON CONFLICT DO NOTHING).
+    """
+    if not rows:
+        return set()
+    if method == 'copy':
+        return _copy(rows)
+    statement = pg_insert(User).values(rows).on_conflict_do_nothing(index_elements=['username']).returning(User.username)
+    return set(db.session.scalars(statement))
+
+def _copy(rows):
+    db.session.execute(text(
+        f"CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (username varchar({MAX_FIELD_LENGTH}), password varchar({MAX_FIELD_LENGTH})) ON COMMIT DELETE ROWS"
+    ))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row['username'], row['password']])
+    buffer.seek(0)
+    # Raw psycopg2 cursor on the session's connection, so COPY joins the session transaction
+    cursor = db.session.connection().connection.cursor()
+    statement = f"COPY {STAGING_TABLE} (username, password) FROM STDIN WITH (FORMAT csv)"
+    try:
+        cursor.copy_expert(statement, buffer)
+    except psycopg2.Error as e:
+        # Raised like the errors of session statements (e.g. a NUL byte in a string)
+        raise DBAPIError(statement, None, e) from e
+    finally:
+        cursor.close()
+    return set(db.session.scalars(text(
+        f"INSERT INTO {User.__tablename__} (username, password) SELECT username, password FROM {STAGING_TABLE} "
+        "ON CONFLICT (username) DO NOTHING RETURNING username"
+    )))
+
+def provision_users(rows, method='copy', batch_size=1000, max_rows=None, on_created=None):
+    """Registers the (index, item) rows batch by batch and yields one result per row, in order.
+
+    Every batch is deduplicated against the users table with one query,
+    inserted and committed on its own, so the results already sent stay
+    true if a later batch fails (SQLAlchemyError, the caller rolls back). `on_created(usernames)` runs before each
+    commit. Statuses: created, exists, duplicate (earlier in the body),
+    invalid. Raises ValueError past `max_rows` rows.
+    """
+    seen = set()
+    rows = iter(rows)
+    position = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        position += len(batch)
+        if max_rows is not None and position > max_rows:
+            raise ValueError(f"At most {max_rows} users can be registered at once")
+        results = {}
+        accepted = []
+        for index, item in batch:
+            try:
+                username, password = validate(item)
+            except ValueError as e:
+                results[index] = {'index': index, 'status': 'invalid', 'error': str(e)}
+                continue
+            if username in seen:
+                results[index] = {'index': index, 'username': username, 'status': 'duplicate'}
+                continue
+            seen.add(username)
+            accepted.append((index, username, password))
+
+        existing = existing_usernames([username for _, username, _ in accepted])
+        created = insert_users([{'username': username, 'password': password} for _, username, password in accepted if username not in existing], method)
+        if created and on_created is not None:
+            on_created(created)
+        db.session.commit()
+
+        for index, username, _ in accepted:
+            results[index] = {'index': index, 'username': username, 'status': 'created' if username in created else 'exists'}
+        for index, _ in batch:
+            yield results[index]
@@ -0,0 +1,98 @@
+import logging
+import threading
+import time
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+class HealthMonitor:
+    """Runs constant-cost dependency probes in the background and caches the result.
+
+    `probes` maps a name to a callable that raises when the dependency is
+    unhealthy. Only the probes listed in `critical` (all of them by default)
+    decide readiness, the others are reported as degraded. A cached result
+    older than `max_age` seconds is refreshed inline, once, before serving.
+    """
+
+    def __init__(self, probes, critical=None, interval=10, max_age=30):
+        self.probes = probes
+        self.critical = set(probes if critical is None else critical)
+        self.interval = interval
+        self.max_age = max_age
+        self.started_at = time.time()
+        self._refresh_lock = threading.Lock()
+        self._results = {}
+        self._checked_at = None
+        self._ready = None
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True, name='health-monitor').start()
+        return self
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Health probes failed to run: {e}")
+            time.sleep(self.interval)
+
+    def refresh(self):
+        """Runs every probe once and stores the results."""
+        with self._refresh_lock:
+            self._probe_all()
+
+    def _probe_all(self):
+        results = {}
+        for name, probe in self.probes.items():
+            start = time.perf_counter()
+            try:
+                probe()
+                results[name] = {'status': 'up'}
+            except Exception as e:
+                results[name] = {'status': 'down', 'error': str(e)}
+            results[name]['latency_ms'] = round((time.perf_counter() - start) * 1000, 3)
+
+        ready = all(results[name]['status'] == 'up' for name in self.critical)
+        if ready != self._ready:
+            logger.info(f"Readiness changed to {ready}: {results}")
+        self._results = results
+        self._checked_at = time.time()
+        self._ready = ready
+
+    def age(self):
+        return None if self._checked_at is None else time.time() - self._checked_at
+
+    def readiness(self):
+        """Returns (ready, payload) from the cached probe results."""
+        age = self.age()
+        # Background probes are late: refresh inline unless another request already is
+        # (without any result yet, wait for that refresh instead)
+        if (age is None or age > self.max_age) and self._refresh_lock.acquire(blocking=age is None):
+            try:
+                if self._checked_at is None or self.age() > self.max_age:
+                    self._probe_all()
+            finally:
+                self._refresh_lock.release()
+        degraded = any(result['status'] != 'up' for result in self._results.values())
+        return self._ready, {
+            'status': ('degraded' if degraded else 'ready') if self._ready else 'not ready',
+            'checked_at': self._checked_at,
+            'age_seconds': round(self.age(), 3),
+            'probes': self._results,
+        }
+
+    def liveness(self):
+        """Returns a payload that only depends on the process being able to answer."""
+        return {'status': 'alive', 'uptime_seconds': round(time.time() - self.started_at, 3)}
+
+def database_probe(app, db):
+    """Probe running SELECT 1 on the service database."""
+    def probe():
+        with app.app_context():
+            try:
+                db.session.execute(text('SELECT 1'))
+            finally:
+                db.session.remove()
+    return probe
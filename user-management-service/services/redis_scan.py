@@ -0,0 +1,92 @@
+import queue
+import threading
+
+SCAN_BATCH_SIZE = 500
+_DONE = object()
+
+def parse_cursor(token, nodes):
+    """Parses a 'node:cursor,node:cursor' token into a {node: cursor} dict.
+
+    Without a token every node starts from cursor 0. With a token only the
+    nodes listed in it still have keys left to scan.
+    """
+    if not token:
+        return {node: 0 for node in nodes}
+    cursors = {}
+    for part in token.split(','):
+        node, _, cursor = part.rpartition(':')
+        if node not in nodes or not cursor.isdigit():
+            raise ValueError(f"Invalid cursor: {part}")
+        cursors[node] = int(cursor)
+    return cursors
+
+def format_cursor(cursors):
+    """Formats the unfinished {node: cursor} positions as a resume token."""
+    if not cursors:
+        return None
+    return ','.join(f"{node}:{cursor}" for node, cursor in cursors.items())
+
+def _scan_node(node, client, cursor, match, batch_size, out, stop):
+    """Scans one shard with SCAN + MGET and pushes (node, data, next_cursor) batches."""
+    try:
+        while not stop.is_set():
+            cursor, keys = client.scan(cursor=cursor, match=match, count=batch_size)
+            data = dict(zip(keys, client.mget(keys))) if keys else {}
+            out.put((node, data, cursor))
+            if cursor == 0:
+                break
+    except Exception as e:
+        out.put((node, e, cursor))
+    finally:
+        out.put((node, _DONE, cursor))
+
+def scan_nodes(redis_clients, positions, match='*', limit=None, batch_size=SCAN_BATCH_SIZE):
+    """Reads all shards concurrently and yields (node, {key: value}) batches.
+
+    Memory stays bounded by the queue size regardless of how many keys the
+    shards hold. Once at least `limit` keys were yielded the scan stops at a
+    batch boundary. `positions` ({node: cursor}) is updated in place as
+    batches are yielded, so afterwards it only holds the unfinished shards.
+    """
+    out = queue.Queue(maxsize=len(positions) * 2)
+    stop = threading.Event()
+    workers = [
+        threading.Thread(target=_scan_node, args=(node, redis_clients[node], cursor, match, batch_size, out, stop), daemon=True)
+        for node, cursor in positions.items()
+    ]
+    for worker in workers:
+        worker.start()
+
+    running = len(workers)
+    returned = 0
+    error = None
+    try:
+        while running:
+            node, data, cursor = out.get()
+            if data is _DONE:
+                running -= 1
+                continue
+            if stop.is_set():
+                # Drain batches fetched after the limit was reached, they are
+                # picked up again when the client resumes from the cursor
+                continue
+            if isinstance(data, Exception):
+                error = data
+                stop.set()
+                continue
+            positions[node] = cursor
+            if cursor == 0:
+                del positions[node]
+            if data:
+                returned += len(data)
+                yield node, data
+            if limit and returned >= limit:
+                stop.set()
+    finally:
+        stop.set()
+        # Unblock workers still waiting on a full queue
+        while running:
+            if out.get()[1] is _DONE:
+                running -= 1
+    if error:
+        raise error
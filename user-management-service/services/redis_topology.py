@@ -0,0 +1,135 @@
+import logging
+import threading
+import time
+
+# Sentinel events after which the cached view of a node is refreshed
+TOPOLOGY_EVENTS = ['+switch-master', '+sdown', '-sdown', '+odown', '-odown', '+slave', '+failover-end']
+
+logger = logging.getLogger(__name__)
+
+class RedisTopology:
+    """Cached master/replica layout of the sharded Redis nodes.
+
+    The layout is read from Sentinel once at start and then only refreshed
+    when Sentinel publishes a topology event for a node (or when a node has
+    not been refreshed for `refresh_interval` seconds, in case an event was
+    missed). Reads are plain dict lookups and never touch the network.
+    Callbacks registered with on_failover run when a node gets a new master.
+    """
+
+    def __init__(self, sentinels, service_name='mymaster', refresh_interval=60):
+        self.sentinels = sentinels
+        self.service_name = service_name
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._clients = {node: self._master_client(node) for node in sentinels}
+        self._nodes = {}
+        self._updated_at = {}
+        self._failover_callbacks = []
+        self.events_received = 0
+
+    def _master_client(self, node):
+        # Sentinel-managed client, connects lazily to whatever the current master is
+        return self.sentinels[node].master_for(self.service_name, decode_responses=True)
+
+    def on_failover(self, callback):
+        """Calls `callback(node)` from the listener thread whenever the master of a node changes."""
+        self._failover_callbacks.append(callback)
+        return callback
+
+    def start(self):
+        """Fills the cache and starts one Sentinel event listener per node."""
+        for node in self.sentinels:
+            self.refresh(node)
+            threading.Thread(target=self._listen, args=(node,), daemon=True, name=f'topology-{node}').start()
+        return self
+
+    def refresh(self, node):
+        """Re-reads the master and replica addresses of a node from Sentinel."""
+        sentinel = self.sentinels[node]
+        try:
+            master_host, master_port = sentinel.discover_master(self.service_name)
+            replicas = sentinel.discover_slaves(self.service_name)
+        except Exception as e:
+            logger.warning(f"Could not refresh Redis topology for {node}: {e}")
+            return False
+
+        entry = {
+            'master': {'host': master_host, 'port': master_port, 'role': 'master'},
+            'replicas': [{'host': host, 'port': port, 'role': 'replica'} for host, port in replicas],
+        }
+        with self._lock:
+            previous = self._nodes.get(node)
+            failover = previous is not None and previous['master'] != entry['master']
+            if failover:
+                # Failover: drop pooled connections to the old master
+                self._clients[node] = self._master_client(node)
+            self._nodes[node] = entry
+            self._updated_at[node] = time.monotonic()
+        if failover:
+            logger.warning(f"Redis node {node} failed over to {master_host}:{master_port}")
+            for callback in self._failover_callbacks:
+                try:
+                    callback(node)
+                except Exception as e:
+                    logger.error(f"Failover callback for {node} failed: {e}")
+        return True
+
+    def _listen(self, node):
+        backoff = 1
+        while True:
+            pubsub = None
+            try:
+                pubsub = self._sentinel_connection(node).pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(*TOPOLOGY_EVENTS)
+                backoff = 1
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message:
+                        self.events_received += 1
+                        logger.info(f"Sentinel event {message['channel']} for {node}: {message['data']}")
+                        self.refresh(node)
+                    elif self.staleness(node) > self.refresh_interval:
+                        self.refresh(node)
+            except Exception as e:
+                logger.warning(f"Sentinel listener for {node} failed, retrying in {backoff}s: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+                # Events may have been missed while disconnected
+                self.refresh(node)
+            finally:
+                if pubsub is not None:
+                    pubsub.close()
+
+    def _sentinel_connection(self, node):
+        for sentinel_client in self.sentinels[node].sentinels:
+            try:
+                sentinel_client.ping()
+                return sentinel_client
+            except Exception:
+                continue
+        raise ConnectionError(f"No sentinel reachable for {node}")
+
+    def client(self, node):
+        """Returns the master client for a node."""
+        return self._clients[node]
+
+    def clients(self):
+        """Returns a snapshot of {node: master client}."""
+        return dict(self._clients)
+
+    def staleness(self, node):
+        """Seconds since the node was last refreshed (infinite if never)."""
+        updated_at = self._updated_at.get(node)
+        if updated_at is None:
+            return float('inf')
+        return time.monotonic() - updated_at
+
+    def nodes(self):
+        """Returns the cached layout of every node along with its staleness."""
+        nodes = {}
+        for node in self.sentinels:
+            entry = self._nodes.get(node, {'master': None, 'replicas': []})
+            staleness = self.staleness(node)
+            nodes[node] = dict(entry, stale_seconds=None if staleness == float('inf') else round(staleness, 3))
+        return nodes
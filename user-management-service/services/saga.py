@@ -1,5 +1,8 @@
+import asyncio
+import inspect
+import time
 import traceback
-from dataclasses import dataclass
+from dataclasses import dataclass, field, replace
 from inspect import isawaitable
 from typing import Any, Callable, NewType, Optional, Union
 
@@ -13,11 +16,19 @@ class SagaError(Exception):
         action_exception: Exception,
         action_traceback: TracebackStr,
         compensation_exception_tracebacks: dict[int, tuple[Exception, TracebackStr]],
+        other_failures: Optional[dict[int, tuple[Exception, TracebackStr]]] = None,
     ):
         self.failed_step_index = failed_step_index
         self.action_exception = action_exception
         self.action_traceback = action_traceback
         self.compensation_exception_tracebacks = compensation_exception_tracebacks
+        # Steps of other DAG branches that failed while the first failure was being handled
+        self.other_failures = other_failures or {}
+
+    @property
+    def failures(self) -> dict[int, tuple[Exception, TracebackStr]]:
+        """All failed steps by index, the first failure included."""
+        return {self.failed_step_index: (self.action_exception, self.action_traceback), **self.other_failures}
 
     def __str__(self):
         header_msg = 'A critical error occurred during the saga execution, leading to transaction failure and compensation attempts.'
@@ -26,8 +37,18 @@ class SagaError(Exception):
             f'An unexpected {type(self.action_exception).__name__} occurred, triggering the compensation process.'
             f'\n{self.format_traceback_indentation(self.action_traceback, 2)}'
         )
+        other_failure_msgs = ''
         compensation_error_msgs = ''
 
+        if self.other_failures:
+            other_failure_msgs = 'Other branches failed too:\n' + '\n'.join(
+                [
+                    f'  - (step index {step}): Action failed due to a {type(exc).__name__}: {exc}'
+                    f'\n{self.format_traceback_indentation(traceback_str, 6)}'
+                    for step, (exc, traceback_str) in self.other_failures.items()
+                ]
+            )
+
         if any(self.compensation_exception_tracebacks.values()):
             compensation_error_msgs = 'Compensations encountered errors:\n' + '\n'.join(
                 [
@@ -37,7 +58,7 @@ class SagaError(Exception):
                 ]
             )
 
-        return '\n\n'.join([header_msg, error_detail_msg, compensation_error_msgs]).strip()
+        return '\n\n'.join([header_msg, error_detail_msg, other_failure_msgs, compensation_error_msgs]).strip()
 
     def format_traceback_indentation(self, traceback_str: str, indent: int = 2) -> str:
         """Formats a traceback string by adding indentation to each line.
@@ -55,23 +76,61 @@ class SagaError(Exception):
             return traceback_str
 
 
+def _takes_positional_args(function: Callable[..., Any]) -> bool:
+    """Tells whether a callable accepts positional arguments, from its signature."""
+    try:
+        parameters = inspect.signature(function).parameters.values()
+    except (TypeError, ValueError):
+        # No introspectable signature (some builtins): pass the arguments
+        return True
+    return any(
+        parameter.kind in (parameter.POSITIONAL_ONLY, parameter.POSITIONAL_OR_KEYWORD, parameter.VAR_POSITIONAL)
+        for parameter in parameters
+    )
+
+
+@dataclass
+class StepTiming:
+    """Timing of one action or compensation, passed to the `on_step_end` hook."""
+
+    saga_id: Any
+    step_index: int
+    name: Optional[str]
+    compensated: bool
+    started_at: float
+    ended_at: float
+    duration: float
+    error: Optional[Exception] = None
+
+
 @dataclass
 class Action:
     action: Callable[..., Any]
     compensation: Callable[..., Any]
     compensation_args: Optional[Union[tuple[Any], list[Any]]] = None
     result: Any = None
-
-    async def act(self, *args):
-        result = self.action(*(args if self.action.__code__.co_varnames else []))
+    name: Optional[str] = None
+    # Indexes of the steps this one depends on (DAG mode only)
+    dependencies: tuple[int, ...] = ()
+    # Seconds the action may take, None to use the saga default
+    timeout: Optional[float] = None
+
+    def __post_init__(self):
+        # Resolved once when the step is built instead of on every call
+        self.action_takes_args = _takes_positional_args(self.action)
+        self.compensation_takes_args = _takes_positional_args(self.compensation)
+
+    async def act(self, *args, timeout: Optional[float] = None):
+        result = self.action(*(args if self.action_takes_args else []))
         if isawaitable(result):
-            result = await result
+            # Only asynchronous actions can be interrupted by the timeout
+            result = await (result if timeout is None else asyncio.wait_for(result, timeout))
 
         return result
 
     async def compensate(self):
         result = self.compensation(
-            *(self.compensation_args if self.compensation.__code__.co_varnames else [])
+            *(self.compensation_args if self.compensation_takes_args else [])
         )
         if isawaitable(result):
             result = await result
@@ -79,8 +138,52 @@ class Action:
         return result
 
 
+class SagaDeadlineExceeded(asyncio.TimeoutError):
+    pass
+
+
+class _TimedSteps:
+    """Step execution shared by Saga and DagSaga: timeouts, deadline budget and timing hooks."""
+
+    def _start_clock(self):
+        self._deadline_at = None if self.deadline is None else time.monotonic() + self.deadline
+
+    def _timeout_for(self, action: Action) -> Optional[float]:
+        timeout = action.timeout if action.timeout is not None else self.step_timeout
+        if self._deadline_at is None:
+            return timeout
+        remaining = self._deadline_at - time.monotonic()
+        if remaining <= 0:
+            raise SagaDeadlineExceeded(f'Saga deadline of {self.deadline}s exceeded')
+        return remaining if timeout is None else min(timeout, remaining)
+
+    async def _act(self, index: int, args) -> Any:
+        action = self.steps[index]
+        return await self._timed(index, False, lambda: action.act(*args, timeout=self._timeout_for(action)))
+
+    async def _compensate(self, index: int) -> Any:
+        # Compensations always run to completion, whatever is left of the deadline
+        return await self._timed(index, True, self.steps[index].compensate)
+
+    async def _timed(self, index: int, compensated: bool, call: Callable[[], Any]) -> Any:
+        action = self.steps[index]
+        if self.on_step_start is not None:
+            self.on_step_start(self.saga_id, index, action.name, compensated)
+        started_at = time.perf_counter()
+        error = None
+        try:
+            return await call()
+        except Exception as exc:
+            error = exc
+            raise
+        finally:
+            if self.on_step_end is not None:
+                ended_at = time.perf_counter()
+                self.on_step_end(StepTiming(self.saga_id, index, action.name, compensated, started_at, ended_at, ended_at - started_at, error))
+
+
 @dataclass
-class Saga:
+class Saga(_TimedSteps):
     """
     The Saga class provides a way to manage Saga-style transactions using a sequence of steps,
     where each step consists of an operation and a compensation function. Transactions will be
@@ -94,13 +197,19 @@ class Saga:
     """
 
     steps: list[Action]
+    step_timeout: Optional[float] = None
+    deadline: Optional[float] = None
+    on_step_start: Optional[Callable[[Any, int, Optional[str], bool], Any]] = None
+    on_step_end: Optional[Callable[[StepTiming], Any]] = None
+    saga_id: Any = None
 
     async def execute(self):
+        self._start_clock()
         args = []
         for index, action in enumerate(self.steps):
             if isinstance(action, Action):
                 try:
-                    actioned_result = await action.act(*args)
+                    actioned_result = await self._act(index, args)
                     if actioned_result is None:
                         args = []
                     elif isinstance(actioned_result, (list, tuple)):
@@ -120,8 +229,7 @@ class Saga:
         compensation_exceptions = {}
         for compensation_index in range(last_action_index - 1, -1, -1):
             try:
-                action = self.steps[compensation_index]
-                await action.compensate()
+                await self._compensate(compensation_index)
             except Exception as exc:
                 _, _, traceback_str = traceback.format_exc().partition(
                     'During handling of the above exception, another exception occurred:\n\n'
@@ -131,6 +239,84 @@ class Saga:
         return compensation_exceptions
 
 
+def _as_args(result: Any) -> Union[tuple[Any], list[Any]]:
+    if result is None:
+        return []
+    if isinstance(result, (list, tuple)):
+        return result
+    return (result,)
+
+
+@dataclass
+class DagSaga(_TimedSteps):
+    """
+    The DagSaga class runs the steps of a saga as a dependency graph instead of a sequence.
+
+    A step starts as soon as every step it depends on has completed, so independent steps run
+    concurrently and the saga takes as long as its slowest path instead of the sum of all steps.
+    Each action receives the results of its dependencies as positional arguments, in the order
+    the dependencies were declared.
+
+    When a step fails no new step is started, the steps already running are awaited (their
+    failures are reported too) and only the completed steps are compensated, in reverse order of
+    completion, which is a reverse topological order of the graph.
+    """
+
+    steps: list[Action]
+    step_timeout: Optional[float] = None
+    deadline: Optional[float] = None
+    on_step_start: Optional[Callable[[Any, int, Optional[str], bool], Any]] = None
+    on_step_end: Optional[Callable[[StepTiming], Any]] = None
+    saga_id: Any = None
+    completed: list[int] = field(default_factory=list)
+
+    async def execute(self):
+        self._start_clock()
+        started: set[int] = set()
+        running: dict[asyncio.Task, int] = {}
+        failures: dict[int, tuple[Exception, TracebackStr]] = {}
+
+        def start_ready_steps():
+            for index, action in enumerate(self.steps):
+                if index not in started and all(dependency in self.completed for dependency in action.dependencies):
+                    started.add(index)
+                    args = [self.steps[dependency].result for dependency in action.dependencies]
+                    running[asyncio.ensure_future(self._act(index, args))] = index
+
+        start_ready_steps()
+        while running:
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index = running.pop(task)
+                action = self.steps[index]
+                try:
+                    action.result = task.result()
+                    action.compensation_args = _as_args(action.result)
+                    self.completed.append(index)
+                except Exception as exc:
+                    failures[index] = (exc, TracebackStr(''.join(traceback.format_exception(exc))))
+            if not failures:
+                start_ready_steps()
+
+        if failures:
+            compensation_exceptions = await self._run_compensations()
+            failed_step_index = min(failures)
+            action_exception, action_traceback = failures.pop(failed_step_index)
+            raise SagaError(failed_step_index, action_exception, action_traceback, compensation_exceptions, failures)
+
+        return self
+
+    async def _run_compensations(self) -> dict[int, tuple[Exception, TracebackStr]]:
+        compensation_exceptions = {}
+        for compensation_index in reversed(self.completed):
+            try:
+                await self._compensate(compensation_index)
+            except Exception as exc:
+                compensation_exceptions[compensation_index] = (exc, TracebackStr(''.join(traceback.format_exception(exc))))
+
+        return compensation_exceptions
+
+
 class OrchestrationBuilder:
     """
     OrchestrationBuilder is a utility class for building a saga-style transaction using a series of
@@ -167,18 +353,138 @@ class OrchestrationBuilder:
     When the action function completes, its response will be passed to the corresponding compensation
     function as a parameter.
 
+    DAG mode (`OrchestrationBuilder(dag=True)`) runs independent steps concurrently:
+    ```
+    builder = OrchestrationBuilder(dag=True)
+    builder.add_step(create_event, delete_event, name='calendar')
+    builder.add_step(add_participant, remove_participant, name='user')
+    builder.add_step(notify, unnotify, depends_on=['calendar', 'user'])
+    saga = await builder.execute()
+    ```
+    A step may only depend on steps added before it, so the graph can never contain a cycle.
+    Steps without `depends_on` start immediately. See DagSaga for the failure handling.
+
+    Timeouts and timing:
+    - `step_timeout` (or `add_step(..., timeout=...)`) bounds each asynchronous action, in seconds.
+      Synchronous actions run to completion, they cannot be interrupted.
+    - `deadline` is the budget of the whole saga; every action gets at most what is left of it.
+      A timed out action fails like any other, so the completed steps are compensated.
+    - `on_step_start(saga_id, step_index, name, compensated)` and `on_step_end(StepTiming)` are
+      called around every action and compensation.
+
     See also:
     - Saga
+    - DagSaga
+    - SagaBatchRunner
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        dag: bool = False,
+        step_timeout: Optional[float] = None,
+        deadline: Optional[float] = None,
+        on_step_start: Optional[Callable[[Any, int, Optional[str], bool], Any]] = None,
+        on_step_end: Optional[Callable[[StepTiming], Any]] = None,
+    ):
+        self.dag = dag
+        self.step_timeout = step_timeout
+        self.deadline = deadline
+        self.on_step_start = on_step_start
+        self.on_step_end = on_step_end
         self.steps: list[Action] = []
+        self._indexes: dict[str, int] = {}
 
-    def add_step(self, action: Callable[..., Any], compensation: Callable[..., Any]) -> 'OrchestrationBuilder':
-        action_ = Action(action, compensation)
+    def add_step(
+        self,
+        action: Callable[..., Any],
+        compensation: Callable[..., Any],
+        name: Optional[str] = None,
+        depends_on: Optional[list[str]] = None,
+        timeout: Optional[float] = None,
+    ) -> 'OrchestrationBuilder':
+        if depends_on and not self.dag:
+            raise ValueError('depends_on is only supported in DAG mode')
+        if name is not None and name in self._indexes:
+            raise ValueError(f'Duplicate step name: {name}')
+        unknown = [dependency for dependency in depends_on or [] if dependency not in self._indexes]
+        if unknown:
+            raise ValueError(f'Unknown dependencies (steps must be added before their dependents): {unknown}')
+
+        action_ = Action(action, compensation, name=name, dependencies=tuple(self._indexes[dependency] for dependency in depends_on or []), timeout=timeout)
+        if name is not None:
+            self._indexes[name] = len(self.steps)
         self.steps.append(action_)
 
         return self
 
-    async def execute(self) -> Saga:
-        return await Saga(self.steps).execute()
\ No newline at end of file
+    def build(self, saga_id: Any = None) -> Union[Saga, DagSaga]:
+        """Builds a saga from fresh copies of the steps, so one builder can build many sagas."""
+        saga_class = DagSaga if self.dag else Saga
+        return saga_class(
+            [replace(action, result=None, compensation_args=None) for action in self.steps],
+            step_timeout=self.step_timeout,
+            deadline=self.deadline,
+            on_step_start=self.on_step_start,
+            on_step_end=self.on_step_end,
+            saga_id=saga_id,
+        )
+
+    async def execute(self) -> Union[Saga, DagSaga]:
+        return await self.build().execute()
+
+
+class SagaBatchRunner:
+    """
+    Runs many sagas concurrently, at most `max_concurrency` at a time.
+
+    ```
+    runner = SagaBatchRunner(max_concurrency=20, step_timeout=2.0, deadline=10.0, on_step_end=record)
+    results = await runner.run([build_registration(user) for user in users])
+    failed = [result for result in results if isinstance(result, SagaError)]
+    ```
+
+    `run` takes OrchestrationBuilder instances and returns, in the same order, the executed
+    saga or the SagaError it raised, so one failing saga never cancels the others. A builder
+    may appear several times, every saga gets its own copy of the steps. The
+    saga_id passed to the hooks is the index of the saga in the batch.
+
+    Options left to None fall back to the builder's own. A saga's deadline starts when it
+    gets a slot, not while it waits for one.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 10,
+        step_timeout: Optional[float] = None,
+        deadline: Optional[float] = None,
+        on_step_start: Optional[Callable[[Any, int, Optional[str], bool], Any]] = None,
+        on_step_end: Optional[Callable[[StepTiming], Any]] = None,
+    ):
+        if max_concurrency < 1:
+            raise ValueError('max_concurrency must be at least 1')
+        self.max_concurrency = max_concurrency
+        self.step_timeout = step_timeout
+        self.deadline = deadline
+        self.on_step_start = on_step_start
+        self.on_step_end = on_step_end
+
+    def _build(self, builder: OrchestrationBuilder, saga_id: int) -> Union[Saga, DagSaga]:
+        saga = builder.build(saga_id)
+        for option in ('step_timeout', 'deadline', 'on_step_start', 'on_step_end'):
+            if getattr(self, option) is not None:
+                setattr(saga, option, getattr(self, option))
+        return saga
+
+    async def run(self, builders: list[OrchestrationBuilder]) -> list[Union[Saga, DagSaga, SagaError]]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_one(saga):
+            async with semaphore:
+                try:
+                    return await saga.execute()
+                except SagaError as exc:
+                    return exc
+
+        # Sagas are built up front so every signature is resolved before the first one starts
+        sagas = [self._build(builder, saga_id) for saga_id, builder in enumerate(builders)]
+        return list(await asyncio.gather(*(run_one(saga) for saga in sagas)))
\ No newline at end of file
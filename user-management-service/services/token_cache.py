@@ -0,0 +1,131 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+# Keyspace events that make a locally cached token stale
+INVALIDATING_EVENTS = {'set', 'del', 'expired', 'evicted', 'rename_from'}
+# Flags needed for the events above: K = keyspace channel, $ = string, g = generic, x = expired, e = evicted
+KEYSPACE_FLAGS = 'K$gxe'
+
+logger = logging.getLogger(__name__)
+
+class TokenCache:
+    """Bounded in-process LRU cache with per-entry TTL for JWT tokens.
+
+    It sits in front of the sharded Redis token store. Entries written by this
+    worker remember how many keyspace 'set' notifications they caused, so a
+    worker does not evict its own fresh tokens. Any other change to a key
+    (another worker re-issuing it, DEL, expiry or eviction) drops the entry.
+    """
+
+    def __init__(self, maxsize=10000, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # key -> [value, expires_at, own pending 'set' notifications]
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Returns the cached value or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl=None, own_write=False):
+        """Caches a value for at most `ttl` seconds (never longer than the cache TTL).
+
+        `own_write` marks values this worker has just written to Redis itself.
+        """
+        ttl = self.ttl if ttl is None or ttl <= 0 else min(ttl, self.ttl)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            pending = previous[2] if previous else 0
+            self._entries[key] = [value, time.monotonic() + ttl, pending + 1 if own_write else pending]
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def _on_keyspace_event(self, key, event):
+        if event not in INVALIDATING_EVENTS:
+            return
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            if event == 'set' and entry[2] > 0:
+                # Notification for our own write
+                entry[2] -= 1
+                return
+            del self._entries[key]
+            self.invalidations += 1
+
+    def listen(self, topology):
+        """Starts one keyspace-notification listener per Redis shard."""
+        for node in topology.sentinels:
+            threading.Thread(target=self._listen, args=(topology, node), daemon=True, name=f'token-cache-{node}').start()
+        return self
+
+    def _listen(self, topology, node):
+        backoff = 1
+        while True:
+            pubsub = None
+            try:
+                client = topology.client(node)
+                _enable_keyspace_events(client)
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe('__keyspace@0__:*')
+                # Notifications may have been missed while we were not subscribed
+                self.clear()
+                backoff = 1
+                for message in pubsub.listen():
+                    key = message['channel'].split(':', 1)[1]
+                    self._on_keyspace_event(key, message['data'])
+            except Exception as e:
+                logger.warning(f"Token cache listener for {node} failed, retrying in {backoff}s: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                if pubsub is not None:
+                    pubsub.close()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+def _enable_keyspace_events(client):
+    """Adds the flags we need to notify-keyspace-events without dropping existing ones."""
+    current = client.config_get('notify-keyspace-events').get('notify-keyspace-events', '')
+    missing = ''.join(flag for flag in KEYSPACE_FLAGS if flag not in current and not ('A' in current and flag in '$gxe'))
+    if missing:
+        client.config_set('notify-keyspace-events', current + missing)
@@ -0,0 +1,220 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Returns -1 while the filter has not been built, else 0 at the first clear bit or 1 if all are set
+CHECK_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    return -1
+end
+for _, offset in ipairs(ARGV) do
+    if redis.call('GETBIT', KEYS[1], offset) == 0 then
+        return 0
+    end
+end
+return 1
+"""
+
+# Sets every bit of one username
+ADD_SCRIPT = """
+for _, offset in ipairs(ARGV) do
+    redis.call('SETBIT', KEYS[1], offset, 1)
+end
+return 1
+"""
+
+# Merges a freshly built bitmap into the live one. Marks the filter as built (returns 1) only if
+# it was not invalidated since the rebuild started, i.e. the generation KEYS[4] is still ARGV[2].
+MERGE_SCRIPT = """
+redis.call('BITOP', 'OR', KEYS[1], KEYS[1], KEYS[2])
+redis.call('DEL', KEYS[2])
+if (redis.call('GET', KEYS[4]) or '0') ~= ARGV[2] then
+    return 0
+end
+redis.call('SET', KEYS[3], ARGV[1])
+return 1
+"""
+
+# Deletes the rebuild lock only if we still own it
+UNLOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+def bloom_parameters(capacity, error_rate):
+    """Returns (bits, hashes) of a Bloom filter holding `capacity` items at `error_rate` false positives."""
+    bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+    return bits, max(1, round(bits / capacity * math.log(2)))
+
+class UsernameFilter:
+    """Redis bitmap Bloom filter of the registered usernames, shared by every instance.
+
+    A "no" is definite, so register can skip its existence query and login
+    can reject unknown usernames without touching the database; a "maybe"
+    still goes to the database. Bits are only ever set (users are never
+    deleted), so a rebuild ORs a bitmap built from the users table into the
+    live one and cannot lose a concurrent registration. Until the first
+    rebuild has finished, or when Redis fails, every answer is "maybe".
+    Every invalidation bumps a generation counter, and a rebuild that
+    started before it does not mark the filter as built again. A Sentinel
+    failover may lose the latest bits with the old master, so it must
+    invalidate the filter too (see RedisTopology.on_failover).
+
+    Positions come from one blake2b digest by double hashing, and a check or
+    an add is a single script round-trip. The key names carry the bitmap
+    size and hash count, so changing the capacity starts a new filter.
+    """
+
+    def __init__(self, redis_client, capacity=1000000, error_rate=0.01, prefix='usernames:bloom'):
+        self.redis = redis_client
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bits, self.hashes = bloom_parameters(capacity, error_rate)
+        self.key = f'{prefix}:{self.bits}:{self.hashes}'
+        self.built_key = f'{self.key}:built'
+        self.lock_key = f'{self.key}:rebuild'
+        self.generation_key = f'{self.key}:generation'
+        self._check = redis_client.register_script(CHECK_SCRIPT)
+        self._add = redis_client.register_script(ADD_SCRIPT)
+        self._merge = redis_client.register_script(MERGE_SCRIPT)
+        self._unlock = redis_client.register_script(UNLOCK_SCRIPT)
+        self.checks = 0
+        self.definite_no = 0
+        self.unavailable = 0
+        self.rebuilds = 0
+        self.rebuilt_at = None
+        self._wake = threading.Event()
+
+    def _offsets(self, username):
+        digest = hashlib.blake2b(str(username).encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'big')
+        # Odd step, so the positions never collapse onto one bit
+        step = int.from_bytes(digest[8:], 'big') | 1
+        return [(first + index * step) % self.bits for index in range(self.hashes)]
+
+    def might_contain(self, username):
+        """False only if the username is certainly not registered."""
+        self.checks += 1
+        try:
+            found = self._check(keys=[self.key, self.built_key], args=self._offsets(username))
+        except Exception as e:
+            logger.warning(f"Username filter check failed: {e}")
+            found = -1
+        if found == -1:
+            self.unavailable += 1
+            return True
+        if not found:
+            self.definite_no += 1
+        return bool(found)
+
+    def add(self, username):
+        """Adds a username; call it before the user is committed, never after."""
+        self.add_many([username])
+
+    def add_many(self, usernames):
+        """Adds many usernames in one round-trip."""
+        self._add(keys=[self.key], args=[offset for username in usernames for offset in self._offsets(username)])
+
+    def invalidate(self):
+        """Turns every answer into "maybe" until the next rebuild, e.g. after a failed add."""
+        try:
+            pipe = self.redis.pipeline()
+            pipe.incr(self.generation_key)
+            pipe.delete(self.built_key)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Username filter could not be invalidated: {e}")
+
+    def rebuild_soon(self):
+        """Wakes the background rebuild started by start() before its next interval."""
+        self._wake.set()
+
+    def rebuild(self, usernames, lock_timeout=300):
+        """Builds the bitmap of `usernames` locally and merges it into the live filter.
+
+        Only one instance rebuilds at a time, the others return False. If the
+        filter is invalidated meanwhile, the bits are still merged but it
+        stays unbuilt until the next rebuild.
+        """
+        token = uuid.uuid4().hex
+        if not self.redis.set(self.lock_key, token, nx=True, ex=lock_timeout):
+            return False
+        try:
+            # Read before the usernames, so an add that failed after this point is seen
+            generation = int(self.redis.get(self.generation_key) or 0)
+            bitmap = bytearray((self.bits + 7) // 8)
+            count = 0
+            for username in usernames:
+                for offset in self._offsets(username):
+                    # Redis numbers the bits of a byte from the most significant one
+                    bitmap[offset >> 3] |= 0x80 >> (offset & 7)
+                count += 1
+            staging_key = f'{self.key}:staging:{token}'
+            self.redis.set(staging_key, bytes(bitmap), ex=lock_timeout)
+            built = self._merge(keys=[self.key, staging_key, self.built_key, self.generation_key], args=[count, generation])
+            if not built:
+                logger.warning(f"Username filter invalidated during its rebuild from {count} usernames, it stays unbuilt")
+                return True
+            self.rebuilds += 1
+            self.rebuilt_at = time.time()
+            logger.info(f"Username filter rebuilt from {count} usernames")
+            return True
+        finally:
+            self._unlock(keys=[self.lock_key], args=[token])
+
+    def start(self, load_usernames, interval=3600):
+        """Rebuilds in a background thread now and then every `interval` seconds.
+
+        `load_usernames` returns an iterable over every registered username.
+        Periodic rebuilds restore any username whose add was lost.
+        """
+        def run():
+            while True:
+                try:
+                    self.rebuild(load_usernames())
+                except Exception as e:
+                    logger.error(f"Username filter rebuild failed: {e}")
+                self._wake.wait(interval)
+                self._wake.clear()
+        threading.Thread(target=run, daemon=True, name='username-filter').start()
+        return self
+
+    def stats(self):
+        stats = {
+            'bits': self.bits,
+            'hashes': self.hashes,
+            'capacity': self.capacity,
+            'target_error_rate': self.error_rate,
+            'checks': self.checks,
+            'definite_no': self.definite_no,
+            'unavailable': self.unavailable,
+            'rebuilds': self.rebuilds,
+            'rebuilt_at': self.rebuilt_at,
+        }
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.bitcount(self.key)
+            pipe.strlen(self.key)
+            pipe.get(self.built_key)
+            pipe.get(self.generation_key)
+            set_bits, size, built_from, generation = pipe.execute()
+        except Exception as e:
+            return {**stats, 'error': str(e)}
+        fill = set_bits / self.bits
+        stats.update({
+            'built': built_from is not None,
+            'generation': int(generation or 0),
+            'memory_bytes': size,
+            'set_bits': set_bits,
+            # Swamidass & Baldi estimate of the number of distinct usernames added
+            'estimated_items': round(-self.bits / self.hashes * math.log(1 - fill)) if fill < 1 else None,
+            'estimated_error_rate': round(fill ** self.hashes, 6),
+        })
+        return stats
@@ -95,4 +95,11 @@ def test_login_invalid_credentials(client):
         db.session.query(User).filter_by(username='unittest').delete()
         db.session.commit()
 
-        # db.drop_all()
\ No newline at end of file
+        # db.drop_all()
+
+def test_status(client):
+    response = client.get('/api/user/status')
+    assert response.status_code == 200
+    assert response.json['message'] == 'Service and database are up and running'
+    assert response.json['probes']['database']['status'] == 'up'
+    assert 'latency_ms' in response.json['probes']['database']
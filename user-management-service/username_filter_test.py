@@ -0,0 +1,98 @@
+import hashlib
+import math
+import threading
+
+import fakeredis
+import pytest
+
+from services.username_filter import UsernameFilter, bloom_parameters
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis()
+
+@pytest.mark.parametrize('capacity, error_rate, bits, hashes', [
+    (1000000, 0.01, 9585059, 7),
+    (10000, 0.01, 95851, 7),
+    (10000, 0.001, 143776, 10),
+    (1, 0.5, 2, 1),
+])
+def test_bloom_parameters(capacity, error_rate, bits, hashes):
+    assert bloom_parameters(capacity, error_rate) == (bits, hashes)
+
+def test_bloom_parameters_meet_the_error_rate():
+    for error_rate in (0.1, 0.01, 0.001):
+        bits, hashes = bloom_parameters(100000, error_rate)
+        # Expected false-positive rate of a full filter, (1 - e^(-kn/m))^k
+        assert (1 - math.exp(-hashes * 100000 / bits)) ** hashes <= error_rate * 1.05
+
+def test_offsets_are_double_hashed_from_one_digest(redis_client):
+    username_filter = UsernameFilter(redis_client, capacity=10000)
+    digest = hashlib.blake2b(b'alice', digest_size=16).digest()
+    first, step = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+    offsets = username_filter._offsets('alice')
+    assert offsets == [(first + index * step) % username_filter.bits for index in range(username_filter.hashes)]
+    assert len(set(offsets)) == username_filter.hashes
+    assert all(0 <= offset < username_filter.bits for offset in offsets)
+
+def test_rebuilt_bitmap_matches_added_bits(redis_client):
+    usernames = [f'user{index}' for index in range(500)]
+    added = UsernameFilter(redis_client, capacity=1000, prefix='added')
+    added.add_many(usernames)
+    rebuilt = UsernameFilter(redis_client, capacity=1000, prefix='rebuilt')
+    assert rebuilt.rebuild(usernames)
+    # Python numbers the bits of the rebuilt bitmap the way SETBIT does
+    assert redis_client.get(added.key) == redis_client.get(rebuilt.key)
+
+def test_false_positive_rate_at_capacity(redis_client):
+    username_filter = UsernameFilter(redis_client, capacity=10000, error_rate=0.01)
+    assert username_filter.rebuild(f'user{index}' for index in range(10000))
+    assert all(username_filter.might_contain(f'user{index}') for index in range(0, 10000, 50))
+    false_positives = sum(username_filter.might_contain(f'unknown{index}') for index in range(10000))
+    assert false_positives / 10000 < 0.015
+    assert username_filter.stats()['estimated_items'] == pytest.approx(10000, rel=0.02)
+
+def test_every_answer_is_maybe_until_built(redis_client):
+    username_filter = UsernameFilter(redis_client, capacity=1000)
+    assert username_filter.might_contain('nobody')
+    assert username_filter.unavailable == 1
+    assert username_filter.rebuild(['alice'])
+    assert not username_filter.might_contain('nobody')
+    assert username_filter.might_contain('alice')
+
+def test_invalidate_keeps_the_bits_but_answers_maybe(redis_client):
+    username_filter = UsernameFilter(redis_client, capacity=1000)
+    assert username_filter.rebuild(['alice'])
+    username_filter.invalidate()
+    assert username_filter.might_contain('nobody')
+    assert username_filter.stats()['generation'] == 1
+    assert username_filter.rebuild(['alice'])
+    assert not username_filter.might_contain('nobody')
+
+def test_rebuild_invalidated_meanwhile_stays_unbuilt(redis_client):
+    username_filter = UsernameFilter(redis_client, capacity=1000)
+
+    def usernames():
+        yield 'alice'
+        # A failover or a failed add while the users table is being read
+        username_filter.invalidate()
+        yield 'bob'
+
+    assert username_filter.rebuild(usernames())
+    assert not username_filter.stats()['built']
+    assert username_filter.might_contain('nobody')
+
+def test_rebuild_soon_wakes_the_background_rebuild(redis_client):
+    loads = []
+    reloaded = threading.Event()
+
+    def load_usernames():
+        loads.append(len(loads))
+        if len(loads) == 2:
+            reloaded.set()
+        return ['alice']
+
+    username_filter = UsernameFilter(redis_client, capacity=1000).start(load_usernames, interval=3600)
+    username_filter.rebuild_soon()
+    assert reloaded.wait(5)
+    assert username_filter.rebuilds >= 1